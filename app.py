@@ -1,9 +1,74 @@
+import time
+# Taken before the other imports so the cold start can be measured
+_import_started = time.perf_counter()
 import streamlit as st
-import requests
-import os
 import re
-from PIL import Image
-import tempfile
+import json
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import taxon_cache
+import species_cache
+import species_bundle
+import species_record
+import prefetcher
+import cache_warmer
+import cache_refresher
+import response_archive
+import profiler
+import taxonomy_browser
+import flashcards
+from wikimedia_api import API_URLS, wikimedia_get_json, is_source_available, record_transfer
+import extraction_pool
+import metrics
+from extractors import (
+    analyze_description,
+    extract_classification,
+    parse_wikipedia_article,
+    similarity_score,
+)
+
+# Only the first run of the script in a process pays for the imports above;
+# Streamlit reruns find the modules already loaded
+metrics.record_once("app.startup_seconds", time.perf_counter() - _import_started)
+
+# Runs of spaces in Wikispecies descriptions
+_multiple_spaces = re.compile(r" +")
+
+# Number of species looked up at the same time by batch builds
+BATCH_LOOKUP_THREADS = 4
+
+# Number of search results (card and images) kept per Streamlit session
+MAX_SESSION_RESULTS = 5
+
+# Languages common names are shown in. The English name is the title of the
+# English Wikipedia article; the others come from its interlanguage links.
+NAME_LANGUAGES = {
+    "en": "English",
+    "hi": "Hindi",
+    "te": "Telugu",
+    "ta": "Tamil",
+    "bn": "Bengali",
+    "mr": "Marathi",
+    "es": "Spanish",
+    "fr": "French",
+    "de": "German",
+}
+
+# Disambiguation suffixes on linked article titles, e.g. "Lion (animal)"
+_title_qualifier = re.compile(r"\s*\([^)]*\)$")
+
+# Number of species the compare view accepts
+MIN_COMPARE_SPECIES = 2
+MAX_COMPARE_SPECIES = 10
+
+# Wikispecies pages fetched ahead in one batched query (see compare_species),
+# keyed by the normalized species name
+_prefetched_wikispecies = contextvars.ContextVar("prefetched_wikispecies", default={})
+
+# Images per gallery page, and per row of the gallery grid
+GALLERY_PAGE_SIZE = 8
+GALLERY_COLUMNS = 4
 
 # List of allowed file extensions for uploads
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
@@ -17,8 +82,21 @@ def main():
     st.title("Species Information Finder")
     st.write("Discover information about any species by name or by uploading an image.")
     
+    # Load the popular species in the background once per server process
+    cache_warmer.start_background_warm(prefetch_species)
+    # ...and keep cached species current by re-fetching only those whose
+    # source pages changed
+    cache_refresher.start_background_refresh(get_species_info, get_species_images)
+    warm_status = cache_warmer.get_status()
+    if warm_status["state"] == "warming":
+        st.caption(f"Warming up: {warm_status['done']}/{warm_status['total']} popular species loaded")
+    
+    # Common names for every language come with the card, so switching the
+    # language only re-renders the stored result
+    st.selectbox("Show common names in", list(NAME_LANGUAGES), format_func=NAME_LANGUAGES.get, key="name_language")
+    
     # Create tabs for different functionality
-    tab1, tab2 = st.tabs(["Search by Name", "Search by Image"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Search by Name", "Search by Image", "Browse Taxonomy", "Compare", "Quiz"])
     
     with tab1:
         st.header("Search by Species Name")
@@ -29,13 +107,12 @@ def main():
                 st.error("Please enter a species name")
             else:
                 with st.spinner("Searching for species information..."):
-                    # Get species info from Wikispecies API
-                    species_data = get_species_info(species_name)
-                    
-                    # Get images from Wikimedia Commons API
-                    images = get_species_images(species_name)
-                    
-                    display_results(species_data, images)
+                    # Get species info and images, or reuse this session's copy
+                    st.session_state["name_result"] = get_session_result(species_name)
+        
+        # Render the last result from the session store, so reruns caused by
+        # other widgets don't refetch or lose the displayed card
+        show_session_result("name_result")
     
     with tab2:
         st.header("Search by Image Upload")
@@ -43,6 +120,9 @@ def main():
         
         if uploaded_file is not None:
             if allowed_file(uploaded_file.name):
+                # PIL is only needed on this path, so the name search never loads it
+                from PIL import Image
+                
                 # Display the uploaded image
                 image = Image.open(uploaded_file)
                 st.image(image, caption="Uploaded Image", use_column_width=True)
@@ -53,24 +133,249 @@ def main():
                         # For demo purposes, we'll use our mock function
                         species_name = get_mock_species_from_filename(uploaded_file.name)
                         
-                        # Get species info from Wikispecies API
-                        species_data = get_species_info(species_name)
-                        
-                        # Get images from Wikimedia Commons API
-                        images = get_species_images(species_name)
-                        
-                        display_results(species_data, images)
+                        # Get species info and images, or reuse this session's copy
+                        st.session_state["image_result"] = get_session_result(species_name)
+                
+                show_session_result("image_result")
             else:
                 st.error("File type not allowed. Please upload an image file (PNG, JPG, JPEG, GIF).")
+    
+    with tab3:
+        st.header("Browse the Tree of Life")
+        show_taxonomy_browser()
+    
+    with tab4:
+        st.header("Compare Species")
+        compare_input = st.text_area(
+            f"Enter {MIN_COMPARE_SPECIES} to {MAX_COMPARE_SPECIES} species names, one per line or separated by commas:"
+        )
+        
+        if st.button("Compare"):
+            names = [name for line in compare_input.splitlines() for name in line.split(",") if name.strip()]
+            try:
+                with st.spinner("Looking up species..."):
+                    st.session_state["comparison"] = compare_species(names)
+            except ValueError as e:
+                st.error(str(e))
+        
+        if st.session_state.get("comparison"):
+            display_comparison(st.session_state["comparison"])
+    
+    with tab5:
+        st.header("Flashcard Quiz")
+        show_quiz()
+
+def show_taxonomy_browser():
+    """
+    Display one level of the taxonomy tree: the children of the taxon at the
+    end of the session's browsing path. Only the pages of children loaded so
+    far are fetched (and they come from the cache after the first time).
+    """
+    path = st.session_state.setdefault("taxonomy_path", [])
+    
+    # Breadcrumbs back up the tree
+    crumbs = st.columns(len(path) + 1)
+    if crumbs[0].button("Tree of Life", key="taxon_crumb:root"):
+        del path[:]
+        st.rerun()
+    for depth, taxon in enumerate(path[:-1], 1):
+        if crumbs[depth].button(taxon, key=f"taxon_crumb:{depth}"):
+            del path[depth:]
+            st.rerun()
+    if path:
+        crumbs[-1].write(f"**{path[-1]}**")
+    
+    if not path:
+        children = [{"name": taxon, "expandable": True} for taxon in taxonomy_browser.ROOT_TAXA]
+        has_more = False
+    else:
+        pages_key = f"taxonomy_pages:{path[-1]}"
+        pages_shown = st.session_state.get(pages_key, 1)
+        children = []
+        has_more = False
+        try:
+            with st.spinner(f"Loading {path[-1]}..."):
+                for page in range(pages_shown):
+                    page_children, has_more = taxonomy_browser.get_children_page(path[-1], page)
+                    children.extend(page_children)
+        except Exception as e:
+            st.error(f"Could not load {path[-1]}: {str(e)}")
+    
+    if path and not children and not has_more:
+        st.info(f"Wikispecies lists no subtaxa under {path[-1]}.")
+    
+    # Taxa open the next level; leaf pages are looked up like a search
+    cols = st.columns(3)
+    for idx, child in enumerate(children):
+        with cols[idx % 3]:
+            if child["expandable"]:
+                if st.button(f"▸ {child['name']}", key=f"taxon:{idx}:{child['name']}"):
+                    path.append(child["name"])
+                    st.rerun()
+            elif st.button(child["name"], key=f"taxon:{idx}:{child['name']}"):
+                with st.spinner("Searching for species information..."):
+                    st.session_state["taxonomy_result"] = get_session_result(child["name"])
+    
+    if has_more and st.button("Show more", key=f"taxon_more:{path[-1]}"):
+        st.session_state[pages_key] = pages_shown + 1
+        st.rerun()
+    
+    show_session_result("taxonomy_result")
 
-def display_results(species_data, images):
-    """Display the results in a formatted way."""
+def build_quiz_deck():
+    """
+    Build a flashcard deck from the popular species, which the cache warmer
+    has usually loaded already.
+    """
+    names = cache_warmer.load_popular_species()
+    cards = []
+    for name in names:
+        card = species_cache.get_card(name, allow_stale=True)
+        cards.append(card if card is not None else get_species_info(name))
+    return flashcards.build_deck(cards)
+
+def show_quiz():
+    """
+    Quiz the user on the shared deck, one card at a time, in the order this
+    session's spaced-repetition schedule picks. Everything comes from the
+    deck, so answering never waits on Wikimedia.
+    """
+    deck = flashcards.get_deck()
+    if deck is None:
+        st.write("Test what you know about the popular species, with cards scheduled by spaced repetition.")
+        if not st.button("Start quiz"):
+            return
+        with st.spinner("Preparing the deck..."):
+            deck = flashcards.get_deck(build_quiz_deck)
+    if not deck:
+        st.warning("Not enough species are loaded to build a quiz yet.")
+        return
+    
+    if "learner" not in st.session_state:
+        st.session_state["learner"] = flashcards.Learner(deck)
+        st.session_state["quiz_score"] = [0, 0]  # right, answered
+    learner = st.session_state["learner"]
+    right, answered = st.session_state["quiz_score"]
+    
+    # Result of the previous answer
+    feedback = st.session_state.pop("quiz_feedback", None)
+    if feedback is not None:
+        if feedback["correct"]:
+            st.success("Correct!")
+        else:
+            st.error(f"Not quite. The answer was: {feedback['answer']}")
+    if answered:
+        st.caption(f"Score: {right}/{answered} · {learner.due_count()} cards due")
+    
+    card = learner.next_card()
+    st.subheader(card["question"])
+    choice = st.radio("Your answer", card["choices"], index=None, key=f"quiz_choice:{answered}")
+    if st.button("Check", disabled=choice is None):
+        correct = choice == card["answer"]
+        # SM-2 grades: 5 for a right answer, 1 for a wrong one
+        learner.review(card["id"], 5 if correct else 1)
+        st.session_state["quiz_score"] = [right + correct, answered + 1]
+        st.session_state["quiz_feedback"] = {"correct": correct, "answer": card["answer"]}
+        st.rerun()
+
+def get_session_results():
+    """
+    Return this session's result store: an ordered mapping of query key to
+    the species card and images, least recently used first.
+    """
+    if "results" not in st.session_state:
+        st.session_state["results"] = OrderedDict()
+    return st.session_state["results"]
+
+def get_session_result(species_name):
+    """
+    Return the result store key for a query, fetching the species card and
+    images only if this session doesn't hold them yet. At most
+    MAX_SESSION_RESULTS results are kept per session.
+    """
+    results = get_session_results()
+    key = species_cache.query_key(species_name)
+    
+    if key not in results:
+        started = time.perf_counter()
+        # Add ?profile=1 to the app's URL to profile this lookup (see profiler.py)
+        with profiler.profile(f"search-{key}", force=st.query_params.get("profile") == "1") as profile:
+            # Get images from Wikimedia Commons API
+            images = get_species_images(species_name)
+            results[key] = {
+                # Get species info from Wikispecies API
+                "species_data": get_species_info(species_name),
+                "images": images,
+                # Whether the gallery goes on, so showing the "Load more
+                # images" button never calls into the image lookup again
+                "gallery_more": gallery_has_more(species_name, images),
+                # Gallery pages loaded beyond the first: (images, has_more)
+                "gallery_pages": [],
+            }
+        if profile is not None and profile.path:
+            st.caption(f"Profile written to {profile.path}")
+        elapsed = time.perf_counter() - started
+        metrics.observe("app.search_seconds", elapsed)
+        metrics.record_once("app.first_request_seconds", elapsed)
+    
+    # Keep the store bounded, evicting the least recently viewed result
+    results.move_to_end(key)
+    while len(results) > MAX_SESSION_RESULTS:
+        results.popitem(last=False)
+    
+    # Learn from the search sequence and warm the cache in the background for
+    # the species this user is likely to look at next
+    prefetcher.record_transition(st.session_state.get("last_query"), species_name)
+    st.session_state["last_query"] = species_name
+    prefetcher.schedule_related(species_name, prefetch_species)
+    
+    return key
+
+def prefetch_species(species_name):
+    """
+    Fetch a species card and its images into the cache (used by the
+    background prefetcher and the cache warmer). Returns the card.
+    """
+    species_data = get_species_info(species_name)
+    get_species_images(species_name)
+    return species_data
+
+def show_session_result(slot):
+    """
+    Display the result a widget slot (e.g. "name_result") last pointed at,
+    if it is still in the session store.
+    """
+    key = st.session_state.get(slot)
+    result = get_session_results().get(key)
+    if result:
+        display_results(result["species_data"], result["images"], query=key, slot=slot)
+
+def display_results(species_data, images, query=None, slot=None):
+    """
+    Display the results in a formatted way. With the query the images were
+    searched for, further gallery pages can be loaded on request; slot names
+    the widget slot showing them, as the same result can be on several tabs.
+    """
     if "error" in species_data:
         st.error(species_data["error"])
         return
     
     st.success(f"Found information for: {species_data['title']}")
     
+    # Common name in the language picked above
+    language = st.session_state.get("name_language", "en")
+    common_name = species_data.get("common_names", {}).get(language)
+    if common_name:
+        st.write(f"**Common name ({NAME_LANGUAGES[language]}):** {common_name}")
+    
+    # Let the user know when part of the card could not be refreshed
+    if species_data.get("skipped_sources"):
+        skipped = ", ".join(species_data["skipped_sources"])
+        if species_data.get("stale"):
+            st.info(f"{skipped} is temporarily unavailable, showing previously saved information.")
+        else:
+            st.info(f"{skipped} is temporarily unavailable, so some information may be missing.")
+    
     # Create columns for layout
     col1, col2 = st.columns([1, 2])
     
@@ -101,18 +406,102 @@ def display_results(species_data, images):
     # Display images if available
     if images:
         st.subheader("Related Images")
-        
-        # Display up to 4 images in a grid
-        cols = st.columns(min(4, len(images)))
-        for idx, img in enumerate(images[:4]):
+        show_image_grid(images)
+        if query is not None:
+            show_more_gallery_pages(query, slot)
+    else:
+        st.warning("No images found for this species.")
+
+def display_comparison(results):
+    """
+    Display compared species side by side: a picture of each, then their
+    classification, habitat and facts aligned row by row in one table.
+    """
+    cols = st.columns(len(results))
+    for col, result in zip(cols, results):
+        with col:
+            images = [img for img in result["images"] if not img.get("error")]
+            if images and images[0].get("thumb_data"):
+                st.image(images[0]["thumb_data"], use_column_width=True)
+            elif images:
+                st.image(images[0].get("thumb_url") or images[0]["url"], use_column_width=True)
+            st.caption(result["species_data"].get("title", result["name"]))
+    
+    language = st.session_state.get("name_language", "en")
+    rows = {"Common name": [], **{rank.capitalize(): [] for rank in taxon_cache.TAXON_RANKS}, "Habitat": []}
+    max_facts = max(len(result["species_data"].get("fun_facts", [])) for result in results)
+    rows.update({f"Fact {i}": [] for i in range(1, max_facts + 1)})
+    
+    for result in results:
+        species_data = result["species_data"]
+        if species_data.get("error"):
+            for values in rows.values():
+                values.append("")
+            rows["Common name"][-1] = species_data["error"]
+            continue
+        classification = species_data.get("classification", {})
+        rows["Common name"].append(species_data.get("common_names", {}).get(language, ""))
+        for rank in taxon_cache.TAXON_RANKS:
+            value = classification.get(rank, "Unknown")
+            rows[rank.capitalize()].append("" if value == "Unknown" else value)
+        habitat = species_data.get("habitat", "Unknown")
+        rows["Habitat"].append("" if habitat == "Unknown" else habitat)
+        facts = species_data.get("fun_facts", [])
+        for i in range(1, max_facts + 1):
+            rows[f"Fact {i}"].append(facts[i - 1] if i <= len(facts) else "")
+    
+    columns = [result["species_data"].get("title", result["name"]) for result in results]
+    st.table({column: {label: values[idx] for label, values in rows.items()} for idx, column in enumerate(columns)})
+
+def show_image_grid(images):
+    """Display images in rows of GALLERY_COLUMNS, with their credits."""
+    images = [img for img in images if not img.get("error")]
+    for row_start in range(0, len(images), GALLERY_COLUMNS):
+        cols = st.columns(GALLERY_COLUMNS)
+        for idx, img in enumerate(images[row_start:row_start + GALLERY_COLUMNS]):
             with cols[idx]:
-                if "thumb_url" in img:
+                if img.get("thumb_data"):
+                    # Thumbnail embedded in the offline bundle
+                    st.image(img["thumb_data"], caption=img.get("description", ""), use_column_width=True)
+                elif "thumb_url" in img:
                     st.image(img["thumb_url"], caption=img.get("description", ""), use_column_width=True)
                 else:
                     st.image(img["url"], caption=img.get("description", ""), use_column_width=True)
                 st.caption(f"Credit: {img.get('author', 'Unknown')} | License: {img.get('license', 'Unknown')}")
-    else:
-        st.warning("No images found for this species.")
+
+def show_more_gallery_pages(query, slot=None):
+    """
+    Display the gallery pages a slot has loaded beyond the first, and a
+    button to load the next one. Loaded pages are kept in the session result
+    (and shared by every slot showing it), so reruns don't look anything up
+    again; only the page just asked for is fetched.
+    """
+    result = get_session_results().get(query)
+    if result is None:
+        return
+    pages = result.setdefault("gallery_pages", [])
+    pages_key = f"gallery_pages:{slot}:{query}"
+    pages_shown = st.session_state.get(pages_key, 1)
+    
+    has_more = result.get("gallery_more", False)
+    for images, has_more in pages[:pages_shown - 1]:
+        show_image_grid(images)
+    
+    if len(pages) + 1 < pages_shown:
+        with st.spinner("Loading more images..."):
+            images, more = get_gallery_page(query, len(pages) + 1)
+        if any(img.get("error") for img in images):
+            # Not kept, so the button below tries the page again
+            st.warning("Could not load more images right now, please try again later.")
+            st.session_state[pages_key] = len(pages) + 1
+        else:
+            pages.append((images, more))
+            show_image_grid(images)
+            has_more = more
+    
+    if has_more and st.button("Load more images", key=f"more:{slot}:{query}"):
+        st.session_state[pages_key] = min(pages_shown, len(pages) + 1) + 1
+        st.rerun()
 
 # All the existing functions from your Flask app can remain exactly the same
 # (get_species_info, get_wikispecies_data, get_wikipedia_data, etc.)
@@ -123,6 +512,27 @@ def get_species_info(species_name):
     Get species information from both Wikispecies and Wikipedia APIs
     with improved extraction and fallback strategies for better results.
     """
+    # Normalize whitespace and capitalization so equivalent queries share cache entries
+    species_name = species_cache.normalize_query(species_name)
+    
+    # In offline mode every card is served from the local bundle
+    offline_bundle = species_bundle.get_offline_bundle()
+    if offline_bundle is not None:
+        entry = offline_bundle.get(species_name)
+        if entry is None:
+            return {"title": species_name, "error": "This species is not included in the offline collection."}
+        return entry[0]
+    
+    # Serve a fresh cached card without touching the network; on a miss only
+    # one caller (across replicas sharing the cache) fetches it
+    return species_cache.get_or_fill("card", species_name, species_cache.get_card, fetch_species_info)
+
+@response_archive.recorded
+def fetch_species_info(species_name):
+    """
+    Build a species card from Wikispecies and Wikipedia and cache it.
+    With WILDCARDS_ARCHIVE set, the raw responses are archived as well.
+    """
     # Create the base species info structure
     species_info = {
         "title": species_name,  # Default to the search query
@@ -141,19 +551,42 @@ def get_species_info(species_name):
         },
         "habitat": "Unknown",
         "fun_facts": [],
-        "data_sources": []  # Track where we got data from
+        "data_sources": [],  # Track where we got data from
+        "missing_sources": {},  # Track which sources had nothing, and why
+        "skipped_sources": [],  # Track sources skipped because they are unavailable
+        "revisions": {},  # Source page and revision each part came from, for the cache refresher
+        "common_names": {}  # Language code to common name
     }
     
+    # Consult the shared taxon cache first: if a sibling in the same genus was
+    # resolved earlier, the whole parent hierarchy is already known and the
+    # lookups below only need the data specific to this species
+    name_parts = species_name.split()
+    genus = name_parts[0].capitalize() if len(name_parts) == 2 else None
+    lineage = taxon_cache.get_lineage(genus, authoritative=True)
+    # The response archive needs complete pages to re-run every extractor
+    if not taxon_cache.is_lineage_complete(lineage) or response_archive.needs_full_pages():
+        lineage = None
+    
     # Try to get data from Wikispecies first
-    wikispecies_info = get_wikispecies_data(species_name)
+    wikispecies_info = fetch_unless_missing("Wikispecies", get_wikispecies_data, species_name, lineage=lineage)
     
     # If we got a valid response, update our species_info
     if not wikispecies_info.get("error"):
+        species_info["revisions"]["Wikispecies"] = wikispecies_info.pop("revision")
         species_info.update(wikispecies_info)
         species_info["data_sources"].append("Wikispecies")
+    elif wikispecies_info.get("not_found"):
+        species_info["missing_sources"]["Wikispecies"] = wikispecies_info["error"]
+    elif wikispecies_info.get("skipped"):
+        species_info["skipped_sources"].append("Wikispecies")
     
     # Now try to get complementary data from Wikipedia
-    wikipedia_info = get_wikipedia_data(species_name)
+    wikipedia_info = fetch_unless_missing("Wikipedia", get_wikipedia_data, species_name, lineage=lineage)
+    if wikipedia_info.get("not_found"):
+        species_info["missing_sources"]["Wikipedia"] = wikipedia_info["error"]
+    elif wikipedia_info.get("skipped"):
+        species_info["skipped_sources"].append("Wikipedia")
     
     # If Wikipedia returned valid data, supplement our existing info
     if not wikipedia_info.get("error"):
@@ -179,35 +612,239 @@ def get_species_info(species_name):
             species_info["fun_facts"] = existing_facts[:4]  # Limit to 4 facts
         
         species_info["data_sources"].append("Wikipedia")
+        species_info["revisions"]["Wikipedia"] = wikipedia_info["revision"]
+        species_info["common_names"] = wikipedia_info.get("common_names", {})
+    
+    # If a source was unavailable, fall back to the last card we had for this
+    # species (even if expired) rather than showing a partial or empty one
+    if species_info["skipped_sources"]:
+        stale_card = species_cache.get_card(species_name, allow_stale=True)
+        if stale_card:
+            stale_card["stale"] = True
+            stale_card["skipped_sources"] = species_info["skipped_sources"]
+            return stale_card
     
     # If we didn't get any data from either source, return an error
     if not species_info["data_sources"]:
-        species_info["error"] = "Species information not found in either Wikispecies or Wikipedia."
+        if species_info["skipped_sources"]:
+            species_info["error"] = "Species information is temporarily unavailable. Please try again shortly."
+        else:
+            species_info["error"] = "Species information not found in either Wikispecies or Wikipedia."
+        return species_info
+    
+    # Fill any ranks still missing from the cached hierarchy, then record the
+    # resolved hierarchy so that sibling species can reuse it. Ranks merged
+    # from the article text are guesses: they only fill links nothing else
+    # provided, and the lineage used to skip lookups ignores them
+    if lineage:
+        taxon_cache.apply_lineage(species_info["classification"], lineage)
+        if species_info["classification"].get("species", "Unknown") == "Unknown":
+            species_info["classification"]["species"] = name_parts[1].lower()
+    taxon_cache.remember_classification(species_info["classification"])
+    
+    # Categories and links were only needed to extract the classification;
+    # hand the links to the prefetcher as likely next species before dropping them
+    prefetcher.note_links(species_name, species_info.get("links", []))
+    species_record.strip_extraction_fields(species_info)
+    
+    # Only complete cards are cached; partial ones are retried on the next search
+    if not species_info["skipped_sources"]:
+        species_cache.put_card(species_name, species_info)
     
     return species_info
 
-def get_wikispecies_data(species_name):
+def fetch_unless_missing(source, fetch_function, species_name, **kwargs):
+    """
+    Call a source lookup unless the source recently reported that it has no
+    page for this query, or its circuit breaker is open. New misses are
+    recorded in the negative cache; transient errors are not, so they are
+    retried on the next search.
+    """
+    reason = species_cache.get_miss(source, species_name)
+    if reason:
+        return {"error": reason, "not_found": True}
+    
+    # Skip sources that are currently failing or too slow
+    if not is_source_available(source):
+        return {"error": f"{source} is temporarily unavailable.", "skipped": True}
+    
+    result = fetch_function(species_name, **kwargs)
+    if result.get("not_found"):
+        species_cache.record_miss(source, species_name, result["error"])
+    elif result.get("error") and not is_source_available(source):
+        # The call failed and opened the breaker (error, timeout or too slow)
+        result["skipped"] = True
+    return result
+
+def get_genus_species_info(genus, species_names):
+    """
+    Get species information for several species of the same genus.
+    The shared genus hierarchy is resolved once, so every species after that
+    only needs its own leaf lookup.
+    """
+    genus = genus.strip().capitalize()
+    
+    # Resolve the genus hierarchy once if it isn't cached yet
+    if not taxon_cache.is_lineage_complete(taxon_cache.get_lineage(genus, authoritative=True)):
+        genus_info = get_species_info(genus)
+        if not genus_info.get("error"):
+            classification = dict(genus_info["classification"])
+            classification["genus"] = genus
+            classification["species"] = "Unknown"
+            taxon_cache.remember_classification(classification)
+    
+    # Look the species up concurrently; their article parsing then runs in
+    # parallel in the extraction worker processes. Each lookup keeps the
+    # caller's request priority.
+    with ThreadPoolExecutor(max_workers=BATCH_LOOKUP_THREADS) as executor:
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, get_species_info, name)
+            for name in species_names
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+def compare_species(species_names):
+    """
+    Look up several species (MIN_COMPARE_SPECIES to MAX_COMPARE_SPECIES) for
+    a side-by-side comparison. Returns a list of {"name", "species_data",
+    "images"} in the order given, without duplicates.
+
+    The Wikispecies pages of the species not cached yet are fetched in one
+    batched query, then every species is looked up concurrently, so the
+    whole comparison takes about as long as a single lookup. Siblings share
+    the genus hierarchy through the taxon cache as usual.
+    """
+    names = []
+    for name in species_names:
+        name = species_cache.normalize_query(name)
+        if name and species_cache.query_key(name) not in {species_cache.query_key(n) for n in names}:
+            names.append(name)
+    if not MIN_COMPARE_SPECIES <= len(names) <= MAX_COMPARE_SPECIES:
+        raise ValueError(f"Compare between {MIN_COMPARE_SPECIES} and {MAX_COMPARE_SPECIES} species.")
+    
+    # The response archive keeps one Wikispecies response per species, so
+    # species aren't batched while it is on; in offline mode every card comes
+    # from the bundle and nothing may be fetched
+    prefetched = {}
+    if species_bundle.get_offline_bundle() is None:
+        missing = [
+            name for name in names
+            if species_cache.get_card(name) is None and not species_cache.get_miss("Wikispecies", name)
+        ]
+        if len(missing) > 1 and is_source_available("Wikispecies") and response_archive.get_archive() is None:
+            prefetched = get_wikispecies_pages(missing)
+    
+    token = _prefetched_wikispecies.set(prefetched)
+    try:
+        with ThreadPoolExecutor(max_workers=2 * len(names)) as executor:
+            cards = {
+                name: executor.submit(contextvars.copy_context().run, get_species_info, name) for name in names
+            }
+            images = {
+                name: executor.submit(contextvars.copy_context().run, get_species_images, name) for name in names
+            }
+            return [
+                {"name": name, "species_data": cards[name].result(), "images": images[name].result()}
+                for name in names
+            ]
+    finally:
+        _prefetched_wikispecies.reset(token)
+
+def get_wikispecies_pages(species_names):
+    """
+    Fetch the Wikispecies pages of several species in one batched query (with
+    the same properties get_wikispecies_data asks for). Returns
+    {species name: (page id, page)}; species the query failed for are left
+    out, so they are looked up on their own.
+    """
+    params = {
+        "action": "query",
+        "titles": "|".join(species_names),
+        "prop": "extracts|categories|info|links",
+        "exintro": True,
+        "explaintext": True,
+        "exlimit": "max",
+        # Limits are shared by all the pages in a batch
+        "cllimit": "max",
+        "clshow": "!hidden",
+        "pllimit": "max",
+        "plnamespace": 0,
+    }
+    
+    pages = {}
+    asked = {}
+    try:
+        # Follow continuations until every page has all of its properties
+        while True:
+            data = wikimedia_get_json(API_URLS["Wikispecies"], params, call="wikispecies.pages")
+            query = data.get("query", {})
+            asked.update({entry["to"]: entry["from"] for entry in query.get("normalized", [])})
+            for page_id, page in query.get("pages", {}).items():
+                merged = pages.setdefault(page_id, {})
+                for key, value in page.items():
+                    if isinstance(value, list):
+                        merged.setdefault(key, []).extend(value)
+                    else:
+                        merged[key] = value
+            if "continue" not in data:
+                break
+            params.update(data["continue"])
+    except Exception as e:
+        print(f"Error fetching Wikispecies pages: {str(e)}")
+        return {}
+    
+    prefetched = {}
+    for page_id, page in pages.items():
+        title = page.get("title", "")
+        name = asked.get(title, title)
+        if name in species_names:
+            # Each species keeps its first 50 categories and links, like a
+            # single lookup
+            for key in ("categories", "links"):
+                if key in page:
+                    page[key] = page[key][:50]
+            prefetched[name] = (page_id, page)
+    return prefetched
+
+def get_wikispecies_data(species_name, lineage=None):
     """
-    Get species information from Wikispecies API
+    Get species information from Wikispecies API.
+    If a complete cached lineage is given, categories and links (which are only
+    used to resolve the parent ranks) are not requested.
     """
     # Wikispecies API endpoint
-    url = "https://species.wikimedia.org/w/api.php"
+    url = API_URLS["Wikispecies"]
     
     # Parameters for the API request - get more info to work with
     params = {
         "action": "query",
-        "format": "json",
         "titles": species_name,
         "prop": "extracts|categories|info|links",
         "exintro": True,  # Get only the intro section
         "explaintext": True,  # Get plain text, not HTML
         "cllimit": 50,  # Get more categories
+        "clshow": "!hidden",  # Skip hidden maintenance categories, they are never taxa
         "pllimit": 50,  # Get more links
+        "plnamespace": 0,  # Only links to other species pages, not templates or help pages
     }
     
+    # With the hierarchy already known we only need the species-specific data
+    if lineage:
+        params["prop"] = "extracts|info"
+        for param in ("cllimit", "clshow", "pllimit", "plnamespace"):
+            del params[param]
+    
     try:
-        response = requests.get(url, params=params)
-        data = response.json()
+        prefetched = _prefetched_wikispecies.get().get(species_name)
+        if prefetched is not None:
+            # Fetched in a batch with other species; keep only what this
+            # lookup would have asked for
+            page_id, page = prefetched
+            if lineage:
+                page = {key: value for key, value in page.items() if key not in ("categories", "links")}
+            data = {"query": {"pages": {page_id: page}}}
+        else:
+            data = wikimedia_get_json(url, params, call="wikispecies.page")
         
         # Extract page data
         pages = data.get("query", {}).get("pages", {})
@@ -242,6 +879,7 @@ def get_wikispecies_data(species_name):
         # Check if the page exists
         if int(page_id) < 0:
             species_info["error"] = "Species not found in Wikispecies. Try a different spelling or check for the scientific name."
+            species_info["not_found"] = True
             return species_info
         
         # Extract the relevant information
@@ -257,17 +895,20 @@ def get_wikispecies_data(species_name):
             species_info["links"] = [link.get("title") for link in page.get("links", [])]
             
         species_info["last_modified"] = page.get("touched", "Unknown")
+        species_info["revision"] = {"title": species_info["title"], "revid": page.get("lastrevid", 0)}
         
         # Clean up the description (remove unnecessary line breaks, etc.)
         if species_info["description"]:
             species_info["description"] = species_info["description"].replace("\n", " ").strip()
             # Remove multiple spaces
-            import re
-            species_info["description"] = re.sub(r' +', ' ', species_info["description"])
+            species_info["description"] = _multiple_spaces.sub(' ', species_info["description"])
         
         # Try different strategies to extract classification
-        # Strategy 1: Extract from categories
-        species_info["classification"] = extract_classification(species_info["categories"])
+        # Strategy 1: Extract from categories, or reuse the cached hierarchy
+        if lineage:
+            species_info["classification"] = taxon_cache.apply_lineage(dict(species_info["classification"]), lineage)
+        else:
+            species_info["classification"] = extract_classification(species_info["categories"])
         
         # Strategy 2: Try to extract genus and species from the title if available
         title = species_info.get("title", "")
@@ -286,6 +927,11 @@ def get_wikispecies_data(species_name):
                 classification["species"] = species
             species_info["classification"] = classification
         
+        # The categories and title are authoritative for the hierarchy: record
+        # it for sibling lookups before the link heuristics below add guesses
+        if not lineage and species_info["categories"]:
+            taxon_cache.remember_classification(species_info["classification"], authoritative=True)
+        
         # Strategy 3: Look for classification information in links
         if species_info.get("links"):
             for link in species_info["links"]:
@@ -303,11 +949,10 @@ def get_wikispecies_data(species_name):
                     elif link.endswith("aceae"):  # Family suffix for plants
                         species_info["classification"]["family"] = link
         
-        # Extract habitat info 
-        species_info["habitat"] = extract_habitat(species_info["description"])
-        
-        # Extract fun facts
-        species_info["fun_facts"] = extract_fun_facts(species_info["description"])
+        # Extract habitat info and fun facts
+        species_info.update(extraction_pool.run(
+            analyze_description, species_info["description"], size=len(species_info["description"])
+        ))
         
         # If the description is too short or missing, try to create a basic description
         if not species_info["description"] or len(species_info["description"]) < 20:
@@ -342,32 +987,33 @@ def get_wikispecies_data(species_name):
             "fun_facts": []
         }
 
-def get_wikipedia_data(species_name):
+def get_wikipedia_data(species_name, lineage=None):
     """
     Get species information from Wikipedia API, focusing on description,
-    habitat, and fun facts.
+    habitat, and fun facts. If a complete cached lineage is given, the
+    classification is taken from it instead of being extracted from the text.
     """
     # Wikipedia API endpoint
-    url = "https://en.wikipedia.org/w/api.php"
+    url = API_URLS["Wikipedia"]
     
     # First, try to search for the page to get the correct title
     search_params = {
         "action": "query",
-        "format": "json",
         "list": "search",
         "srsearch": species_name,
         "srlimit": 1,  # Get just the best match
+        "srprop": "",  # Only the title is used, so skip snippets, sizes and timestamps
+        "srinfo": "",  # ...and the total hit count and spelling suggestion
     }
     
     try:
         # Search for the page first to get the exact title
-        search_response = requests.get(url, params=search_params)
-        search_data = search_response.json()
+        search_data = wikimedia_get_json(url, search_params, call="wikipedia.search")
         
         # Check if we found any search results
         search_results = search_data.get("query", {}).get("search", [])
         if not search_results:
-            return {"error": "No matching Wikipedia page found for this species."}
+            return {"error": "No matching Wikipedia page found for this species.", "not_found": True}
         
         # Get the page title from the search result
         page_title = search_results[0].get("title")
@@ -375,16 +1021,20 @@ def get_wikipedia_data(species_name):
         # Now get the full page content
         content_params = {
             "action": "query",
-            "format": "json",
             "titles": page_title,
-            "prop": "extracts|categories|sections",
+            # The text, the revision id for the cache refresher and the
+            # interlanguage links that give the common names, in one request.
+            # All the links are needed: lllang takes a single language (one
+            # more request per language), and as links come sorted by
+            # language code, a small lllimit would cut off most of ours
+            "prop": "extracts|info|langlinks",
+            "lllimit": "max",
             "exintro": False,  # Get the full content, not just the intro
             "explaintext": True,  # Get plain text, not HTML
-            "cllimit": 50,  # Get more categories
+            "exsectionformat": "wiki",  # Keep "== Heading ==" markers for section extraction
         }
         
-        content_response = requests.get(url, params=content_params)
-        content_data = content_response.json()
+        content_data = wikimedia_get_json(url, content_params, call="wikipedia.content")
         
         # Extract page data
         pages = content_data.get("query", {}).get("pages", {})
@@ -398,11 +1048,19 @@ def get_wikipedia_data(species_name):
         
         # Check if the page exists
         if int(page_id) < 0:
-            return {"error": "Wikipedia page not found."}
+            return {"error": "Wikipedia page not found.", "not_found": True}
+        
+        # Account for the interlanguage links separately (they are also part
+        # of wikipedia.content), so their share of the payload can be watched
+        if "langlinks" in page:
+            record_transfer("wikipedia.content.langlinks",
+                            len(json.dumps(page["langlinks"], ensure_ascii=False).encode("utf-8")))
         
         # Get basic information
         species_info = {
             "title": page.get("title", species_name),
+            "revision": {"title": page.get("title", species_name), "revid": page.get("lastrevid", 0)},
+            "common_names": get_common_names(page, species_name),
             "description": "",
             "habitat": "Unknown",
             "fun_facts": [],
@@ -417,62 +1075,17 @@ def get_wikipedia_data(species_name):
             }
         }
         
-        # Extract the content
+        # Parse the article text (description, habitat, fun facts and, unless
+        # the hierarchy is already known from the taxon cache, classification).
+        # Long articles are handed to an extraction worker process.
         full_text = page.get("extract", "")
-        
-        # Clean up the text
-        if full_text:
-            full_text = full_text.replace("\n\n", "||").replace("\n", " ").replace("||", "\n\n")
-            
-            # Get sections from the content
-            sections = full_text.split("\n\n")
-            
-            # The first section is usually a good description
-            if sections:
-                species_info["description"] = sections[0].strip()
-            
-            # Look for habitat information in the full text
-            habitat_section = extract_wikipedia_section(full_text, ["Habitat", "Distribution", "Range", "Ecology", "Environment"])
-            if habitat_section:
-                species_info["habitat"] = habitat_section
-            else:
-                # If no specific habitat section, use our habitat extraction on the full text
-                habitat = extract_habitat(full_text)
-                if habitat != "Unknown":
-                    species_info["habitat"] = habitat
-            
-            # Extract fun facts from various interesting sections
-            behavior_section = extract_wikipedia_section(full_text, ["Behavior", "Behaviour", "Life cycle", "Diet", "Feeding", "Reproduction", "Biology"])
-            if behavior_section:
-                facts = extract_fun_facts(behavior_section)
-                if facts:
-                    species_info["fun_facts"].extend(facts)
-            
-            # If we don't have enough facts, try conservation status or other sections
-            if len(species_info["fun_facts"]) < 2:
-                conservation_section = extract_wikipedia_section(full_text, ["Conservation", "Status", "Threats", "Population"])
-                if conservation_section:
-                    facts = extract_fun_facts(conservation_section)
-                    if facts:
-                        for fact in facts:
-                            if fact not in species_info["fun_facts"]:
-                                species_info["fun_facts"].append(fact)
-            
-            # If we still don't have enough facts, use our fun facts extraction on the full text
-            if len(species_info["fun_facts"]) < 2:
-                general_facts = extract_fun_facts(full_text)
-                if general_facts:
-                    for fact in general_facts:
-                        if fact not in species_info["fun_facts"]:
-                            species_info["fun_facts"].append(fact)
-            
-            # Limit to 4 facts
-            species_info["fun_facts"] = species_info["fun_facts"][:4]
-            
-            # Extract classification from Wikipedia content
-            wiki_classification = extract_wikipedia_classification(full_text, page.get("title", ""), search_data)
-            if wiki_classification:
-                species_info["classification"] = wiki_classification
+        parsed = extraction_pool.run(
+            parse_wikipedia_article, full_text, page.get("title", ""), search_data, not lineage,
+            size=len(full_text),
+        )
+        species_info.update(parsed)
+        if lineage:
+            taxon_cache.apply_lineage(species_info["classification"], lineage)
         
         return species_info
     
@@ -486,129 +1099,61 @@ def get_wikipedia_data(species_name):
             "fun_facts": []
         }
 
-def extract_wikipedia_section(text, section_keywords):
+def get_common_names(page, species_name):
     """
-    Try to extract a specific section from Wikipedia text content.
-    Returns the first matching section or None if no match is found.
+    Return the common names of a species in NAME_LANGUAGES, from its English
+    Wikipedia page: the page title and the titles of the linked articles in
+    other languages. Titles that are just the scientific name are skipped.
     """
-    if not text:
-        return None
-    
-    # Try to find section headings in the text
-    section_pattern = r"==\s*([^=]+)\s*=="
-    sections = re.findall(section_pattern, text)
-    
-    # Check if any of our target sections exist
-    matching_sections = []
-    for keyword in section_keywords:
-        for section in sections:
-            if keyword.lower() in section.lower():
-                # Found a matching section, now extract its content
-                section_regex = re.escape(f"== {section} ==")
-                try:
-                    # Find where this section starts
-                    start_match = re.search(section_regex, text)
-                    if start_match:
-                        start_pos = start_match.end()
-                        
-                        # Find where the next section starts
-                        next_section = re.search(r"==\s*[^=]+\s*==", text[start_pos:])
-                        if next_section:
-                            end_pos = start_pos + next_section.start()
-                            section_text = text[start_pos:end_pos].strip()
-                        else:
-                            # This is the last section
-                            section_text = text[start_pos:].strip()
-                        
-                        matching_sections.append(section_text)
-                except Exception:
-                    # Skip this section if there's any error processing it
-                    continue
-    
-    # If we found any matching sections, join them (limit to 2 for conciseness)
-    if matching_sections:
-        return " ".join(matching_sections[:2])
-    
-    # Alternative approach: look for paragraphs containing the keywords
-    paragraphs = text.split("\n\n")
-    for keyword in section_keywords:
-        for paragraph in paragraphs:
-            if keyword.lower() in paragraph.lower():
-                return paragraph
-    
-    return None
+    titles = {"en": page.get("title", "")}
+    for link in page.get("langlinks", []):
+        if link.get("lang") in NAME_LANGUAGES:
+            titles[link["lang"]] = link.get("*") or link.get("title", "")
+    
+    common_names = {}
+    for lang, title in titles.items():
+        name = _title_qualifier.sub("", title).strip()
+        if name and name.casefold() != species_name.casefold():
+            common_names[lang] = name
+    return common_names
 
 def get_species_images(species_name):
     """
     Get species images from Wikimedia Commons API with improved search
     strategies for better results.
     """
-    # Wikimedia Commons API endpoint
-    url = "https://commons.wikimedia.org/w/api.php"
-    
-    # Function to perform a search with given parameters
-    def search_images(search_term, limit=10):
-        # Parameters for the API request
-        params = {
-            "action": "query",
-            "format": "json",
-            "generator": "search",
-            "gsrnamespace": 6,  # File namespace
-            "gsrsearch": search_term,
-            "gsrlimit": limit,  # Limit results
-            "prop": "imageinfo",
-            "iiprop": "url|extmetadata",
-            "iiurlwidth": 800,  # Thumbnail width
-        }
-        
-        try:
-            response = requests.get(url, params=params)
-            data = response.json()
-            
-            # Extract image data
-            pages = data.get("query", {}).get("pages", {})
-            
-            if not pages:
-                return []
-            
-            images = []
-            for page_id, page in pages.items():
-                image_info = page.get("imageinfo", [{}])[0]
-                
-                # Extract metadata
-                metadata = image_info.get("extmetadata", {})
-                description = metadata.get("ImageDescription", {}).get("value", "No description")
-                author = metadata.get("Artist", {}).get("value", "Unknown")
-                license = metadata.get("License", {}).get("value", "Unknown")
-                
-                # Skip non-image files (like pdfs, audio, etc.)
-                title = page.get("title", "").lower()
-                if any(ext in title for ext in ['.pdf', '.svg', '.mp3', '.mp4', '.ogg', '.wav', '.webm']):
-                    continue
-                
-                image = {
-                    "title": page.get("title", "Unknown"),
-                    "url": image_info.get("url", ""),
-                    "thumb_url": image_info.get("thumburl", ""),
-                    "description": description,
-                    "author": author,
-                    "license": license,
-                }
-                
-                images.append(image)
-            
-            return images
-        
-        except Exception as e:
-            return [{"error": str(e)}]
+    # Normalize whitespace and capitalization the same way as get_species_info
+    species_name = species_cache.normalize_query(species_name)
+    
+    # In offline mode images (with embedded thumbnails) come from the local bundle
+    offline_bundle = species_bundle.get_offline_bundle()
+    if offline_bundle is not None:
+        entry = offline_bundle.get(species_name)
+        return entry[1] if entry else []
+    
+    # Serve fresh cached images without touching the network; on a miss only
+    # one caller (across replicas sharing the cache) searches for them
+    return species_cache.get_or_fill("images", species_name, species_cache.get_images, fetch_species_images)
+
+def fetch_species_images(species_name):
+    """
+    Search Wikimedia Commons for species images and cache them. The search
+    that produced them is remembered as the start of the species gallery.
+    """
+    # If Commons is currently failing or too slow, answer immediately with
+    # whatever we had before (or no images) instead of waiting on it
+    if not is_source_available("Commons"):
+        return species_cache.get_images(species_name, allow_stale=True) or []
     
     # STRATEGY 1: Try exact file name search first
-    images = search_images(f"file:{species_name}")
+    gallery_term = f"file:{species_name}"
+    images, continuation = search_commons_images(gallery_term)
     
     # If no results, try a broader search
     if not images:
         # STRATEGY 2: Try removing the file: prefix for broader results
-        images = search_images(species_name)
+        gallery_term = species_name
+        images, continuation = search_commons_images(gallery_term)
     
     # If still no results or very few, try some variations
     if len(images) < 3:
@@ -618,7 +1163,7 @@ def get_species_images(species_name):
         # STRATEGY 3: If it's a binomial name, try with just the genus or species part
         if len(name_parts) == 2:
             # Try with just the genus (first part)
-            genus_images = search_images(f"{name_parts[0]}")
+            genus_images, _ = search_commons_images(f"{name_parts[0]}")
             
             # Add unique images from genus search
             existing_urls = [img.get("url") for img in images]
@@ -631,464 +1176,151 @@ def get_species_images(species_name):
                     if len(images) >= 5:
                         break
     
-    # If we found at least some images, return them
-    if images:
-        return images
-    
     # STRATEGY 4: Last resort - try a very general search
     # This could be improved by using the taxonomy info
-    return search_images("species taxonomy nature")
+    if not images:
+        gallery_term = "species taxonomy nature"
+        images, continuation = search_commons_images(gallery_term)
+    
+    # Don't cache results that contain errors, so they are retried
+    if images and not any("error" in img for img in images):
+        species_cache.put_images(species_name, images)
+        species_cache.cache_put("gallery", gallery_key(species_name, 0),
+                                {"term": gallery_term, "continue": continuation})
+    return images
 
-def extract_classification(categories):
+def search_commons_images(search_term, limit=GALLERY_PAGE_SIZE, continuation=None):
     """
-    Extract classification information from categories and additional WikiData
-    with improved pattern matching and detection.
+    Search Wikimedia Commons for raster images. Returns the images and the
+    MediaWiki continue parameters for the next page of the same search (None
+    after the last page). On failure the list holds a single {"error": ...}.
     """
-    # Initialize with default "Unknown" values
-    classification = {
-        "kingdom": "Unknown",
-        "phylum": "Unknown",
-        "class": "Unknown",
-        "order": "Unknown",
-        "family": "Unknown",
-        "genus": "Unknown",
-        "species": "Unknown",
-    }
-    
-    # Skip empty categories
-    if not categories:
-        return classification
-    
-    # Common taxonomy patterns in category names with more variations
-    taxonomy_patterns = {
-        "kingdom": ["kingdom:", "regnum:", "reino:", "regno:", "kingdom ", "regnum ", "reino ", "reino "],
-        "phylum": ["phylum:", "division:", "división:", "divisio:", "phylum ", "division ", "división ", "divisio "],
-        "class": ["class:", "clase:", "classis:", "class ", "clase ", "classis "],
-        "order": ["order:", "orden:", "ordo:", "order ", "orden ", "ordo "],
-        "family": ["family:", "familia:", "family ", "familia "],
-        "genus": ["genus:", "género:", "genero:", "genus ", "género ", "genero "],
-        "species": ["species:", "especie:", "specie:", "species ", "especie ", "specie "]
+    # Parameters for the API request
+    params = {
+        "action": "query",
+        "generator": "search",
+        "gsrnamespace": 6,  # File namespace
+        # Only raster images; PDFs, SVG drawings, audio and video are
+        # filtered out by the search server instead of being downloaded
+        "gsrsearch": f"{search_term} filetype:bitmap",
+        "gsrlimit": limit,  # Limit results
+        "gsrprop": "",  # Search snippets are not used
+        "prop": "imageinfo",
+        "iiprop": "url|extmetadata",
+        "iiextmetadatafilter": "ImageDescription|Artist|License",  # Only the fields we display
+        "iiurlwidth": 800,  # Thumbnail width
     }
+    if continuation:
+        params.update(continuation)
     
-    # STRATEGY 1: Direct matching from category names
-    for category in categories:
-        # Skip Categories: prefix if present
-        if category.startswith("Category:"):
-            category = category[9:]
-            
-        category_lower = category.lower()
+    try:
+        data = wikimedia_get_json(API_URLS["Commons"], params, call="commons.search")
+        continuation = data.get("continue")
         
-        # Check for direct taxonomy mentions
-        for rank, patterns in taxonomy_patterns.items():
-            for pattern in patterns:
-                if pattern in category_lower:
-                    # Extract the value after the pattern
-                    parts = category_lower.split(pattern)
-                    if len(parts) > 1:
-                        # Clean up the value (capitalize first letter, remove trailing spaces and special chars)
-                        value = parts[1].strip().split()[0].capitalize()
-                        classification[rank] = value
-                        break
-    
-    # STRATEGY 2: Look for categories that directly match taxonomic naming conventions
-    for category in categories:
-        # Skip Categories: prefix if present
-        if category.startswith("Category:"):
-            category = category[9:]
-            
-        category_parts = category.split()
+        # Extract image data
+        pages = data.get("query", {}).get("pages", {})
         
-        # Check for single-word categories that might be taxonomic names
-        if len(category_parts) == 1:
-            name = category_parts[0]
+        if not pages:
+            return [], continuation
+        
+        images = []
+        # Pages are keyed by page id; "index" keeps the search ranking
+        for page in sorted(pages.values(), key=lambda page: page.get("index", 0)):
+            image_info = page.get("imageinfo", [{}])[0]
             
-            # Check for common taxonomic suffixes
-            if name.endswith("idae"):  # Family suffix for animals
-                classification["family"] = name
-            elif name.endswith("inae"):  # Subfamily suffix
-                # Store subfamily info in a separate key
-                classification["subfamily"] = name
-            elif name.endswith("ales"):  # Order suffix for plants
-                classification["order"] = name
-            elif name.endswith("aceae"):  # Family suffix for plants
-                classification["family"] = name
-            elif name.endswith("ineae"):  # Suborder suffix for plants
-                # Store suborder info in a separate key
-                classification["suborder"] = name
-            elif name.endswith("oideae"):  # Subfamily suffix for plants
-                # Store subfamily info in a separate key
-                classification["subfamily"] = name
-    
-    # STRATEGY 3: Check for categories that contain common taxonomic rank names
-    taxonomic_rank_names = ["kingdom", "phylum", "division", "class", "order", "family", "genus", "species"]
-    for category in categories:
-        # Skip Categories: prefix if present
-        if category.startswith("Category:"):
-            category = category[9:]
+            # Extract metadata
+            metadata = image_info.get("extmetadata", {})
+            description = metadata.get("ImageDescription", {}).get("value", "No description")
+            author = metadata.get("Artist", {}).get("value", "Unknown")
+            license = metadata.get("License", {}).get("value", "Unknown")
+            
+            # Skip non-image files (like pdfs, audio, etc.)
+            title = page.get("title", "").lower()
+            if any(ext in title for ext in ['.pdf', '.svg', '.mp3', '.mp4', '.ogg', '.wav', '.webm']):
+                continue
             
-        category_lower = category.lower()
+            image = {
+                "title": page.get("title", "Unknown"),
+                "url": image_info.get("url", ""),
+                "thumb_url": image_info.get("thumburl", ""),
+                "description": description,
+                "author": author,
+                "license": license,
+            }
+            
+            images.append(image)
         
-        for rank in taxonomic_rank_names:
-            if rank in category_lower:
-                # Look for words after the rank name
-                parts = category_lower.split(rank)
-                if len(parts) > 1 and parts[1].strip():
-                    # Get the first word after the rank
-                    value = parts[1].strip().split()[0].capitalize()
-                    if classification[rank] == "Unknown":
-                        classification[rank] = value
-    
-    # Final cleanup: ensure proper capitalization and formatting
-    for rank, value in classification.items():
-        if value != "Unknown":
-            # Capitalize first letter for taxonomic ranks
-            classification[rank] = value[0].upper() + value[1:]
-    
-    return classification
+        return images, continuation
+    
+    except Exception as e:
+        return [{"error": str(e)}], None
 
-def extract_habitat(description):
+def gallery_key(species_name, page):
     """
-    Extract habitat information from description using a more comprehensive approach
-    with multiple fallback strategies and pattern recognition.
+    Build the species cache key of one gallery page.
     """
-    if not description or description == "No description available":
-        return "Unknown"
-    
-    # Split the description into sentences
-    sentences = description.replace(". ", ".|").replace("! ", "!|").replace("? ", "?|").split("|")
-    sentences = [s.strip() for s in sentences if s.strip()]
-    
-    # STRATEGY 1: Direct habitat statements
-    # Expanded list of habitat-related keywords and phrases
-    habitat_keywords = [
-        "habitat", "lives in", "found in", "native to", "occurs in", "distribution", 
-        "range includes", "ecosystem", "biome", "environment", "inhabits", "dwelling in",
-        "endemic to", "natural range", "geographical range", "distributed across",
-        "prefers", "thrives in", "flourishes in", "resides in", "habitat type",
-        "commonly found", "typically found", "often found", "usually found", "primarily found"
-    ]
-    
-    # STRATEGY 2: Geography and climate context
-    # Climate and geography keywords to catch broader context
-    climate_keywords = [
-        "tropical", "temperate", "polar", "arctic", "antarctic", "desert", 
-        "rainforest", "forest", "jungle", "grassland", "savanna", "wetland", 
-        "marsh", "swamp", "mountain", "alpine", "coastal", "marine", "freshwater",
-        "ocean", "sea", "river", "lake", "stream", "pond", "terrestrial", "aquatic",
-        "woodland", "meadow", "tundra", "taiga", "steppe", "continent", "island",
-        "shore", "beach", "reef", "cave", "burrow", "nest", "canopy", "undergrowth"
-    ]
-    
-    # STRATEGY 3: Regional indicators (continents, regions, countries)
-    region_keywords = [
-        "africa", "asia", "europe", "north america", "south america", "australia", 
-        "antarctica", "oceania", "mediterranean", "pacific", "atlantic", "indian ocean",
-        "arctic ocean", "southern ocean", "northern", "southern", "eastern", "western",
-        "central", "worldwide", "global", "cosmopolitan", "international"
-    ]
-    
-    # STRATEGY 4: Verbs that might indicate location or movement patterns
-    action_keywords = [
-        "migrate", "roam", "travel", "swim", "fly", "climb", "burrow", "dig", "nest", 
-        "breed", "forage", "hunt", "territory", "range"
-    ]
-    
-    # Sentences that might contain habitat information
-    habitat_sentences = []
-    
-    # Apply Strategy 1: Direct habitat statements
-    for sentence in sentences:
-        for keyword in habitat_keywords:
-            if keyword.lower() in sentence.lower():
-                habitat_sentences.append(sentence)
-                break
-    
-    # Apply Strategy 2: Geography and climate context (if strategy 1 didn't yield results)
-    if not habitat_sentences:
-        for sentence in sentences:
-            for keyword in climate_keywords:
-                if keyword.lower() in sentence.lower():
-                    habitat_sentences.append(sentence)
-                    break
-    
-    # Apply Strategy 3: Regional indicators (if strategies 1-2 didn't yield results)
-    if not habitat_sentences:
-        for sentence in sentences:
-            for keyword in region_keywords:
-                if keyword.lower() in sentence.lower():
-                    habitat_sentences.append(sentence)
-                    break
-    
-    # Apply Strategy 4: Action verbs related to habitat (if strategies 1-3 didn't yield results)
-    if not habitat_sentences:
-        for sentence in sentences:
-            for keyword in action_keywords:
-                if keyword.lower() in sentence.lower():
-                    habitat_sentences.append(sentence)
-                    break
-    
-    # Fallback Strategy: If no habitat information was found, try to use the first or second sentence
-    # as they often contain general information about where the species lives
-    if not habitat_sentences and len(sentences) >= 2:
-        # Skip the first sentence if it's just a definition and take the second
-        if len(sentences) > 2:
-            second_sentence = sentences[1]
-            # Check if the second sentence has reasonable length to be informative
-            if len(second_sentence.split()) > 5:
-                habitat_sentences.append(second_sentence)
-        
-        # If second sentence wasn't suitable or not available, use the first
-        if not habitat_sentences:
-            first_sentence = sentences[0]
-            if len(first_sentence.split()) > 5:
-                habitat_sentences.append(first_sentence)
-    
-    # Format the habitat information
-    if habitat_sentences:
-        # If we have multiple sentences, join them (but limit to 2 for conciseness)
-        if len(habitat_sentences) > 1:
-            combined = ". ".join(habitat_sentences[:2]).strip()
-            # Make sure it ends with proper punctuation
-            if not combined.endswith(('.', '!', '?')):
-                combined += '.'
-            return combined
-        
-        single = habitat_sentences[0].strip()
-        # Make sure it ends with proper punctuation
-        if not single.endswith(('.', '!', '?')):
-            single += '.'
-        return single
-    
-    # Last resort: construct a generic message if we couldn't find specific habitat info
-    return "Specific habitat information not available from Wikispecies. Try searching online for more details about this species' natural environment."
+    return f"{species_name}#{page}"
 
-def extract_fun_facts(description):
+def gallery_has_more(species_name, images):
     """
-    Extract interesting fun facts from the description using keyword-based identification,
-    with improved pattern recognition and a structured approach to generate fun facts
-    even with limited information.
+    Return whether a species gallery goes on after its first page, the
+    images from get_species_images. Only reads the cache.
     """
-    if not description or description == "No description available":
-        return ["No specific information available for this species in Wikispecies."]
-    
-    # Split the description into sentences
-    sentences = description.replace(". ", ".|").replace("! ", "!|").replace("? ", "?|").split("|")
-    sentences = [s.strip() for s in sentences if s.strip()]
-    
-    # If the description is too short, include it as a single fact
-    if len(sentences) == 1 and len(description) < 100:
-        if not sentences[0].endswith(('.', '!', '?')):
-            sentences[0] += '.'
-        return [sentences[0]]
-    
-    # STRATEGY 1: Identify sentences with interesting keywords
-    interesting_keywords = [
-        "interesting", "unique", "unusual", "remarkable", "notable", "surprising",
-        "fascinating", "amazing", "extraordinary", "distinctive", "special", "rare",
-        "strange", "curious", "unlike", "peculiar", "odd", "bizarre", "striking",
-        "colorful", "beautiful", "impressive", "popular", "famous", "well-known",
-        "largest", "smallest", "fastest", "slowest", "oldest", "youngest", "only",
-        "record", "discovery", "first", "last", "origin", "discovered", "introduced",
-        "revered", "sacred", "symbol", "iconic", "emblem", "represented", "mythology",
-        "legend", "folklore", "traditional", "cultural", "significance", "historical"
-    ]
-    
-    # STRATEGY 2: Physical characteristics and biology often make good facts
-    biology_keywords = [
-        "lifespan", "longevity", "size", "weight", "height", "length", "wingspan",
-        "color", "pattern", "marking", "appearance", "physical", "morphology", "anatomy",
-        "feature", "characteristic", "distinctive", "body", "shape", "structure",
-        "adaptation", "evolved", "evolution", "mutation", "gene", "genetic", "chromosome",
-        "hybrid", "species", "subspecies", "variety", "breed", "strain", "extinct",
-        "endangered", "threatened", "vulnerable", "conservation", "protected"
-    ]
-    
-    # STRATEGY 3: Behavior and lifestyle information
-    behavior_keywords = [
-        "diet", "eat", "feeding", "food", "prey", "predator", "hunt", "scavenge",
-        "forage", "graze", "browse", "omnivore", "carnivore", "herbivore", "insectivore",
-        "behavior", "behaviour", "habit", "activity", "social", "solitary", "group",
-        "herd", "flock", "pack", "colony", "community", "family", "nocturnal", "diurnal",
-        "crepuscular", "migrate", "migration", "hibernate", "hibernation", "estivate",
-        "dormant", "sleep", "rest", "active", "territory", "defend", "aggressive",
-        "docile", "tame", "wild", "domestic", "domesticated", "trained", "human"
-    ]
-    
-    # STRATEGY 4: Reproduction is always interesting
-    reproduction_keywords = [
-        "reproduce", "reproduction", "breeding", "mate", "mating", "courtship", "display",
-        "attract", "offspring", "young", "juvenile", "infant", "baby", "child", "adult",
-        "egg", "spawn", "birth", "pregnant", "gestation", "incubation", "hatch", "nestling",
-        "fledgling", "litter", "clutch", "brood", "parent", "care", "raise", "nurse", "wean"
-    ]
-    
-    # Comparative patterns that often indicate interesting facts
-    comparative_patterns = [
-        "more than", "less than", "bigger than", "smaller than", "larger than",
-        "faster than", "slower than", "better than", "worse than", "greater than",
-        "unlike", "similar to", "compared to", "in contrast to", "differs from",
-        "up to", "as many as", "can reach", "can grow", "can live", "known to",
-        "capable of", "able to", "estimated", "approximately", "about", "around"
-    ]
-    
-    # Measurement patterns that often indicate interesting statistics
-    measurement_patterns = [
-        "cm", "meter", "metre", "kilometer", "kilometre", "feet", "foot", "inch",
-        "kg", "gram", "pound", "ton", "tonne", "year", "month", "week", "day", "hour",
-        "percent", "°C", "°F", "degree", "celsius", "fahrenheit", "temperature", 
-        "speed", "mph", "kph", "knot", "altitude", "depth", "width", "height"
-    ]
-    
-    # Collect potential facts using different strategies
-    fact_candidates = {
-        "interesting": [],
-        "biological": [],
-        "behavioral": [],
-        "reproductive": [],
-        "comparative": [],
-        "measurements": [],
-        "general": []
-    }
-    
-    # Apply strategies to collect potential facts
-    for sentence in sentences:
-        # Skip very short sentences
-        if len(sentence.split()) < 4:
-            continue
-            
-        # Flag to track if the sentence has been categorized
-        categorized = False
-        
-        # Strategy 1: Interesting keywords
-        for keyword in interesting_keywords:
-            if keyword.lower() in sentence.lower():
-                fact_candidates["interesting"].append(sentence)
-                categorized = True
-                break
-                
-        if not categorized:
-            # Strategy 2: Biological characteristics
-            for keyword in biology_keywords:
-                if keyword.lower() in sentence.lower():
-                    fact_candidates["biological"].append(sentence)
-                    categorized = True
-                    break
-        
-        if not categorized:
-            # Strategy 3: Behavior keywords
-            for keyword in behavior_keywords:
-                if keyword.lower() in sentence.lower():
-                    fact_candidates["behavioral"].append(sentence)
-                    categorized = True
-                    break
-                    
-        if not categorized:
-            # Strategy 4: Reproduction keywords
-            for keyword in reproduction_keywords:
-                if keyword.lower() in sentence.lower():
-                    fact_candidates["reproductive"].append(sentence)
-                    categorized = True
-                    break
-        
-        if not categorized:
-            # Check for comparative patterns
-            for pattern in comparative_patterns:
-                if pattern.lower() in sentence.lower():
-                    fact_candidates["comparative"].append(sentence)
-                    categorized = True
-                    break
-                    
-        if not categorized:
-            # Check for measurement patterns
-            has_number = any(c.isdigit() for c in sentence)
-            if has_number:
-                for pattern in measurement_patterns:
-                    if pattern.lower() in sentence.lower():
-                        fact_candidates["measurements"].append(sentence)
-                        categorized = True
-                        break
-                        fact_candidates["measurements"].append(sentence)
-                        categorized = True
-                        break
-        
-        # If sentence wasn't categorized by any specific strategy, add to general
-        if not categorized and len(sentence.split()) > 5:
-            fact_candidates["general"].append(sentence)
-    
-    # Select facts from each category to ensure diversity (prioritizing the most interesting ones)
-    selected_facts = []
-    
-    # Priority order for fact selection
-    categories = ["interesting", "measurements", "biological", "reproductive", "behavioral", "comparative", "general"]
-    
-    # First, try to get at least one fact from high-priority categories
-    for category in categories[:3]:  # First 3 are highest priority
-        if fact_candidates[category]:
-            selected_facts.append(fact_candidates[category][0])
-            fact_candidates[category].pop(0)  # Remove the used fact
-    
-    # Now fill remaining slots with a mix of all categories
-    remaining_slots = 4 - len(selected_facts)  # Maximum 4 facts total
-    
-    if remaining_slots > 0:
-        for category in categories:
-            if fact_candidates[category] and remaining_slots > 0:
-                next_fact = fact_candidates[category][0]
-                # Only add if not too similar to already selected facts
-                if not any(similarity_score(next_fact, fact) > 0.7 for fact in selected_facts):
-                    selected_facts.append(next_fact)
-                    remaining_slots -= 1
-                fact_candidates[category].pop(0)  # Remove the used fact
-    
-    # If we still don't have enough facts, add more from general pool
-    if len(selected_facts) < 2 and sentences:
-        # Add the first sentence if it's not already included
-        if sentences[0] not in selected_facts and len(sentences[0].split()) > 5:
-            selected_facts.append(sentences[0])
-            
-        # Add another sentence from middle of the text if available
-        middle_idx = len(sentences) // 2
-        if len(sentences) > middle_idx and sentences[middle_idx] not in selected_facts and len(sentences[middle_idx].split()) > 5:
-            selected_facts.append(sentences[middle_idx])
-    
-    # Last resort: if still no facts, create a generic fact
-    if not selected_facts:
-        selected_facts = ["This species is documented in Wikispecies, the free species directory."]
-    
-    # Ensure all facts end with proper punctuation
-    for i in range(len(selected_facts)):
-        if not selected_facts[i].endswith(('.', '!', '?')):
-            selected_facts[i] += '.'
-    
-    # Remove duplicates while preserving order
-    unique_facts = []
-    for fact in selected_facts:
-        if fact not in unique_facts:
-            unique_facts.append(fact)
-    
-    return unique_facts[:4]  # Limit to max 4 facts
+    if species_bundle.get_offline_bundle() is not None or any("error" in img for img in images):
+        return False
+    cursor = species_cache.cache_get("gallery", gallery_key(species_cache.normalize_query(species_name), 0),
+                                     allow_stale=True)
+    # Without a cursor (the images were cached elsewhere) there may be more
+    return cursor["continue"] is not None if cursor else len(images) >= GALLERY_PAGE_SIZE
 
-def similarity_score(str1, str2):
+def get_gallery_page(species_name, page):
     """
-    Calculate a simple similarity score between two strings
-    based on word overlap. Used to avoid selecting too similar facts.
-    Returns a value between 0 (completely different) and 1 (identical).
+    Return the images on a page of a species gallery and whether more pages
+    follow. Page 0 holds the images from get_species_images; later pages
+    continue the same Commons search GALLERY_PAGE_SIZE images at a time,
+    following MediaWiki continue tokens. Every page is cached with the token
+    for the next one, so paging back or reopening a gallery is free.
     """
-    if not str1 or not str2:
-        return 0
-        
-    # Convert to lowercase and split into words
-    words1 = set(str1.lower().split())
-    words2 = set(str2.lower().split())
-    
-    # Calculate Jaccard similarity
-    intersection = words1.intersection(words2)
-    union = words1.union(words2)
-    
-    if not union:
-        return 0
-        
-    return len(intersection) / len(union)
+    species_name = species_cache.normalize_query(species_name)
+    
+    # The offline bundle only holds the first page
+    if species_bundle.get_offline_bundle() is not None:
+        return (get_species_images(species_name), False) if page == 0 else ([], False)
+    
+    if page == 0:
+        images = get_species_images(species_name)
+        return images, gallery_has_more(species_name, images)
+    
+    cached_page = species_cache.cache_get("gallery", gallery_key(species_name, page))
+    if cached_page is not None:
+        return cached_page["images"], cached_page["continue"] is not None
+    
+    if not is_source_available("Commons"):
+        return [{"error": "Wikimedia Commons is temporarily unavailable."}], True
+    
+    # The previous page holds the continue token leading to this one
+    previous = species_cache.cache_get("gallery", gallery_key(species_name, page - 1), allow_stale=True)
+    if previous is None and page > 1:
+        images, more = get_gallery_page(species_name, page - 1)
+        previous = species_cache.cache_get("gallery", gallery_key(species_name, page - 1), allow_stale=True)
+        if previous is None:
+            # The previous page failed too
+            return images, more
+    if previous is None:
+        # Images cached without the search that found them: search again
+        term = f"file:{species_name}"
+        _, continuation = search_commons_images(term)
+        previous = {"term": term, "continue": continuation}
+        species_cache.cache_put("gallery", gallery_key(species_name, 0), previous)
+    if previous.get("continue") is None:
+        return [], False
+    
+    images, continuation = search_commons_images(previous["term"], continuation=previous["continue"])
+    if any("error" in img for img in images):
+        return images, True
+    species_cache.cache_put("gallery", gallery_key(species_name, page),
+                            {"term": previous["term"], "images": images, "continue": continuation})
+    return images, continuation is not None
 
 def get_mock_species_from_filename(filename):
     """
@@ -1158,186 +1390,5 @@ def get_mock_species_from_filename(filename):
     # If no match is found, return a default species
     return "Homo sapiens"
 
-def extract_wikipedia_classification(full_text, title, search_data=None):
-    """
-    Extract classification/taxonomy information from Wikipedia content.
-    Uses various strategies including infobox parsing, section analysis, and text pattern matching.
-    
-    Args:
-        full_text: The full text content of the Wikipedia page
-        title: The title of the Wikipedia page
-        search_data: Optional search data that might contain additional info
-        
-    Returns:
-        A dictionary with taxonomic ranks and their values
-    """
-    # Initialize with default "Unknown" values
-    classification = {
-        "kingdom": "Unknown",
-        "phylum": "Unknown",
-        "class": "Unknown",
-        "order": "Unknown",
-        "family": "Unknown",
-        "genus": "Unknown",
-        "species": "Unknown"
-    }
-    
-    if not full_text:
-        return classification
-    
-    try:
-        # STRATEGY 1: Look for taxonomic information in specific sections
-        taxonomy_section = extract_wikipedia_section(full_text, ["Taxonomy", "Classification", "Taxonomic", "Scientific classification"])
-        if taxonomy_section:
-            # Extract taxonomic information from the section
-            classification = extract_taxonomy_from_text(taxonomy_section, classification)
-        
-        # STRATEGY 2: Look for taxonomic information in infobox-like structures
-        # Wikipedia infoboxes often appear at the beginning of the text with structured format
-        infobox_patterns = [
-            r"Kingdom:\s*([A-Za-z]+)",
-            r"Phylum:\s*([A-Za-z]+)",
-            r"Class:\s*([A-Za-z]+)",
-            r"Order:\s*([A-Za-z]+)",
-            r"Family:\s*([A-Za-z]+)",
-            r"Genus:\s*([A-Za-z]+)",
-            r"Species:\s*([A-Za-z]+)"
-        ]
-        
-        # Apply each pattern to extract taxonomic information
-        for i, pattern in enumerate(infobox_patterns):
-            rank = list(classification.keys())[i]
-            matches = re.findall(pattern, full_text, re.IGNORECASE)
-            if matches:
-                classification[rank] = matches[0].strip()
-        
-        # STRATEGY 3: Parse the first paragraph for taxonomic information
-        # First paragraphs in Wikipedia often contain taxonomic statements
-        first_para = full_text.split('\n\n')[0] if '\n\n' in full_text else full_text
-        classification = extract_taxonomy_from_text(first_para, classification)
-        
-        # STRATEGY 4: Try to extract genus and species from the title
-        title_parts = title.split()
-        if len(title_parts) >= 2 and classification["genus"] == "Unknown":
-            # If title looks like a binomial name (e.g., "Panthera leo")
-            if title_parts[0][0].isupper() and title_parts[0][1:].islower() and title_parts[1].islower():
-                classification["genus"] = title_parts[0]
-                if classification["species"] == "Unknown":
-                    classification["species"] = title_parts[1]
-        
-        # STRATEGY 5: Look for taxonomic statements throughout the text
-        # These patterns match statements like "belongs to the family Felidae"
-        taxonomy_statement_patterns = [
-            r"(?:belongs|belonging)\s+to\s+(?:the)?\s+kingdom\s+([A-Za-z]+)",
-            r"(?:belongs|belonging)\s+to\s+(?:the)?\s+phylum\s+([A-Za-z]+)",
-            r"(?:belongs|belonging)\s+to\s+(?:the)?\s+class\s+([A-Za-z]+)",
-            r"(?:belongs|belonging)\s+to\s+(?:the)?\s+order\s+([A-Za-z]+)",
-            r"(?:belongs|belonging)\s+to\s+(?:the)?\s+family\s+([A-Za-z]+)",
-            r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+kingdom\s+([A-Za-z]+)",
-            r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+phylum\s+([A-Za-z]+)",
-            r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+class\s+([A-Za-z]+)",
-            r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+order\s+([A-Za-z]+)",
-            r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+family\s+([A-Za-z]+)",
-            r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+genus\s+([A-Za-z]+)"
-        ]
-        
-        # Map patterns to taxonomic ranks
-        rank_map = {
-            0: "kingdom", 1: "phylum", 2: "class", 3: "order", 4: "family",
-            5: "kingdom", 6: "phylum", 7: "class", 8: "order", 9: "family", 10: "genus"
-        }
-        
-        # Apply statement patterns to extract taxonomic information
-        for i, pattern in enumerate(taxonomy_statement_patterns):
-            rank = rank_map.get(i)
-            if not rank:
-                continue
-                
-            matches = re.findall(pattern, full_text, re.IGNORECASE)
-            if matches and classification[rank] == "Unknown":
-                classification[rank] = matches[0].strip()
-        
-        # Final cleanup: ensure proper capitalization and formatting
-        for rank, value in classification.items():
-            if value != "Unknown":
-                # Capitalize first letter for taxonomic ranks
-                classification[rank] = value[0].upper() + value[1:]
-    
-    except Exception as e:
-        print(f"Error extracting classification from Wikipedia: {str(e)}")
-        # If an error occurs, we'll return the classification with whatever data we managed to extract
-    
-    return classification
-
-def extract_taxonomy_from_text(text, classification):
-    """
-    Extract taxonomic information from text using pattern matching
-    and natural language processing techniques.
-    
-    Args:
-        text: The text to analyze
-        classification: The current classification dictionary to update
-        
-    Returns:
-        Updated classification dictionary
-    """
-    if not text:
-        return classification
-    
-    try:
-        # Common patterns for taxonomic ranks in text
-        taxonomy_patterns = {
-            "kingdom": [r"Kingdom:?\s*([A-Za-z]+)", r"Kingdom\s+([A-Za-z]+)", r"a member of the kingdom\s+([A-Za-z]+)"],
-            "phylum": [r"Phylum:?\s*([A-Za-z]+)", r"Phylum\s+([A-Za-z]+)", r"a member of the phylum\s+([A-Za-z]+)"],
-            "class": [r"Class:?\s*([A-Za-z]+)", r"Class\s+([A-Za-z]+)", r"a member of the class\s+([A-Za-z]+)"],
-            "order": [r"Order:?\s*([A-Za-z]+)", r"Order\s+([A-Za-z]+)", r"a member of the order\s+([A-Za-z]+)"],
-        }
-        
-        # For each taxonomic rank, try to find matches using the patterns
-        for rank, patterns in taxonomy_patterns.items():
-            if classification[rank] != "Unknown":
-                continue  # Skip if we already have a value
-                
-            for pattern in patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    # Take the first match and clean it up
-                    match = matches[0].strip()
-                    # Handle Latin taxonomic names with proper capitalization
-                    if rank in ["genus", "species"]:
-                        match = match[0].upper() + match[1:].lower()
-                    elif rank != "species":  # For non-species ranks
-                        match = match.capitalize()
-                    
-                    classification[rank] = match
-                    break  # Stop after finding a match for this rank
-        
-        # Look for taxonomic information with specific taxonomic suffixes
-        suffix_patterns = {
-            "family": [r"\b([A-Za-z]+idae)\b", r"\b([A-Za-z]+aceae)\b"],  # Animal and plant families
-            "order": [r"\b([A-Za-z]+ales)\b", r"\b([A-Za-z]+ida)\b"],  # Plant orders and animal orders
-            "class": [r"\b([A-Za-z]+ia)\b", r"\b([A-Za-z]+phyceae)\b"],  # Classes
-            "phylum": [r"\b([A-Za-z]+phyta)\b", r"\b([A-Za-z]+zoa)\b"]  # Plant and animal phyla
-        }
-        
-        # Apply suffix patterns to extract taxonomic information
-        for rank, patterns in suffix_patterns.items():
-            if classification[rank] != "Unknown":
-                continue  # Skip if we already have a value
-                
-            for pattern in patterns:
-                matches = re.findall(pattern, text)
-                if matches:
-                    # Take the first match and clean it up
-                    match = matches[0].strip()
-                    classification[rank] = match
-                    break
-                
-    except Exception as e:
-        print(f"Error in extract_taxonomy_from_text: {str(e)}")
-        # If an error occurs, return the classification as is
-    
-    return classification
-
 if __name__ == "__main__":
     main()
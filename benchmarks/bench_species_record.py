@@ -0,0 +1,97 @@
+"""
+Compare the compact species record format (species_record.py) with the
+previous dict-as-JSON form: encoded size and encode/decode speed.
+
+    python benchmarks/bench_species_record.py [--iterations 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import species_record  # noqa: E402
+
+
+def sample_card():
+    """
+    A card shaped like a typical get_species_info result before extraction-only
+    fields were dropped: 50 categories, 50 links and "Unknown" placeholders.
+    """
+    return {
+        "title": "Panthera leo",
+        "description": (
+            "The lion (Panthera leo) is a large cat of the genus Panthera, native to Africa and India. "
+            "It has a muscular, broad-chested body; a short, rounded head; round ears; and a hairy tuft "
+            "at the end of its tail."
+        ),
+        "categories": [f"Category:Taxon category number {i}" for i in range(50)],
+        "links": [f"Related taxon page {i}" for i in range(50)],
+        "last_modified": "2024-05-01T12:34:56Z",
+        "classification": {
+            "kingdom": "Animalia", "phylum": "Chordata", "class": "Mammalia", "order": "Carnivora",
+            "family": "Felidae", "genus": "Panthera", "species": "leo", "subfamily": "Pantherinae",
+        },
+        "habitat": "The lion inhabits grasslands, savannahs and shrublands.",
+        "fun_facts": [
+            "The lion is the only cat that lives in groups.",
+            "A lion's roar can be heard up to 8 km away.",
+            "Males weigh up to 250 kg.",
+        ],
+        "data_sources": ["Wikispecies", "Wikipedia"],
+        "missing_sources": {},
+        "skipped_sources": [],
+    }
+
+
+def sample_images():
+    return [
+        {
+            "title": f"File:Lion waiting in Namibia {i}.jpg",
+            "url": f"https://upload.wikimedia.org/wikipedia/commons/7/73/Lion_waiting_in_Namibia_{i}.jpg",
+            "thumb_url": f"https://upload.wikimedia.org/wikipedia/commons/thumb/7/73/Lion_waiting_in_Namibia_{i}.jpg/800px-Lion_waiting_in_Namibia_{i}.jpg",
+            "description": "A lion waiting in Namibia",
+            "author": "<a href=\"https://commons.wikimedia.org/wiki/User:Example\">Example</a>",
+            "license": "cc-by-sa-4.0",
+        }
+        for i in range(10)
+    ]
+
+
+def measure(label, encode, decode, value, iterations):
+    data = encode(value)
+    encode_seconds = timeit.timeit(lambda: encode(value), number=iterations)
+    decode_seconds = timeit.timeit(lambda: decode(data), number=iterations)
+    print(f"{label:<28} {len(data):>8} B {encode_seconds / iterations * 1e6:>10.2f} us {decode_seconds / iterations * 1e6:>10.2f} us")
+    return len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    card = sample_card()
+    images = sample_images()
+
+    def json_encode(value):
+        return json.dumps(value).encode("utf-8")
+
+    def json_decode(data):
+        return json.loads(data)
+
+    print(f"{'format':<28} {'size':>10} {'encode':>13} {'decode':>13}")
+    json_card = measure("card, dict as JSON", json_encode, json_decode, card, args.iterations)
+    record_card = measure("card, species record", species_record.pack_card, species_record.unpack_card, card, args.iterations)
+    json_images = measure("10 images, dict as JSON", json_encode, json_decode, images, args.iterations)
+    record_images = measure("10 images, species record", species_record.pack_images, species_record.unpack_images, images, args.iterations)
+
+    print()
+    print(f"card size:   {record_card / json_card:.0%} of JSON")
+    print(f"images size: {record_images / json_images:.0%} of JSON")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Drive the species search flow at rising concurrency against the local
+Wikimedia stub and report how one instance holds up.
+
+    python benchmarks/loadtest.py [--levels 1,2,4,8,16,32] [--duration 10] [--workers 2]
+                                  [--latency 120] [--error-rate 0.01] [--species 500]
+
+Each level runs the given number of simulated users, spread over --workers
+processes, for --duration seconds. A user search is what the app does on
+"Search": get_species_info followed by get_species_images. Queries are drawn
+from a Zipf-like popularity distribution over --species names, so repeated
+searches hit the cache the way real traffic does. Reported per level:
+searches per second, p50/p95/p99 latency, upstream requests per search
+(amplification, counted by the stub) and the resident memory of each worker.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import string
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import metrics  # noqa: E402
+import wikimedia_stub  # noqa: E402
+
+
+def species_names(count):
+    """
+    Build count distinct binomial names; the first ones are real species so the
+    popular end of the distribution looks like real traffic.
+    """
+    names = ["Panthera leo", "Panthera tigris", "Ursus arctos", "Helianthus annuus", "Apis mellifera"]
+    rng = random.Random(1)
+    while len(names) < count:
+        genus = "".join(rng.choice(string.ascii_lowercase) for _ in range(7)).capitalize()
+        epithet = "".join(rng.choice(string.ascii_lowercase) for _ in range(8))
+        names.append(f"{genus} {epithet}")
+    return names[:count]
+
+
+def rss_bytes():
+    """
+    Return this process' resident set size.
+    """
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def run_worker(users, duration, names, weights, seed):
+    """
+    Run users search loops in this worker process for duration seconds.
+    Returns (latencies, errors, rss bytes).
+    """
+    # Imported here so the stub's environment variables are already in place
+    from app import get_species_images, get_species_info
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def user(user_seed):
+        rng = random.Random(user_seed)
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            started = time.monotonic()
+            card = get_species_info(name)
+            get_species_images(name)
+            elapsed = time.monotonic() - started
+            with lock:
+                latencies.append(elapsed)
+                if card.get("error"):
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=user, args=(seed * 1000 + i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], rss_bytes()
+
+
+def stub_requests(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+        return json.load(response)["total"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="comma-separated numbers of concurrent users")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--workers", type=int, default=2, help="app worker processes")
+    parser.add_argument("--species", type=int, default=500, help="distinct species queried")
+    parser.add_argument("--zipf", type=float, default=1.1, help="popularity skew of the queries")
+    parser.add_argument("--latency", type=float, default=120, help="stub latency in milliseconds")
+    parser.add_argument("--jitter", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=1000,
+                        help="upstream requests per second allowed by the rate governor")
+    args = parser.parse_args()
+
+    server = wikimedia_stub.start_stub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    port = server.server_port
+
+    # Workers inherit these: the stub endpoints, a private rate governor state
+    # and no background work competing with the measured searches
+    os.environ.update(wikimedia_stub.api_environment(port))
+    os.environ.update({
+        "WILDCARDS_RATE_LIMIT": str(args.rate_limit),
+        "WILDCARDS_RATE_BURST": str(args.rate_limit),
+        "WILDCARDS_RATE_STATE_DIR": tempfile.mkdtemp(prefix="wildcards-loadtest-"),
+        "WILDCARDS_PREFETCH": "0",
+        "WILDCARDS_WARM_CACHE": "0",
+        "WILDCARDS_REFRESH": "0",
+    })
+
+    names = species_names(args.species)
+    weights = [1 / (rank ** args.zipf) for rank in range(1, len(names) + 1)]
+    levels = [int(level) for level in args.levels.split(",")]
+
+    print(f"{'users':>5} {'searches/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'upstream/search':>15} {'errors':>6} {'RSS MB/worker':>14}")
+
+    # The same worker processes (and so the same caches) carry over from level
+    # to level, like a long-running server
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.workers) as pool:
+        for users in levels:
+            per_worker = [users // args.workers + (1 if i < users % args.workers else 0) for i in range(args.workers)]
+            before = stub_requests(port)
+            started = time.monotonic()
+            results = pool.starmap(run_worker, [
+                (count, args.duration, names, weights, users * 100 + i)
+                for i, count in enumerate(per_worker) if count
+            ])
+            elapsed = time.monotonic() - started
+            upstream = stub_requests(port) - before
+
+            latencies = [latency for result in results for latency in result[0]]
+            errors = sum(result[1] for result in results)
+            searches = len(latencies)
+            rss = [result[2] / 2 ** 20 for result in results]
+            print(
+                f"{users:>5} {searches / elapsed:>10.1f} "
+                f"{metrics.percentile(latencies, 0.50) * 1000:>8.0f} "
+                f"{metrics.percentile(latencies, 0.95) * 1000:>8.0f} "
+                f"{metrics.percentile(latencies, 0.99) * 1000:>8.0f} "
+                f"{upstream / max(searches, 1):>15.2f} {errors:>6} "
+                f"{' '.join(f'{value:.0f}' for value in rss):>14}"
+            )
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
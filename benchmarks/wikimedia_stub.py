@@ -0,0 +1,309 @@
+"""
+Local stand-in for the Wikispecies, Wikipedia and Commons APIs, for load
+tests and for trying the cache refresher without touching Wikimedia.
+
+    python benchmarks/wikimedia_stub.py [--port 8800] [--latency 120] [--jitter 40]
+                                        [--error-rate 0.01] [--payloads DIR] [--record]
+
+Point the app at it with:
+
+    WILDCARDS_WIKISPECIES_API=http://127.0.0.1:8800/wikispecies/w/api.php
+    WILDCARDS_WIKIPEDIA_API=http://127.0.0.1:8800/wikipedia/w/api.php
+    WILDCARDS_COMMONS_API=http://127.0.0.1:8800/commons/w/api.php
+
+Every query gets a synthetic response shaped like the real API's. With
+--payloads, responses recorded earlier in DIR are served instead where one
+exists for the query; with --record as well, queries that have no recording
+are forwarded to the real API once and saved. GET /stats returns request
+counts per source, and POST /stats/reset clears them.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+UPSTREAM = {
+    "wikispecies": "https://species.wikimedia.org/w/api.php",
+    "wikipedia": "https://en.wikipedia.org/w/api.php",
+    "commons": "https://commons.wikimedia.org/w/api.php",
+}
+
+# Parameters that don't change what a query returns, left out of payload keys
+IGNORED_PARAMS = {"format", "utf8", "curtimestamp"}
+
+# Images an image search finds in total, served a page at a time
+SEARCH_RESULTS = 30
+
+# Children of every taxon in the category tree
+TAXON_CHILDREN = 150
+
+SECTION_TEXT = (
+    "The {name} is found in tropical forests, grasslands and wetlands across several regions. "
+    "It is known for its remarkable ability to adapt, and unlike most relatives it can survive long dry seasons. "
+    "Adults typically measure 1.5 m in length and weigh up to 120 kg. "
+    "Females give birth to two or three young after a gestation of about 110 days. "
+)
+
+
+class StubState:
+    """
+    Settings and counters shared by every request handler thread.
+    """
+
+    def __init__(self, latency, jitter, error_rate, change_rate, payloads, record, article_sections):
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.change_rate = change_rate
+        self.payloads = payloads
+        self.record = record
+        self.article_sections = article_sections
+        self.revision = 1000
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, total=sum(self.counts.values()))
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+
+def payload_path(directory, source, params):
+    query = sorted((key, value) for key, value in params.items() if key not in IGNORED_PARAMS)
+    digest = hashlib.sha1(json.dumps(query).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"{source}-{digest}.json")
+
+
+def now_timestamp():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def page_id(title):
+    return int(hashlib.sha1(title.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def synthetic_response(state, source, params):
+    """
+    Build a response shaped like the real API's for the queries the app sends.
+    """
+    response = {"batchcomplete": ""}
+    if "curtimestamp" in params:
+        response["curtimestamp"] = now_timestamp()
+    query = {}
+
+    if params.get("list") == "search":
+        term = params.get("srsearch", "")
+        query["search"] = [{"ns": 0, "title": term}]
+    elif params.get("list") == "recentchanges":
+        # A few random pages change between polls
+        changes = []
+        if random.random() < state.change_rate:
+            changes.append({"type": "edit", "ns": int(params.get("rcnamespace", 0)), "title": "Panthera leo"})
+        query["recentchanges"] = changes
+    elif params.get("list") == "categorymembers":
+        # Every taxon has TAXON_CHILDREN children: subtaxa, or species below
+        # the fourth level
+        taxon = params.get("cmtitle", "").replace("Category:", "")
+        limit = int(params.get("cmlimit", 10))
+        offset = int(params.get("cmcontinue", 0))
+        leaf = taxon.count("-") >= 3
+        members = []
+        for i in range(offset, min(offset + limit, TAXON_CHILDREN)):
+            if leaf:
+                members.append({"ns": 0, "title": f"{taxon.split('-')[0]} species{i + 1}"})
+            else:
+                members.append({"ns": 14, "title": f"Category:{taxon}-{i + 1}"})
+        query["categorymembers"] = members
+        if offset + limit < TAXON_CHILDREN:
+            response["continue"] = {"cmcontinue": str(offset + limit), "continue": "-||"}
+    elif params.get("generator") == "search":
+        term = params.get("gsrsearch", "").replace(" filetype:bitmap", "").replace("file:", "")
+        limit = int(params.get("gsrlimit", 10))
+        offset = int(params.get("gsroffset", 0))
+        pages = {}
+        for i in range(offset, min(offset + limit, SEARCH_RESULTS)):
+            name = f"{term} {i + 1}.jpg".replace(" ", "_")
+            pages[str(page_id(name))] = {
+                "ns": 6,
+                "index": i + 1,
+                "title": f"File:{term} {i + 1}.jpg",
+                "imageinfo": [{
+                    "url": f"https://upload.wikimedia.org/wikipedia/commons/a/ab/{name}",
+                    "thumburl": f"https://upload.wikimedia.org/wikipedia/commons/thumb/a/ab/{name}/800px-{name}",
+                    "extmetadata": {
+                        "ImageDescription": {"value": f"A photograph of {term}"},
+                        "Artist": {"value": "Stub Photographer"},
+                        "License": {"value": "cc-by-sa-4.0"},
+                    },
+                }],
+            }
+        query["pages"] = pages
+        if offset + limit < SEARCH_RESULTS:
+            response["continue"] = {"gsroffset": offset + limit, "continue": "gsroffset||"}
+    elif "titles" in params:
+        pages = {}
+        props = params.get("prop", "").split("|")
+        with state.lock:
+            state.revision += 1
+            revision = state.revision
+        for title in params["titles"].split("|"):
+            page = {"ns": 0, "title": title, "touched": now_timestamp(), "lastrevid": revision}
+            genus = title.split()[0]
+            if "extracts" in props:
+                if source == "wikipedia" and not params.get("exintro"):
+                    sections = [SECTION_TEXT.format(name=title)]
+                    for heading in ("Taxonomy", "Description", "Distribution and habitat", "Behaviour", "Reproduction"):
+                        sections.append(f"\n\n== {heading} ==\n" + SECTION_TEXT.format(name=title) * state.article_sections)
+                    page["extract"] = "".join(sections)
+                else:
+                    page["extract"] = SECTION_TEXT.format(name=title)
+            if "categories" in props:
+                page["categories"] = [
+                    {"ns": 14, "title": f"Category:{name}"}
+                    for name in ("Animalia", "Chordata", "Mammalia", "Carnivora", "Felidae", genus)
+                ]
+            if "langlinks" in props:
+                page["langlinks"] = [{"lang": lang, "*": f"{title} [{lang}]"} for lang in ("bn", "de", "hi", "te")]
+            if "links" in props:
+                page["links"] = [{"ns": 0, "title": f"{genus} {epithet}"} for epithet in ("alpha", "beta", "gamma")]
+            pages[str(page_id(title))] = page
+        query["pages"] = pages
+
+    response["query"] = query
+    return response
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            self.send_json(200, self.state.stats())
+            return
+
+        source = url.path.strip("/").split("/", 1)[0]
+        if source not in UPSTREAM:
+            self.send_error(404)
+            return
+        params = dict(parse_qsl(url.query))
+        self.state.count(source)
+
+        # Simulated upstream latency and failures
+        delay = self.state.latency + random.uniform(-self.state.jitter, self.state.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < self.state.error_rate:
+            self.send_json(503, {"error": {"code": "stub-unavailable", "info": "Simulated failure"}})
+            return
+
+        self.send_json(200, self.response_for(source, params))
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/stats/reset":
+            self.state.reset()
+            self.send_json(200, {})
+        else:
+            self.send_error(404)
+
+    def response_for(self, source, params):
+        state = self.state
+        if not state.payloads:
+            return synthetic_response(state, source, params)
+
+        path = payload_path(state.payloads, source, params)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        if state.record:
+            data = requests.get(UPSTREAM[source], params=params, timeout=(3.05, 8)).json()
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            return data
+        return synthetic_response(state, source, params)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, latency=120, jitter=40, error_rate=0.0, change_rate=0.1,
+               payloads=None, record=False, article_sections=4):
+    """
+    Start the stub on a daemon thread and return the server; its base URL is
+    http://127.0.0.1:<server.server_port>.
+    """
+    if payloads:
+        os.makedirs(payloads, exist_ok=True)
+    handler = type("Handler", (StubHandler,), {
+        "state": StubState(latency, jitter, error_rate, change_rate, payloads, record, article_sections),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="wikimedia-stub", daemon=True).start()
+    return server
+
+
+def api_environment(port):
+    """
+    Return the environment variables that point the app at a stub on port.
+    """
+    base = f"http://127.0.0.1:{port}"
+    return {
+        "WILDCARDS_WIKISPECIES_API": f"{base}/wikispecies/w/api.php",
+        "WILDCARDS_WIKIPEDIA_API": f"{base}/wikipedia/w/api.php",
+        "WILDCARDS_COMMONS_API": f"{base}/commons/w/api.php",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=120, help="mean response latency in milliseconds")
+    parser.add_argument("--jitter", type=float, default=40, help="latency varies by up to this many milliseconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument("--change-rate", type=float, default=0.1, help="chance a recent-changes poll reports an edit")
+    parser.add_argument("--article-sections", type=int, default=4, help="paragraphs per Wikipedia article section")
+    parser.add_argument("--payloads", help="directory of recorded responses")
+    parser.add_argument("--record", action="store_true", help="record missing payloads from the real API")
+    args = parser.parse_args()
+    if args.record and not args.payloads:
+        parser.error("--record needs --payloads")
+
+    server = start_stub(args.port, args.latency, args.jitter, args.error_rate, args.change_rate,
+                        args.payloads, args.record, args.article_sections)
+    for name, value in api_environment(server.server_port).items():
+        print(f"{name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
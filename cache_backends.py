@@ -0,0 +1,259 @@
+import json
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+# Storage backends for species_cache. Every backend stores (expires_at, value)
+# per (namespace, key) and offers short leases, so that only one caller at a
+# time fills a missing entry (see species_cache.get_or_fill).
+#
+#   memory://                   per-process (the default)
+#   sqlite:////srv/cache.db     shared by every process on the host
+#   redis://cache-host:6379/0   shared by every host (needs the redis package)
+#
+# Shared backends keep expired entries this long as a fallback for when a
+# source is unavailable
+STALE_KEEP_SECONDS = 7 * 24 * 60 * 60
+
+
+class MemoryBackend:
+    """
+    Per-process cache: one LRU-ordered dictionary per namespace.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        with self._lock:
+            entries = self._entries.get(namespace)
+            if not entries or key not in entries:
+                return None
+            entries.move_to_end(key)
+            return entries[key]
+
+    def put(self, namespace, key, value, expires_at):
+        with self._lock:
+            entries = self._entries.setdefault(namespace, OrderedDict())
+            entries[key] = (expires_at, value)
+            entries.move_to_end(key)
+            # Evict the least recently used entries
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def keys(self, namespace):
+        with self._lock:
+            return list(self._entries.get(namespace, ()))
+
+    def set_expiry(self, namespace, key, expires_at):
+        with self._lock:
+            entries = self._entries.get(namespace)
+            if entries and key in entries:
+                entries[key] = (expires_at, entries[key][1])
+
+    def acquire_lease(self, namespace, key, owner, seconds):
+        now = time.time()
+        with self._lock:
+            holder = self._leases.get((namespace, key))
+            if holder and holder[1] > now and holder[0] != owner:
+                return False
+            self._leases[(namespace, key)] = (owner, now + seconds)
+            return True
+
+    def release_lease(self, namespace, key, owner):
+        with self._lock:
+            if self._leases.get((namespace, key), (None,))[0] == owner:
+                del self._leases[(namespace, key)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._leases.clear()
+
+
+def _encode(value):
+    # Packed species records are stored as-is, anything else as JSON
+    if isinstance(value, bytes):
+        return b"B" + value
+    return b"J" + json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def _decode(data):
+    data = bytes(data)
+    if data[:1] == b"B":
+        return data[1:]
+    return json.loads(data[1:])
+
+
+class SQLiteBackend:
+    """
+    Cache in a SQLite database in WAL mode, shared by every process that opens
+    the same file. WAL needs shared memory, so the processes must be on one
+    host (a volume mounted by several containers works, a network file
+    system does not); use RedisBackend across hosts.
+    """
+
+    # Entries beyond max_entries are pruned once every this many writes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._db().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT, key TEXT, expires_at REAL, value BLOB,
+                PRIMARY KEY (namespace, key)
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                namespace TEXT, key TEXT, owner TEXT, expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            );
+            """
+        )
+
+    def _db(self):
+        # sqlite3 connections can't be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, namespace, key):
+        row = self._db().execute(
+            "SELECT expires_at, value FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return (row[0], _decode(row[1])) if row else None
+
+    def put(self, namespace, key, value, expires_at):
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (namespace, key, expires_at, _encode(value))
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            # Drop long-expired entries, then the ones closest to expiry
+            # beyond the size limit
+            db.execute("DELETE FROM entries WHERE expires_at < ?", (time.time() - STALE_KEEP_SECONDS,))
+            db.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key IN ("
+                "SELECT key FROM entries WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (namespace, namespace, self.max_entries),
+            )
+
+    def keys(self, namespace):
+        rows = self._db().execute("SELECT key FROM entries WHERE namespace = ?", (namespace,))
+        return [row[0] for row in rows]
+
+    def set_expiry(self, namespace, key, expires_at):
+        self._db().execute(
+            "UPDATE entries SET expires_at = ? WHERE namespace = ? AND key = ?", (expires_at, namespace, key)
+        )
+
+    def acquire_lease(self, namespace, key, owner, seconds):
+        now = time.time()
+        # One atomic statement: take the lease if it is free, expired or ours
+        cursor = self._db().execute(
+            "INSERT INTO leases VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at <= ? OR leases.owner = excluded.owner",
+            (namespace, key, owner, now + seconds, now),
+        )
+        return cursor.rowcount == 1
+
+    def release_lease(self, namespace, key, owner):
+        self._db().execute(
+            "DELETE FROM leases WHERE namespace = ? AND key = ? AND owner = ?", (namespace, key, owner)
+        )
+
+    def clear(self):
+        self._db().executescript("DELETE FROM entries; DELETE FROM leases;")
+
+
+class RedisBackend:
+    """
+    Cache on a Redis (or Redis-protocol) server, shared by every host. Redis'
+    own maxmemory policy bounds its size.
+    """
+
+    PREFIX = "wildcards:"
+
+    _expiry = struct.Struct("<d")
+
+    # Deletes a lease only if it is still held by the caller
+    _RELEASE_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("del", KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("A redis:// cache URL needs the redis package (pip install redis)") from e
+        self._redis = redis.Redis.from_url(url)
+        self._release = self._redis.register_script(self._RELEASE_SCRIPT)
+
+    def _key(self, namespace, key):
+        return f"{self.PREFIX}{namespace}:{key}"
+
+    def get(self, namespace, key):
+        data = self._redis.get(self._key(namespace, key))
+        if data is None:
+            return None
+        (expires_at,) = self._expiry.unpack_from(data)
+        return expires_at, _decode(data[self._expiry.size:])
+
+    def put(self, namespace, key, value, expires_at):
+        keep_ms = int((expires_at - time.time() + STALE_KEEP_SECONDS) * 1000)
+        self._redis.set(self._key(namespace, key), self._expiry.pack(expires_at) + _encode(value), px=max(keep_ms, 1))
+
+    def keys(self, namespace):
+        prefix = self._key(namespace, "")
+        return [key.decode("utf-8")[len(prefix):] for key in self._redis.scan_iter(match=prefix + "*", count=500)]
+
+    def set_expiry(self, namespace, key, expires_at):
+        entry = self.get(namespace, key)
+        if entry is not None:
+            self.put(namespace, key, entry[1], expires_at)
+
+    def acquire_lease(self, namespace, key, owner, seconds):
+        lease = f"{self.PREFIX}lease:{namespace}:{key}"
+        if self._redis.set(lease, owner, nx=True, px=int(seconds * 1000)):
+            return True
+        return self._redis.get(lease) == owner.encode("utf-8")
+
+    def release_lease(self, namespace, key, owner):
+        self._release(keys=[f"{self.PREFIX}lease:{namespace}:{key}"], args=[owner])
+
+    def clear(self):
+        for key in self._redis.scan_iter(match=self.PREFIX + "*", count=500):
+            self._redis.delete(key)
+
+
+def backend_from_url(url, max_entries):
+    """
+    Create the backend for a WILDCARDS_CACHE_URL value.
+    """
+    parsed = urlparse(url or "memory://")
+    if parsed.scheme == "memory":
+        return MemoryBackend(max_entries)
+    if parsed.scheme == "sqlite":
+        # sqlite:////abs/path.db or sqlite:///relative/path.db
+        return SQLiteBackend(url[len("sqlite:///"):], max_entries)
+    if parsed.scheme in ("redis", "rediss", "unix"):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported cache URL: {url}")
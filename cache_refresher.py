@@ -0,0 +1,255 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import metrics
+import rate_governor
+import species_cache
+from wikimedia_api import API_URLS, is_source_available, wikimedia_get_json
+
+# Set WILDCARDS_REFRESH=0 to leave cached cards to their TTL alone
+ENABLED = os.environ.get("WILDCARDS_REFRESH", "1") != "0"
+
+# Seconds between two refresh rounds
+POLL_INTERVAL = int(os.environ.get("WILDCARDS_REFRESH_INTERVAL", "300"))
+
+# Titles per prop=info query (the API limit for anonymous clients)
+TITLES_PER_QUERY = 50
+
+# Pages of recent changes read per round; beyond that, comparing the revisions
+# of the cached titles directly is cheaper
+MAX_CHANGE_PAGES = 5
+
+# Namespaces our cached titles live in: articles, and File: pages on Commons
+NAMESPACES = {
+    "Wikispecies": 0,
+    "Wikipedia": 0,
+    "Commons": 6,
+}
+
+# Server timestamp each source's recent changes were last read up to
+_last_poll = {}
+_lock = threading.Lock()
+_started = False
+
+
+def recent_changes(source, since):
+    """
+    Return the titles changed on a source since a server timestamp, or None if
+    there were more changes than MAX_CHANGE_PAGES can list.
+    """
+    params = {
+        "action": "query",
+        "list": "recentchanges",
+        "rcstart": since,
+        "rcdir": "newer",
+        "rcnamespace": NAMESPACES[source],
+        "rcprop": "title",
+        "rctype": "edit|new|log",  # log covers deletions and moves
+        "rclimit": 500,
+    }
+    titles = set()
+    for _ in range(MAX_CHANGE_PAGES):
+        data = wikimedia_get_json(API_URLS[source], params, call=f"{source.lower()}.recentchanges")
+        titles.update(change["title"] for change in data.get("query", {}).get("recentchanges", []))
+        if "continue" not in data:
+            return titles
+        params.update(data["continue"])
+    return None
+
+
+def current_revisions(source, titles):
+    """
+    Return the latest revision id of each title (0 for missing pages),
+    looked up TITLES_PER_QUERY titles at a time. Also returns the server time
+    of the first query, to start polling recent changes from.
+    """
+    revisions = {}
+    server_time = None
+    titles = list(titles)
+    for start in range(0, len(titles), TITLES_PER_QUERY):
+        params = {
+            "action": "query",
+            "titles": "|".join(titles[start:start + TITLES_PER_QUERY]),
+            "prop": "info",
+            "curtimestamp": 1,
+        }
+        data = wikimedia_get_json(API_URLS[source], params, call=f"{source.lower()}.info")
+        server_time = server_time or data.get("curtimestamp")
+
+        # Map normalized titles back to the ones we asked for
+        query = data.get("query", {})
+        asked = {entry["to"]: entry["from"] for entry in query.get("normalized", [])}
+        for page in query.get("pages", {}).values():
+            title = page.get("title", "")
+            revisions[asked.get(title, title)] = page.get("lastrevid", 0)
+    return revisions, server_time
+
+
+def _server_time(source):
+    data = wikimedia_get_json(API_URLS[source], {"action": "query", "curtimestamp": 1}, call=f"{source.lower()}.info")
+    return data["curtimestamp"]
+
+
+def changed_titles(source, pages):
+    """
+    Return the titles in pages ({title: [(key, revision id), ...]}) that
+    changed since they were cached, or None if that can't be told this round.
+
+    Recent changes are polled when the previous round left a starting point;
+    otherwise (or if too much changed) the revisions of the cached titles are
+    compared directly. Commons images carry no revision ids, so they can only
+    be checked through recent changes.
+    """
+    since = _last_poll.get(source)
+    if since:
+        # Read the server clock first so nothing between the two is missed
+        next_since = _server_time(source)
+        changes = recent_changes(source, since)
+        if changes is not None:
+            _last_poll[source] = next_since
+            return changes & pages.keys()
+
+    if source == "Commons":
+        _last_poll[source] = _server_time(source)
+        return None
+
+    revisions, next_since = current_revisions(source, pages)
+    _last_poll[source] = next_since
+    return {
+        title for title, cached in pages.items()
+        if any(revid != revisions.get(title) for _, revid in cached)
+    }
+
+
+def refresh_once(fetch_card, fetch_images):
+    """
+    Run one refresh round over everything in the species cache: find the
+    cached species whose source pages changed and re-fetch only those, with
+    fetch_card and fetch_images (called with the query). Species confirmed
+    unchanged get their TTL renewed instead of being re-fetched when it runs
+    out. Returns a summary of the round.
+    """
+    started = time.monotonic()
+
+    # Index the cached species by the source pages they were built from
+    pages = {source: {} for source in NAMESPACES}
+    for key in species_cache.cached_keys("card"):
+        card = species_cache.get_card(key, allow_stale=True)
+        for source, revision in (card or {}).get("revisions", {}).items():
+            pages[source].setdefault(revision["title"], []).append((key, revision["revid"]))
+    for key in species_cache.cached_keys("images"):
+        for image in species_cache.get_images(key, allow_stale=True) or []:
+            pages["Commons"].setdefault(image["title"], []).append((key, None))
+
+    changed = {"card": set(), "images": set()}
+    checked = {"card": set(), "images": set()}
+    unchecked = {"card": set(), "images": set()}
+    for source, source_pages in pages.items():
+        if not source_pages:
+            continue
+        namespace = "images" if source == "Commons" else "card"
+        keys = {key for cached in source_pages.values() for key, _ in cached}
+        titles = None
+        if is_source_available(source):
+            try:
+                with rate_governor.request_priority(rate_governor.BATCH):
+                    titles = changed_titles(source, source_pages)
+            except Exception as e:
+                print(f"Error checking {source} for changes: {str(e)}")
+        if titles is None:
+            unchecked[namespace].update(keys)
+            continue
+        checked[namespace].update(keys)
+        for title in titles:
+            changed[namespace].update(key for key, _ in source_pages[title])
+
+    # Re-fetch and re-parse the changed species only
+    with rate_governor.request_priority(rate_governor.BATCH):
+        for key in changed["card"]:
+            species_cache.expire("card", key)
+            fetch_card(key)
+        for key in changed["images"]:
+            species_cache.expire("images", key)
+            fetch_images(key)
+
+    # Species whose every source was checked and found unchanged are current
+    renewed = 0
+    for namespace in ("card", "images"):
+        for key in checked[namespace] - changed[namespace] - unchecked[namespace]:
+            species_cache.renew(namespace, key)
+            renewed += 1
+
+    summary = {
+        "refreshed_cards": len(changed["card"]),
+        "refreshed_images": len(changed["images"]),
+        "renewed": renewed,
+        "seconds": time.monotonic() - started,
+    }
+    metrics.increment("cache_refresher.rounds")
+    metrics.increment("cache_refresher.refreshed", summary["refreshed_cards"] + summary["refreshed_images"])
+    metrics.increment("cache_refresher.renewed", renewed)
+    metrics.observe("cache_refresher.round_seconds", summary["seconds"])
+    return summary
+
+
+def start_background_refresh(fetch_card, fetch_images, interval=POLL_INTERVAL):
+    """
+    Run a refresh round every interval seconds on a daemon thread, once per
+    process. Safe to call on every Streamlit rerun.
+    """
+    global _started
+    if not ENABLED:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                refresh_once(fetch_card, fetch_images)
+            except Exception as e:
+                metrics.increment("cache_refresher.errors")
+                print(f"Error refreshing the species cache: {str(e)}")
+
+    threading.Thread(target=run, name="cache-refresher", daemon=True).start()
+
+
+def main(argv=None):
+    """
+    Command line: look species up, then run refresh rounds and report what
+    changed. Point the WILDCARDS_*_API variables at the stub server in
+    benchmarks/ to try it without touching Wikimedia.
+
+        python cache_refresher.py "Panthera leo" "Apis mellifera" --rounds 3 --interval 10
+    """
+    parser = argparse.ArgumentParser(description="Refresh cached species whose source pages changed.")
+    parser.add_argument("names", nargs="+")
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    # The lookup functions live in the Streamlit app module
+    from app import get_species_images, get_species_info, prefetch_species
+
+    for name in args.names:
+        prefetch_species(name)
+
+    for round_number in range(1, args.rounds + 1):
+        if round_number > 1:
+            time.sleep(args.interval)
+        summary = refresh_once(get_species_info, get_species_images)
+        print(
+            f"Round {round_number}: {summary['refreshed_cards']} cards and {summary['refreshed_images']} "
+            f"image lists refreshed, {summary['renewed']} renewed in {summary['seconds']:.2f}s"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
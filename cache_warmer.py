@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import metrics
+import rate_governor
+import wikimedia_api
+
+# Popularity list: one species per line, most popular first, "#" for comments
+POPULAR_SPECIES_FILE = os.environ.get(
+    "WILDCARDS_POPULAR_SPECIES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "popular_species.txt"),
+)
+
+# Set WILDCARDS_WARM_CACHE=0 to skip the warm-up at server start
+ENABLED = os.environ.get("WILDCARDS_WARM_CACHE", "1") != "0"
+
+# Species fetched at the same time during warm-up
+WARM_THREADS = int(os.environ.get("WILDCARDS_WARM_THREADS", "4"))
+
+# Port of the health check endpoint; 0 turns it off
+HEALTH_PORT = int(os.environ.get("WILDCARDS_HEALTH_PORT", "8502"))
+
+_status = {
+    "state": "idle",  # idle, warming or ready
+    "total": 0,
+    "done": 0,
+    "failed": 0,
+    "seconds_to_ready": None,
+}
+_lock = threading.Lock()
+_started = False
+_health_server = None
+
+
+def load_popular_species(path=POPULAR_SPECIES_FILE):
+    """
+    Read the popularity list, skipping blank lines, comments and duplicates.
+    Returns an empty list if the file doesn't exist.
+    """
+    names = []
+    seen = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                name = line.split("#", 1)[0].strip()
+                if name and name.casefold() not in seen:
+                    seen.add(name.casefold())
+                    names.append(name)
+    except FileNotFoundError:
+        print(f"No popular species list at {path}, nothing to warm")
+    return names
+
+
+def warm_cache(names, fetch, threads=WARM_THREADS, progress=None):
+    """
+    Fetch and parse the given species in parallel so their cards and images
+    are cached before the first user asks for them. fetch is called with
+    each species name and may return the species card, whose "error" entry
+    counts as a failure; progress, if given, is called as (done, total, name)
+    after each one. Returns the number of seconds it took to become ready.
+    """
+    started = time.monotonic()
+    with _lock:
+        _status.update(state="warming", total=len(names), done=0, failed=0, seconds_to_ready=None)
+
+    def warm_one(name):
+        # Warm-up must never crowd out the first real users
+        with rate_governor.request_priority(rate_governor.BATCH):
+            result = fetch(name)
+        if isinstance(result, dict) and result.get("error"):
+            raise RuntimeError(result["error"])
+
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        futures = {executor.submit(warm_one, name): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error warming {name}: {str(e)}")
+                with _lock:
+                    _status["failed"] += 1
+                metrics.increment("cache_warmer.errors")
+            with _lock:
+                _status["done"] += 1
+                done = _status["done"]
+            if progress:
+                progress(done, len(names), name)
+
+    seconds = time.monotonic() - started
+    with _lock:
+        _status.update(state="ready", seconds_to_ready=seconds)
+    metrics.set_gauge("cache_warmer.seconds_to_ready", seconds)
+    return seconds
+
+
+def start_background_warm(fetch, path=POPULAR_SPECIES_FILE):
+    """
+    Start warming the popular species on a background thread, once per
+    process, and start the health check endpoint. Safe to call on every
+    Streamlit rerun.
+    """
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+
+    start_health_server()
+    if not ENABLED:
+        with _lock:
+            _status["state"] = "ready"
+        return
+
+    def run():
+        names = load_popular_species(path)
+        seconds = warm_cache(names, fetch)
+        print(f"Cache warm: {len(names)} species in {seconds:.1f}s ({_status['failed']} failed)")
+
+    threading.Thread(target=run, name="cache-warmer", daemon=True).start()
+
+
+def get_status():
+    """
+    Return a copy of the warm-up progress.
+    """
+    with _lock:
+        return dict(_status)
+
+
+def is_ready():
+    return get_status()["state"] == "ready"
+
+
+def get_metrics():
+    """
+    Return the process' metrics (see metrics.py), e.g. the cold-start and
+    first-request timings, the bytes received per Wikimedia call label and
+    the rate governor's queue depth per host and priority, for the /metrics
+    endpoint.
+    """
+    return {
+        **metrics.snapshot(),
+        "transfers": wikimedia_api.get_transfer_stats(),
+        "queues": rate_governor.get_queue_metrics(),
+    }
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            self._send_json(200, get_metrics())
+            return
+        if path not in ("/health", "/healthz"):
+            self.send_error(404)
+            return
+        status = get_status()
+        # Load balancers should only route traffic here once the warm set is in
+        self._send_json(200 if status["state"] == "ready" else 503, status)
+
+    def _send_json(self, code, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Health checks are polled constantly; keep them out of the log
+        pass
+
+
+def start_health_server(port=HEALTH_PORT):
+    """
+    Serve GET /health on a daemon thread: 200 with the warm-up status once
+    ready, 503 while warming. GET /metrics returns get_metrics(). Does
+    nothing if port is 0 or already bound.
+    """
+    global _health_server
+    if not port or _health_server is not None:
+        return _health_server
+    try:
+        _health_server = ThreadingHTTPServer(("0.0.0.0", port), _HealthHandler)
+    except OSError as e:
+        print(f"Health check not started on port {port}: {str(e)}")
+        return None
+    threading.Thread(target=_health_server.serve_forever, name="health-check", daemon=True).start()
+    return _health_server
+
+
+def main(argv=None):
+    """
+    Command line: warm the popular species and report the time to ready.
+    With a shared WILDCARDS_CACHE_URL (see species_cache.py) it fills the
+    cache every replica reads, e.g. once before a deploy. With the default
+    per-process cache it only warms its own process, which is still useful to
+    measure cold-start cost and to check that every listed name resolves.
+
+    Streamlit only runs the app when the first browser session connects, so
+    the app can't warm up or answer /health at deploy time. Run with --serve
+    beside it instead: the health check answers 503 at once, 200 once the
+    shared cache is warm, and stays up until the process is stopped.
+
+        python cache_warmer.py [--file popular_species.txt] [--threads 4] [--serve]
+    """
+    parser = argparse.ArgumentParser(description="Fetch the popular species into the cache.")
+    parser.add_argument("--file", default=POPULAR_SPECIES_FILE, help="popularity list, one species per line")
+    parser.add_argument("--threads", type=int, default=WARM_THREADS)
+    parser.add_argument("--serve", action="store_true",
+                        help="serve the health check on WILDCARDS_HEALTH_PORT while warming and after")
+    args = parser.parse_args(argv)
+
+    names = load_popular_species(args.file)
+    if not names:
+        parser.error("no species to warm")
+
+    if args.serve:
+        import species_cache
+        # A health check for a cache only this process reads would vouch for nothing
+        if urlparse(species_cache.CACHE_URL or "memory://").scheme == "memory":
+            parser.error("--serve needs a shared WILDCARDS_CACHE_URL")
+        with _lock:
+            _status["state"] = "warming"
+        if start_health_server() is None:
+            return 1
+
+    # The lookup functions live in the Streamlit app module
+    from app import prefetch_species
+
+    def report(done, total, name):
+        print(f"[{done}/{total}] {name}")
+
+    seconds = warm_cache(names, prefetch_species, threads=args.threads, progress=report)
+    status = get_status()
+    print(f"Ready in {seconds:.1f}s: {status['done'] - status['failed']} warmed, {status['failed']} failed")
+    if args.serve:
+        threading.Event().wait()
+    return 1 if status["failed"] == status["total"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
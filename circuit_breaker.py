@@ -0,0 +1,123 @@
+import threading
+import time
+
+import metrics
+
+# Defaults for every upstream source
+FAILURE_THRESHOLD = 3  # Consecutive failures (or slow calls) before opening
+LATENCY_THRESHOLD = 4.0  # Seconds; slower successful calls count as failures
+RESET_TIMEOUT = 30.0  # Seconds to stay open before letting a probe through
+
+# Breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a call is refused because the source's breaker is open.
+    """
+
+    def __init__(self, source):
+        super().__init__(f"{source} is temporarily unavailable (circuit open)")
+        self.source = source
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of one upstream source. After too many consecutive
+    errors or slow responses the breaker opens and callers skip the source
+    immediately; once the reset timeout has passed a single probe call is let
+    through, and a successful probe closes the breaker again.
+    """
+
+    def __init__(self, source, failure_threshold=FAILURE_THRESHOLD,
+                 latency_threshold=LATENCY_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.source = source
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """
+        Return True if a call to the source may go ahead right now.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+
+            # In the half-open state only one probe call is allowed at a time
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            return False
+
+    def is_open(self):
+        """
+        Return True if calls would currently be refused, without using up the
+        half-open probe.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at < self.reset_timeout
+            return self.state == HALF_OPEN and self._probe_in_flight
+
+    def record_success(self, latency):
+        """
+        Record a completed call. Calls slower than the latency threshold are
+        treated as failures.
+        """
+        if latency > self.latency_threshold:
+            metrics.increment(f"circuit_breaker.{self.source}.slow_calls")
+            self.record_failure()
+            return
+
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        """
+        Record a failed call (error or timeout).
+        """
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            metrics.increment(f"circuit_breaker.{self.source}.failures")
+
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def _set_state(self, state):
+        # Called with the lock held
+        self.state = state
+        metrics.set_gauge(f"circuit_breaker.{self.source}.state", state)
+        metrics.increment(f"circuit_breaker.{self.source}.transitions.{state}")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(source):
+    """
+    Return the circuit breaker for a source, creating it on first use.
+    """
+    with _breakers_lock:
+        if source not in _breakers:
+            _breakers[source] = CircuitBreaker(source)
+        return _breakers[source]
@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import extraction_runner
+import extractors
+import metrics
+import profiler
+
+# Number of extraction worker processes. Defaults to one per core; set to 0 to
+# run every extraction inline on the calling thread.
+WORKERS = int(os.environ.get("WILDCARDS_EXTRACTION_WORKERS", os.cpu_count() or 1))
+
+# Texts shorter than this many characters are parsed inline, because shipping
+# them to a worker costs more than parsing them
+INLINE_THRESHOLD = int(os.environ.get("WILDCARDS_EXTRACTION_INLINE_CHARS", "4000"))
+
+# Wall-clock limit for one offloaded extraction. The extractors' own CPU-time
+# budgets (see extraction_runner.py) should always end a task well before this.
+TASK_TIMEOUT = 30
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _start_worker():
+    """
+    Initializer for extraction workers: the keyword tables are built when the
+    extractors module is imported, so run each extractor once on a small sample
+    to finish warming the worker before the first real article arrives. Workers
+    run tasks on their main thread, so extractor budgets are enforced there.
+    """
+    extraction_runner.enable_cpu_timer()
+    extractors.analyze_description(
+        "The lion is found in Africa. It is the second largest cat species and lives in groups."
+    )
+
+
+def get_executor():
+    """
+    Return the shared extraction process pool, starting it on first use.
+    Workers are started with forkserver (or spawn) rather than fork, because
+    the Streamlit server process runs many threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=context, initializer=_start_worker)
+        return _executor
+
+
+def run(func, *args, size=None):
+    """
+    Run one extraction function and return its result.
+    The call is sent to a worker process when workers are enabled and the input
+    is large enough (size, in characters); otherwise, or while the request is
+    being profiled, it runs inline.
+    """
+    # Profiled requests parse inline too, so the samples show the extractors
+    if WORKERS <= 0 or (size is not None and size < INLINE_THRESHOLD) or profiler.is_active():
+        metrics.increment("extraction_pool.inline")
+        return _record_events(*extraction_runner.run_task(func, *args))
+
+    try:
+        result = get_executor().submit(extraction_runner.run_task, func, *args).result(timeout=TASK_TIMEOUT)
+        metrics.increment("extraction_pool.offloaded")
+        return _record_events(*result)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        # and parse this input inline so the request still succeeds
+        _reset_executor()
+        metrics.increment("extraction_pool.broken")
+        return _record_events(*extraction_runner.run_task(func, *args))
+    except TimeoutError:
+        # Leave the stuck worker behind and let the caller report the error
+        _reset_executor()
+        metrics.increment("extraction_pool.timeouts")
+        raise
+
+
+def _record_events(result, events):
+    """
+    Count the budget overruns, errors, truncations and defaults of a task's
+    extractors (e.g. extraction.extract_habitat.overruns), then return its
+    result.
+    """
+    for name, event in events:
+        metrics.increment(f"extraction.{name}.{event}")
+    return result
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def shutdown():
+    """
+    Stop the extraction workers.
+    """
+    _reset_executor()
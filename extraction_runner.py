@@ -0,0 +1,183 @@
+import functools
+import signal
+import threading
+import time
+
+# When an extractor runs over budget or fails, it is retried once on the first
+# this many characters of its input before giving up on it
+FALLBACK_CHARS = 5000
+
+_local = threading.local()
+_timer_enabled = False
+
+
+class ExtractionBudgetExceeded(BaseException):
+    """
+    Raised inside an extractor that used up its CPU-time budget. It derives
+    from BaseException so that "except Exception" blocks in the extractors
+    can't swallow it.
+    """
+
+    def __init__(self, budget):
+        super().__init__(budget.name)
+        self.budget = budget
+
+
+class _Budget:
+    __slots__ = ("name", "deadline")
+
+    def __init__(self, name, deadline):
+        self.name = name
+        self.deadline = deadline
+
+
+def enable_cpu_timer():
+    """
+    Enforce budgets by aborting over-budget extractors from a SIGPROF
+    interval timer. Only for extraction worker processes, whose tasks run on
+    the main thread; elsewhere overruns are measured and recorded but the
+    extractor is left to finish (its input-size cap still bounds it).
+    """
+    global _timer_enabled
+    signal.signal(signal.SIGPROF, _on_timer)
+    _timer_enabled = True
+
+
+def _state():
+    if not hasattr(_local, "stack"):
+        _local.stack = []  # budgets being enforced, outermost first
+        _local.events = None  # (extractor, event) pairs while inside run_task
+    return _local
+
+
+def _record(name, event):
+    events = _state().events
+    if events is not None:
+        events.append((name, event))
+
+
+def _arm(stack):
+    """
+    Point the profiling timer at the nearest deadline on the stack.
+    """
+    if not stack:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        return
+    remaining = min(budget.deadline for budget in stack) - time.process_time()
+    signal.setitimer(signal.ITIMER_PROF, max(remaining, 0.001))
+
+
+def _on_timer(signum, frame):
+    stack = _state().stack
+    now = time.process_time()
+    # Abort at the outermost expired budget, so a nested extractor's fallback
+    # can't eat into a caller that is already out of time
+    for budget in stack:
+        if budget.deadline <= now:
+            raise ExtractionBudgetExceeded(budget)
+    _arm(stack)
+
+
+def _call(name, cpu_seconds, func, args, kwargs):
+    """
+    Run func under a CPU-time budget; returns (True, result) or (False, None)
+    if it ran over budget or raised.
+    """
+    if not (_timer_enabled and threading.current_thread() is threading.main_thread()):
+        started = time.thread_time()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            _record(name, "errors")
+            return False, None
+        if time.thread_time() - started > cpu_seconds:
+            _record(name, "overruns")
+        return True, result
+
+    stack = _state().stack
+    budget = _Budget(name, time.process_time() + cpu_seconds)
+    # Keep the timer from firing while the stack is being changed
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGPROF})
+    stack.append(budget)
+    try:
+        try:
+            _arm(stack)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGPROF})
+            return True, func(*args, **kwargs)
+        finally:
+            _pop_budget(stack, budget)
+    except ExtractionBudgetExceeded as e:
+        # The timer can fire after func returns but before the finally block
+        # masks it, skipping the clean-up there; never leave a stale budget
+        # on the stack for later calls to trip over
+        _pop_budget(stack, budget)
+        if e.budget is not budget:
+            raise
+        _record(name, "overruns")
+    except Exception:
+        _record(name, "errors")
+    return False, None
+
+
+def _pop_budget(stack, budget):
+    """
+    Remove a budget from the stack, if still there, and re-arm the timer for
+    the ones left, with the timer masked.
+    """
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGPROF})
+    if budget in stack:
+        stack.remove(budget)
+        _arm(stack)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGPROF})
+
+
+def budgeted(cpu_seconds, max_chars, default):
+    """
+    Decorator giving an extractor (whose first argument is the text) a CPU-time
+    budget and an input-size cap. Longer inputs are cut to max_chars. If the
+    extractor runs over budget or raises, it is retried on the first
+    FALLBACK_CHARS characters, and if that fails too, default (called with
+    the same arguments) provides the result.
+
+    Budgets are only enforced (the extractor aborted) on the main thread of
+    a process that called enable_cpu_timer(), i.e. in extraction worker
+    processes. Inline runs (WILDCARDS_EXTRACTION_WORKERS=0, profiled
+    requests, other threads) only record an overrun once the extractor has
+    finished; there the input-size cap is the only bound on its run time.
+    """
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(text, *args, **kwargs):
+            if text and len(text) > max_chars:
+                text = text[:max_chars]
+                _record(name, "truncated")
+
+            ok, result = _call(name, cpu_seconds, func, (text,) + args, kwargs)
+            if ok:
+                return result
+            if text and len(text) > FALLBACK_CHARS:
+                ok, result = _call(name, cpu_seconds, func, (text[:FALLBACK_CHARS],) + args, kwargs)
+                if ok:
+                    return result
+            _record(name, "defaults")
+            return default(text, *args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def run_task(func, *args):
+    """
+    Run one extraction task and return (result, events), where events lists
+    the (extractor, "overruns" | "errors" | "truncated" | "defaults") pairs
+    that happened during it. Used as the entry point in worker processes, so
+    the parent can record the events in its own metrics.
+    """
+    state = _state()
+    state.events = []
+    try:
+        return func(*args), state.events
+    finally:
+        state.events = None
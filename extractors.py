@@ -0,0 +1,759 @@
+import re
+
+from extraction_runner import budgeted
+
+# The keyword and regex tables below are built once at import time and shared
+# by every call (and by every extraction worker process, see
+# extraction_pool.py).
+
+# Keyword tables for extract_habitat, tried in order
+
+# STRATEGY 1: Direct habitat statements
+# Expanded list of habitat-related keywords and phrases
+HABITAT_KEYWORDS = tuple(keyword.lower() for keyword in [
+    "habitat", "lives in", "found in", "native to", "occurs in", "distribution", 
+    "range includes", "ecosystem", "biome", "environment", "inhabits", "dwelling in",
+    "endemic to", "natural range", "geographical range", "distributed across",
+    "prefers", "thrives in", "flourishes in", "resides in", "habitat type",
+    "commonly found", "typically found", "often found", "usually found", "primarily found"
+])
+
+# STRATEGY 2: Geography and climate context
+# Climate and geography keywords to catch broader context
+CLIMATE_KEYWORDS = tuple(keyword.lower() for keyword in [
+    "tropical", "temperate", "polar", "arctic", "antarctic", "desert", 
+    "rainforest", "forest", "jungle", "grassland", "savanna", "wetland", 
+    "marsh", "swamp", "mountain", "alpine", "coastal", "marine", "freshwater",
+    "ocean", "sea", "river", "lake", "stream", "pond", "terrestrial", "aquatic",
+    "woodland", "meadow", "tundra", "taiga", "steppe", "continent", "island",
+    "shore", "beach", "reef", "cave", "burrow", "nest", "canopy", "undergrowth"
+])
+
+# STRATEGY 3: Regional indicators (continents, regions, countries)
+REGION_KEYWORDS = tuple(keyword.lower() for keyword in [
+    "africa", "asia", "europe", "north america", "south america", "australia", 
+    "antarctica", "oceania", "mediterranean", "pacific", "atlantic", "indian ocean",
+    "arctic ocean", "southern ocean", "northern", "southern", "eastern", "western",
+    "central", "worldwide", "global", "cosmopolitan", "international"
+])
+
+# STRATEGY 4: Verbs that might indicate location or movement patterns
+ACTION_KEYWORDS = tuple(keyword.lower() for keyword in [
+    "migrate", "roam", "travel", "swim", "fly", "climb", "burrow", "dig", "nest", 
+    "breed", "forage", "hunt", "territory", "range"
+])
+
+# Keyword tables for extract_fun_facts
+
+# STRATEGY 1: Identify sentences with interesting keywords
+INTERESTING_KEYWORDS = tuple(keyword.lower() for keyword in [
+    "interesting", "unique", "unusual", "remarkable", "notable", "surprising",
+    "fascinating", "amazing", "extraordinary", "distinctive", "special", "rare",
+    "strange", "curious", "unlike", "peculiar", "odd", "bizarre", "striking",
+    "colorful", "beautiful", "impressive", "popular", "famous", "well-known",
+    "largest", "smallest", "fastest", "slowest", "oldest", "youngest", "only",
+    "record", "discovery", "first", "last", "origin", "discovered", "introduced",
+    "revered", "sacred", "symbol", "iconic", "emblem", "represented", "mythology",
+    "legend", "folklore", "traditional", "cultural", "significance", "historical"
+])
+
+# STRATEGY 2: Physical characteristics and biology often make good facts
+BIOLOGY_KEYWORDS = tuple(keyword.lower() for keyword in [
+    "lifespan", "longevity", "size", "weight", "height", "length", "wingspan",
+    "color", "pattern", "marking", "appearance", "physical", "morphology", "anatomy",
+    "feature", "characteristic", "distinctive", "body", "shape", "structure",
+    "adaptation", "evolved", "evolution", "mutation", "gene", "genetic", "chromosome",
+    "hybrid", "species", "subspecies", "variety", "breed", "strain", "extinct",
+    "endangered", "threatened", "vulnerable", "conservation", "protected"
+])
+
+# STRATEGY 3: Behavior and lifestyle information
+BEHAVIOR_KEYWORDS = tuple(keyword.lower() for keyword in [
+    "diet", "eat", "feeding", "food", "prey", "predator", "hunt", "scavenge",
+    "forage", "graze", "browse", "omnivore", "carnivore", "herbivore", "insectivore",
+    "behavior", "behaviour", "habit", "activity", "social", "solitary", "group",
+    "herd", "flock", "pack", "colony", "community", "family", "nocturnal", "diurnal",
+    "crepuscular", "migrate", "migration", "hibernate", "hibernation", "estivate",
+    "dormant", "sleep", "rest", "active", "territory", "defend", "aggressive",
+    "docile", "tame", "wild", "domestic", "domesticated", "trained", "human"
+])
+
+# STRATEGY 4: Reproduction is always interesting
+REPRODUCTION_KEYWORDS = tuple(keyword.lower() for keyword in [
+    "reproduce", "reproduction", "breeding", "mate", "mating", "courtship", "display",
+    "attract", "offspring", "young", "juvenile", "infant", "baby", "child", "adult",
+    "egg", "spawn", "birth", "pregnant", "gestation", "incubation", "hatch", "nestling",
+    "fledgling", "litter", "clutch", "brood", "parent", "care", "raise", "nurse", "wean"
+])
+
+# Comparative patterns that often indicate interesting facts
+COMPARATIVE_PATTERNS = tuple(keyword.lower() for keyword in [
+    "more than", "less than", "bigger than", "smaller than", "larger than",
+    "faster than", "slower than", "better than", "worse than", "greater than",
+    "unlike", "similar to", "compared to", "in contrast to", "differs from",
+    "up to", "as many as", "can reach", "can grow", "can live", "known to",
+    "capable of", "able to", "estimated", "approximately", "about", "around"
+])
+
+# Measurement patterns that often indicate interesting statistics
+MEASUREMENT_PATTERNS = tuple(keyword.lower() for keyword in [
+    "cm", "meter", "metre", "kilometer", "kilometre", "feet", "foot", "inch",
+    "kg", "gram", "pound", "ton", "tonne", "year", "month", "week", "day", "hour",
+    "percent", "°C", "°F", "degree", "celsius", "fahrenheit", "temperature", 
+    "speed", "mph", "kph", "knot", "altitude", "depth", "width", "height"
+])
+
+# Habitat keyword tables, in the order extract_habitat tries them
+HABITAT_KEYWORD_STRATEGIES = (HABITAT_KEYWORDS, CLIMATE_KEYWORDS, REGION_KEYWORDS, ACTION_KEYWORDS)
+
+# Fact categories and their keywords, in the order they are tried
+FACT_KEYWORD_STRATEGIES = (
+    ("interesting", INTERESTING_KEYWORDS),
+    ("biological", BIOLOGY_KEYWORDS),
+    ("behavioral", BEHAVIOR_KEYWORDS),
+    ("reproductive", REPRODUCTION_KEYWORDS),
+    ("comparative", COMPARATIVE_PATTERNS),
+)
+
+# Category name prefixes for extract_classification, per rank and language
+CATEGORY_RANK_PATTERNS = {
+    "kingdom": ["kingdom:", "regnum:", "reino:", "regno:", "kingdom ", "regnum ", "reino ", "reino "],
+    "phylum": ["phylum:", "division:", "división:", "divisio:", "phylum ", "division ", "división ", "divisio "],
+    "class": ["class:", "clase:", "classis:", "class ", "clase ", "classis "],
+    "order": ["order:", "orden:", "ordo:", "order ", "orden ", "ordo "],
+    "family": ["family:", "familia:", "family ", "familia "],
+    "genus": ["genus:", "género:", "genero:", "genus ", "género ", "genero "],
+    "species": ["species:", "especie:", "specie:", "species ", "especie ", "specie "]
+}
+TAXONOMIC_RANK_NAMES = ["kingdom", "phylum", "division", "class", "order", "family", "genus", "species"]
+
+# Placeholder results given when a description has nothing to extract, so
+# callers (e.g. the quiz) can tell them from real habitats and facts
+NO_FACTS = "No specific information available for this species in Wikispecies."
+GENERIC_FACT = "This species is documented in Wikispecies, the free species directory."
+NO_HABITAT = "Specific habitat information not available from Wikispecies. Try searching online for more details about this species' natural environment."
+PLACEHOLDER_FACTS = (NO_FACTS, GENERIC_FACT)
+PLACEHOLDER_HABITATS = ("Unknown", NO_HABITAT)
+
+# The main taxonomic ranks, in order
+MAIN_RANKS = ("kingdom", "phylum", "class", "order", "family", "genus", "species")
+
+# Wikipedia section headings ("== Habitat ==")
+SECTION_HEADING = re.compile(r"==\s*([^=]+)\s*==")
+
+# Regexes for extract_wikipedia_classification, as (rank, pattern) pairs
+INFOBOX_PATTERNS = tuple(
+    (rank, re.compile(rf"{rank.capitalize()}:\s*([A-Za-z]+)", re.IGNORECASE))
+    for rank in MAIN_RANKS
+)
+# Statements like "belongs to the family Felidae"
+TAXONOMY_STATEMENT_PATTERNS = tuple(
+    (rank, re.compile(pattern, re.IGNORECASE)) for rank, pattern in [
+        ("kingdom", r"(?:belongs|belonging)\s+to\s+(?:the)?\s+kingdom\s+([A-Za-z]+)"),
+        ("phylum", r"(?:belongs|belonging)\s+to\s+(?:the)?\s+phylum\s+([A-Za-z]+)"),
+        ("class", r"(?:belongs|belonging)\s+to\s+(?:the)?\s+class\s+([A-Za-z]+)"),
+        ("order", r"(?:belongs|belonging)\s+to\s+(?:the)?\s+order\s+([A-Za-z]+)"),
+        ("family", r"(?:belongs|belonging)\s+to\s+(?:the)?\s+family\s+([A-Za-z]+)"),
+        ("kingdom", r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+kingdom\s+([A-Za-z]+)"),
+        ("phylum", r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+phylum\s+([A-Za-z]+)"),
+        ("class", r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+class\s+([A-Za-z]+)"),
+        ("order", r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+order\s+([A-Za-z]+)"),
+        ("family", r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+family\s+([A-Za-z]+)"),
+        ("genus", r"(?:is|as)\s+a\s+(?:member|species)\s+of\s+(?:the)?\s+genus\s+([A-Za-z]+)"),
+    ]
+)
+
+# Regexes for extract_taxonomy_from_text
+RANK_PATTERNS = {
+    rank: tuple(re.compile(pattern, re.IGNORECASE) for pattern in [
+        rf"{rank.capitalize()}:?\s*([A-Za-z]+)",
+        rf"{rank.capitalize()}\s+([A-Za-z]+)",
+        rf"a member of the {rank}\s+([A-Za-z]+)",
+    ])
+    for rank in ("kingdom", "phylum", "class", "order")
+}
+# Taxonomic name suffixes, per rank
+SUFFIX_PATTERNS = {
+    rank: tuple(re.compile(pattern) for pattern in patterns) for rank, patterns in [
+        ("family", [r"\b([A-Za-z]+idae)\b", r"\b([A-Za-z]+aceae)\b"]),  # Animal and plant families
+        ("order", [r"\b([A-Za-z]+ales)\b", r"\b([A-Za-z]+ida)\b"]),  # Plant orders and animal orders
+        ("class", [r"\b([A-Za-z]+ia)\b", r"\b([A-Za-z]+phyceae)\b"]),  # Classes
+        ("phylum", [r"\b([A-Za-z]+phyta)\b", r"\b([A-Za-z]+zoa)\b"]),  # Plant and animal phyla
+    ]
+}
+
+# Results used when an extractor fails or runs over its budget even on a
+# shortened input (see extraction_runner.budgeted)
+
+def _unparsed_article(full_text, *args):
+    return {
+        "description": (full_text or "").split("\n\n")[0].strip(),
+        "habitat": "Unknown",
+        "fun_facts": [],
+        "classification": dict.fromkeys(MAIN_RANKS, "Unknown"),
+    }
+
+def _unknown_classification(*args):
+    return dict.fromkeys(MAIN_RANKS, "Unknown")
+
+def _unchanged_classification(text, classification):
+    return classification
+
+# CPU-time budgets (seconds) and input caps (characters) per extractor. The
+# whole article has its own budget on top of those of the extractors it runs.
+@budgeted(cpu_seconds=1.0, max_chars=300_000, default=_unparsed_article)
+def parse_wikipedia_article(full_text, title, search_data=None, with_classification=True):
+    """
+    Extract the description, habitat, fun facts and (optionally) classification
+    from the plain text of a Wikipedia article. This is pure CPU work with no
+    network access, so it can run in an extraction worker process.
+    """
+    article = {
+        "description": "",
+        "habitat": "Unknown",
+        "fun_facts": [],
+        "classification": {
+            "kingdom": "Unknown", 
+            "phylum": "Unknown", 
+            "class": "Unknown", 
+            "order": "Unknown", 
+            "family": "Unknown", 
+            "genus": "Unknown", 
+            "species": "Unknown"
+        }
+    }
+    
+    # Clean up the text
+    if full_text:
+        full_text = full_text.replace("\n\n", "||").replace("\n", " ").replace("||", "\n\n")
+        
+        # Get sections from the content
+        sections = full_text.split("\n\n")
+        
+        # The first section is usually a good description
+        if sections:
+            article["description"] = sections[0].strip()
+        
+        # Look for habitat information in the full text
+        habitat_section = extract_wikipedia_section(full_text, ["Habitat", "Distribution", "Range", "Ecology", "Environment"])
+        if habitat_section:
+            article["habitat"] = habitat_section
+        else:
+            # If no specific habitat section, use our habitat extraction on the full text
+            habitat = extract_habitat(full_text)
+            if habitat != "Unknown":
+                article["habitat"] = habitat
+        
+        # Extract fun facts from various interesting sections
+        behavior_section = extract_wikipedia_section(full_text, ["Behavior", "Behaviour", "Life cycle", "Diet", "Feeding", "Reproduction", "Biology"])
+        if behavior_section:
+            facts = extract_fun_facts(behavior_section)
+            if facts:
+                article["fun_facts"].extend(facts)
+        
+        # If we don't have enough facts, try conservation status or other sections
+        if len(article["fun_facts"]) < 2:
+            conservation_section = extract_wikipedia_section(full_text, ["Conservation", "Status", "Threats", "Population"])
+            if conservation_section:
+                facts = extract_fun_facts(conservation_section)
+                if facts:
+                    for fact in facts:
+                        if fact not in article["fun_facts"]:
+                            article["fun_facts"].append(fact)
+        
+        # If we still don't have enough facts, use our fun facts extraction on the full text
+        if len(article["fun_facts"]) < 2:
+            general_facts = extract_fun_facts(full_text)
+            if general_facts:
+                for fact in general_facts:
+                    if fact not in article["fun_facts"]:
+                        article["fun_facts"].append(fact)
+        
+        # Limit to 4 facts
+        article["fun_facts"] = article["fun_facts"][:4]
+        
+        # Extract classification from Wikipedia content
+        if with_classification:
+            wiki_classification = extract_wikipedia_classification(full_text, title, search_data)
+            if wiki_classification:
+                article["classification"] = wiki_classification
+    
+    return article
+
+def analyze_description(description):
+    """
+    Extract habitat information and fun facts from a short description,
+    such as a Wikispecies introduction.
+    """
+    return {
+        "habitat": extract_habitat(description),
+        "fun_facts": extract_fun_facts(description),
+    }
+
+@budgeted(cpu_seconds=0.1, max_chars=300_000, default=lambda *args: None)
+def extract_wikipedia_section(text, section_keywords):
+    """
+    Try to extract a specific section from Wikipedia text content.
+    Returns the first matching section or None if no match is found.
+    """
+    if not text:
+        return None
+    
+    # Try to find section headings in the text
+    sections = SECTION_HEADING.findall(text)
+    
+    # Check if any of our target sections exist
+    matching_sections = []
+    for keyword in section_keywords:
+        for section in sections:
+            if keyword.lower() in section.lower():
+                # Found a matching section, now extract its content
+                heading = f"== {section} =="
+                try:
+                    # Find where this section starts
+                    start_pos = text.find(heading)
+                    if start_pos != -1:
+                        start_pos += len(heading)
+                        
+                        # Find where the next section starts
+                        next_section = SECTION_HEADING.search(text, start_pos)
+                        if next_section:
+                            end_pos = next_section.start()
+                            section_text = text[start_pos:end_pos].strip()
+                        else:
+                            # This is the last section
+                            section_text = text[start_pos:].strip()
+                        
+                        matching_sections.append(section_text)
+                except Exception:
+                    # Skip this section if there's any error processing it
+                    continue
+    
+    # If we found any matching sections, join them (limit to 2 for conciseness)
+    if matching_sections:
+        return " ".join(matching_sections[:2])
+    
+    # Alternative approach: look for paragraphs containing the keywords
+    paragraphs = text.split("\n\n")
+    for keyword in section_keywords:
+        for paragraph in paragraphs:
+            if keyword.lower() in paragraph.lower():
+                return paragraph
+    
+    return None
+
+def extract_classification(categories):
+    """
+    Extract classification information from categories and additional WikiData
+    with improved pattern matching and detection.
+    """
+    # Initialize with default "Unknown" values
+    classification = {
+        "kingdom": "Unknown",
+        "phylum": "Unknown",
+        "class": "Unknown",
+        "order": "Unknown",
+        "family": "Unknown",
+        "genus": "Unknown",
+        "species": "Unknown",
+    }
+    
+    # Skip empty categories
+    if not categories:
+        return classification
+    
+    # STRATEGY 1: Direct matching from category names
+    for category in categories:
+        # Skip Categories: prefix if present
+        if category.startswith("Category:"):
+            category = category[9:]
+            
+        category_lower = category.lower()
+        
+        # Check for direct taxonomy mentions
+        for rank, patterns in CATEGORY_RANK_PATTERNS.items():
+            for pattern in patterns:
+                if pattern in category_lower:
+                    # Extract the value after the pattern
+                    parts = category_lower.split(pattern)
+                    if len(parts) > 1:
+                        # Clean up the value (capitalize first letter, remove trailing spaces and special chars)
+                        value = parts[1].strip().split()[0].capitalize()
+                        classification[rank] = value
+                        break
+    
+    # STRATEGY 2: Look for categories that directly match taxonomic naming conventions
+    for category in categories:
+        # Skip Categories: prefix if present
+        if category.startswith("Category:"):
+            category = category[9:]
+            
+        category_parts = category.split()
+        
+        # Check for single-word categories that might be taxonomic names
+        if len(category_parts) == 1:
+            name = category_parts[0]
+            
+            # Check for common taxonomic suffixes
+            if name.endswith("idae"):  # Family suffix for animals
+                classification["family"] = name
+            elif name.endswith("inae"):  # Subfamily suffix
+                # Store subfamily info in a separate key
+                classification["subfamily"] = name
+            elif name.endswith("ales"):  # Order suffix for plants
+                classification["order"] = name
+            elif name.endswith("aceae"):  # Family suffix for plants
+                classification["family"] = name
+            elif name.endswith("ineae"):  # Suborder suffix for plants
+                # Store suborder info in a separate key
+                classification["suborder"] = name
+            elif name.endswith("oideae"):  # Subfamily suffix for plants
+                # Store subfamily info in a separate key
+                classification["subfamily"] = name
+    
+    # STRATEGY 3: Check for categories that contain common taxonomic rank names
+    for category in categories:
+        # Skip Categories: prefix if present
+        if category.startswith("Category:"):
+            category = category[9:]
+            
+        category_lower = category.lower()
+        
+        for rank in TAXONOMIC_RANK_NAMES:
+            if rank in category_lower:
+                # Look for words after the rank name
+                parts = category_lower.split(rank)
+                if len(parts) > 1 and parts[1].strip():
+                    # Get the first word after the rank
+                    value = parts[1].strip().split()[0].capitalize()
+                    if classification[rank] == "Unknown":
+                        classification[rank] = value
+    
+    # Final cleanup: ensure proper capitalization and formatting
+    for rank, value in classification.items():
+        if value != "Unknown":
+            # Capitalize first letter for taxonomic ranks
+            classification[rank] = value[0].upper() + value[1:]
+    
+    return classification
+
+@budgeted(cpu_seconds=0.2, max_chars=100_000, default=lambda *args: "Unknown")
+def extract_habitat(description):
+    """
+    Extract habitat information from description using a more comprehensive approach
+    with multiple fallback strategies and pattern recognition.
+    """
+    if not description or description == "No description available":
+        return "Unknown"
+    
+    # Split the description into sentences
+    sentences = description.replace(". ", ".|").replace("! ", "!|").replace("? ", "?|").split("|")
+    sentences = [s.strip() for s in sentences if s.strip()]
+    
+    # Lower-case each sentence once for the keyword checks below
+    lowered = [s.lower() for s in sentences]
+    
+    # Sentences that might contain habitat information
+    habitat_sentences = []
+    
+    # Apply the keyword strategies in order (direct habitat statements, climate
+    # and geography, regional indicators, action verbs), stopping at the first
+    # one that yields results
+    for keywords in HABITAT_KEYWORD_STRATEGIES:
+        for sentence, sentence_lower in zip(sentences, lowered):
+            if any(keyword in sentence_lower for keyword in keywords):
+                habitat_sentences.append(sentence)
+        if habitat_sentences:
+            break
+    
+    # Fallback Strategy: If no habitat information was found, try to use the first or second sentence
+    # as they often contain general information about where the species lives
+    if not habitat_sentences and len(sentences) >= 2:
+        # Skip the first sentence if it's just a definition and take the second
+        if len(sentences) > 2:
+            second_sentence = sentences[1]
+            # Check if the second sentence has reasonable length to be informative
+            if len(second_sentence.split()) > 5:
+                habitat_sentences.append(second_sentence)
+        
+        # If second sentence wasn't suitable or not available, use the first
+        if not habitat_sentences:
+            first_sentence = sentences[0]
+            if len(first_sentence.split()) > 5:
+                habitat_sentences.append(first_sentence)
+    
+    # Format the habitat information
+    if habitat_sentences:
+        # If we have multiple sentences, join them (but limit to 2 for conciseness)
+        if len(habitat_sentences) > 1:
+            combined = ". ".join(habitat_sentences[:2]).strip()
+            # Make sure it ends with proper punctuation
+            if not combined.endswith(('.', '!', '?')):
+                combined += '.'
+            return combined
+        
+        single = habitat_sentences[0].strip()
+        # Make sure it ends with proper punctuation
+        if not single.endswith(('.', '!', '?')):
+            single += '.'
+        return single
+    
+    # Last resort: construct a generic message if we couldn't find specific habitat info
+    return NO_HABITAT
+
+@budgeted(cpu_seconds=0.3, max_chars=100_000, default=lambda *args: [])
+def extract_fun_facts(description):
+    """
+    Extract interesting fun facts from the description using keyword-based identification,
+    with improved pattern recognition and a structured approach to generate fun facts
+    even with limited information.
+    """
+    if not description or description == "No description available":
+        return [NO_FACTS]
+    
+    # Split the description into sentences
+    sentences = description.replace(". ", ".|").replace("! ", "!|").replace("? ", "?|").split("|")
+    sentences = [s.strip() for s in sentences if s.strip()]
+    
+    # If the description is too short, include it as a single fact
+    if len(sentences) == 1 and len(description) < 100:
+        if not sentences[0].endswith(('.', '!', '?')):
+            sentences[0] += '.'
+        return [sentences[0]]
+    
+    # Collect potential facts using different strategies
+    fact_candidates = {
+        "interesting": [],
+        "biological": [],
+        "behavioral": [],
+        "reproductive": [],
+        "comparative": [],
+        "measurements": [],
+        "general": []
+    }
+    
+    # Apply strategies to collect potential facts
+    for sentence in sentences:
+        # Skip very short sentences
+        if len(sentence.split()) < 4:
+            continue
+            
+        # Lower-case the sentence once for all keyword checks
+        sentence_lower = sentence.lower()
+        
+        # Try each keyword strategy in priority order; the first match decides
+        # the sentence's category
+        category = None
+        for name, keywords in FACT_KEYWORD_STRATEGIES:
+            if any(keyword in sentence_lower for keyword in keywords):
+                category = name
+                break
+        
+        # Check for measurement patterns, which only count with a number present
+        if category is None and any(c.isdigit() for c in sentence):
+            if any(pattern in sentence_lower for pattern in MEASUREMENT_PATTERNS):
+                category = "measurements"
+        
+        categorized = category is not None
+        if categorized:
+            fact_candidates[category].append(sentence)
+        
+        # If sentence wasn't categorized by any specific strategy, add to general
+        if not categorized and len(sentence.split()) > 5:
+            fact_candidates["general"].append(sentence)
+    
+    # Select facts from each category to ensure diversity (prioritizing the most interesting ones)
+    selected_facts = []
+    
+    # Priority order for fact selection
+    categories = ["interesting", "measurements", "biological", "reproductive", "behavioral", "comparative", "general"]
+    
+    # First, try to get at least one fact from high-priority categories
+    for category in categories[:3]:  # First 3 are highest priority
+        if fact_candidates[category]:
+            selected_facts.append(fact_candidates[category][0])
+            fact_candidates[category].pop(0)  # Remove the used fact
+    
+    # Now fill remaining slots with a mix of all categories
+    remaining_slots = 4 - len(selected_facts)  # Maximum 4 facts total
+    
+    if remaining_slots > 0:
+        for category in categories:
+            if fact_candidates[category] and remaining_slots > 0:
+                next_fact = fact_candidates[category][0]
+                # Only add if not too similar to already selected facts
+                if not any(similarity_score(next_fact, fact) > 0.7 for fact in selected_facts):
+                    selected_facts.append(next_fact)
+                    remaining_slots -= 1
+                fact_candidates[category].pop(0)  # Remove the used fact
+    
+    # If we still don't have enough facts, add more from general pool
+    if len(selected_facts) < 2 and sentences:
+        # Add the first sentence if it's not already included
+        if sentences[0] not in selected_facts and len(sentences[0].split()) > 5:
+            selected_facts.append(sentences[0])
+            
+        # Add another sentence from middle of the text if available
+        middle_idx = len(sentences) // 2
+        if len(sentences) > middle_idx and sentences[middle_idx] not in selected_facts and len(sentences[middle_idx].split()) > 5:
+            selected_facts.append(sentences[middle_idx])
+    
+    # Last resort: if still no facts, create a generic fact
+    if not selected_facts:
+        selected_facts = [GENERIC_FACT]
+    
+    # Ensure all facts end with proper punctuation
+    for i in range(len(selected_facts)):
+        if not selected_facts[i].endswith(('.', '!', '?')):
+            selected_facts[i] += '.'
+    
+    # Remove duplicates while preserving order
+    unique_facts = []
+    for fact in selected_facts:
+        if fact not in unique_facts:
+            unique_facts.append(fact)
+    
+    return unique_facts[:4]  # Limit to max 4 facts
+
+def similarity_score(str1, str2):
+    """
+    Calculate a simple similarity score between two strings
+    based on word overlap. Used to avoid selecting too similar facts.
+    Returns a value between 0 (completely different) and 1 (identical).
+    """
+    if not str1 or not str2:
+        return 0
+        
+    # Convert to lowercase and split into words
+    words1 = set(str1.lower().split())
+    words2 = set(str2.lower().split())
+    
+    # Calculate Jaccard similarity
+    intersection = words1.intersection(words2)
+    union = words1.union(words2)
+    
+    if not union:
+        return 0
+        
+    return len(intersection) / len(union)
+
+@budgeted(cpu_seconds=0.3, max_chars=300_000, default=_unknown_classification)
+def extract_wikipedia_classification(full_text, title, search_data=None):
+    """
+    Extract classification/taxonomy information from Wikipedia content.
+    Uses various strategies including infobox parsing, section analysis, and text pattern matching.
+    
+    Args:
+        full_text: The full text content of the Wikipedia page
+        title: The title of the Wikipedia page
+        search_data: Optional search data that might contain additional info
+        
+    Returns:
+        A dictionary with taxonomic ranks and their values
+    """
+    # Initialize with default "Unknown" values
+    classification = {
+        "kingdom": "Unknown",
+        "phylum": "Unknown",
+        "class": "Unknown",
+        "order": "Unknown",
+        "family": "Unknown",
+        "genus": "Unknown",
+        "species": "Unknown"
+    }
+    
+    if not full_text:
+        return classification
+    
+    # STRATEGY 1: Look for taxonomic information in specific sections
+    taxonomy_section = extract_wikipedia_section(full_text, ["Taxonomy", "Classification", "Taxonomic", "Scientific classification"])
+    if taxonomy_section:
+        # Extract taxonomic information from the section
+        classification = extract_taxonomy_from_text(taxonomy_section, classification)
+    
+    # STRATEGY 2: Look for taxonomic information in infobox-like structures
+    # Wikipedia infoboxes often appear at the beginning of the text with structured format
+    for rank, pattern in INFOBOX_PATTERNS:
+        match = pattern.search(full_text)
+        if match:
+            classification[rank] = match.group(1).strip()
+    
+    # STRATEGY 3: Parse the first paragraph for taxonomic information
+    # First paragraphs in Wikipedia often contain taxonomic statements
+    first_para = full_text.split('\n\n')[0] if '\n\n' in full_text else full_text
+    classification = extract_taxonomy_from_text(first_para, classification)
+    
+    # STRATEGY 4: Try to extract genus and species from the title
+    title_parts = title.split()
+    if len(title_parts) >= 2 and classification["genus"] == "Unknown":
+        # If title looks like a binomial name (e.g., "Panthera leo")
+        if title_parts[0][0].isupper() and title_parts[0][1:].islower() and title_parts[1].islower():
+            classification["genus"] = title_parts[0]
+            if classification["species"] == "Unknown":
+                classification["species"] = title_parts[1]
+    
+    # STRATEGY 5: Look for taxonomic statements throughout the text,
+    # like "belongs to the family Felidae"
+    for rank, pattern in TAXONOMY_STATEMENT_PATTERNS:
+        if classification[rank] != "Unknown":
+            continue
+        match = pattern.search(full_text)
+        if match:
+            classification[rank] = match.group(1).strip()
+    
+    # Final cleanup: ensure proper capitalization and formatting
+    for rank, value in classification.items():
+        if value != "Unknown":
+            # Capitalize first letter for taxonomic ranks
+            classification[rank] = value[0].upper() + value[1:]
+
+    return classification
+
+@budgeted(cpu_seconds=0.1, max_chars=100_000, default=_unchanged_classification)
+def extract_taxonomy_from_text(text, classification):
+    """
+    Extract taxonomic information from text using pattern matching
+    and natural language processing techniques.
+    
+    Args:
+        text: The text to analyze
+        classification: The current classification dictionary to update
+        
+    Returns:
+        Updated classification dictionary
+    """
+    if not text:
+        return classification
+    
+    # For each taxonomic rank, try to find matches using the patterns
+    for rank, patterns in RANK_PATTERNS.items():
+        if classification[rank] != "Unknown":
+            continue  # Skip if we already have a value
+            
+        for pattern in patterns:
+            found = pattern.search(text)
+            if found:
+                # Take the first match and clean it up
+                match = found.group(1).strip()
+                # Handle Latin taxonomic names with proper capitalization
+                if rank in ["genus", "species"]:
+                    match = match[0].upper() + match[1:].lower()
+                elif rank != "species":  # For non-species ranks
+                    match = match.capitalize()
+                
+                classification[rank] = match
+                break  # Stop after finding a match for this rank
+    
+    # Apply suffix patterns to extract taxonomic information
+    for rank, patterns in SUFFIX_PATTERNS.items():
+        if classification[rank] != "Unknown":
+            continue  # Skip if we already have a value
+            
+        for pattern in patterns:
+            found = pattern.search(text)
+            if found:
+                # Take the first match and clean it up
+                classification[rank] = found.group(1).strip()
+                break
+            
+    return classification
@@ -0,0 +1,285 @@
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from extractors import PLACEHOLDER_FACTS, PLACEHOLDER_HABITATS
+
+# Flashcard decks generated in bulk from species cards, and a spaced-repetition
+# scheduler serving them. A deck is built once (ahead of time, see main, or
+# when the first quiz starts) from cards that are already fetched; quizzing
+# only reads the deck, so a quiz never waits on Wikimedia.
+
+# Precomputed deck served by the app's Quiz tab
+DECK_PATH = os.environ.get("WILDCARDS_DECK", "deck.json")
+
+# Ranks asked about; genus is left out because it is part of a binomial name
+QUIZ_RANKS = ("phylum", "class", "order", "family")
+
+# Ranks from the top of the hierarchy down, for finding a rank's parent
+RANKS = ("kingdom", "phylum", "class", "order", "family", "genus", "species")
+
+# Answer choices per card, the right one included
+CHOICES = 4
+
+# Habitats and facts longer than this are cut, so the choices stay readable
+MAX_ANSWER_CHARS = 160
+
+# SM-2 scheduling: starting ease factor, its floor, the first two intervals,
+# and how soon a failed card comes back
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_INTERVAL = 24 * 60 * 60
+SECOND_INTERVAL = 6 * 24 * 60 * 60
+RELEARN_SECONDS = 60
+
+_deck = None
+_deck_lock = threading.Lock()
+
+
+class TaxonIndex:
+    """
+    Index of the taxa in a set of classifications: the names at each rank,
+    and the children of every taxon, for drawing sibling distractors.
+    """
+
+    def __init__(self, classifications):
+        self.by_rank = {rank: set() for rank in RANKS}
+        self.children = {}  # (parent rank, parent name) -> names one rank below
+        self.parents = {}  # (rank, name) -> (parent rank, parent name)
+        for classification in classifications:
+            known = [(rank, classification.get(rank)) for rank in RANKS]
+            known = [(rank, name) for rank, name in known if name and name != "Unknown"]
+            for i, (rank, name) in enumerate(known):
+                self.by_rank[rank].add(name)
+                if i > 0:
+                    self.children.setdefault(known[i - 1], set()).add(name)
+                    self.parents.setdefault((rank, name), known[i - 1])
+
+    def distractors(self, rank, name, count, rng):
+        """
+        Return up to count other taxa at a rank, nearest relatives first:
+        siblings under the same parent, then under the same grandparent, then
+        any taxon of that rank.
+        """
+        chosen = []
+        pools = []
+        parent = self.parents.get((rank, name))
+        if parent is not None:
+            pools.append(self.children.get(parent, set()) & self.by_rank[rank])
+            grandparent = self.parents.get(parent)
+            if grandparent is not None:
+                cousins = set()
+                for uncle in self.children.get(grandparent, ()):
+                    cousins |= self.children.get((parent[0], uncle), set())
+                pools.append(cousins & self.by_rank[rank])
+        pools.append(self.by_rank[rank])
+
+        for pool in pools:
+            candidates = sorted(pool - {name} - set(chosen))
+            rng.shuffle(candidates)
+            chosen.extend(candidates[:count - len(chosen)])
+            if len(chosen) >= count:
+                break
+        return chosen
+
+
+def _shorten(text):
+    text = " ".join(text.split())
+    if len(text) <= MAX_ANSWER_CHARS:
+        return text
+    return text[:MAX_ANSWER_CHARS].rsplit(" ", 1)[0] + "…"
+
+
+def _card(card_id, species, kind, question, answer, distractors, rng):
+    choices = [answer] + distractors[:CHOICES - 1]
+    rng.shuffle(choices)
+    return {"id": card_id, "species": species, "kind": kind, "question": question,
+            "answer": answer, "choices": choices}
+
+
+def build_deck(species_cards):
+    """
+    Generate flashcards from species cards (as returned by get_species_info):
+    one per known quiz rank, one for the habitat and one per fun fact, each
+    with multiple-choice answers. Distractors are sibling taxa from a
+    TaxonIndex of the whole set, or the habitats and facts of other species.
+    Cards without enough distractors are left out, and so are the
+    extractors' placeholder habitats and facts. Generation is seeded by the
+    card id, so rebuilding a deck gives the same cards.
+    """
+    species_cards = [card for card in species_cards if card and not card.get("error")]
+    index = TaxonIndex(card.get("classification", {}) for card in species_cards)
+    habitats = {card["title"]: _shorten(card["habitat"]) for card in species_cards
+                if card.get("habitat", "Unknown") not in PLACEHOLDER_HABITATS}
+    facts = {card["title"]: [_shorten(fact) for fact in card.get("fun_facts", []) if fact not in PLACEHOLDER_FACTS]
+             for card in species_cards}
+
+    deck = []
+    for card in species_cards:
+        title = card["title"]
+
+        def rng_for(card_id):
+            return random.Random(hashlib.sha1(card_id.encode("utf-8")).digest())
+
+        classification = card.get("classification", {})
+        for rank in QUIZ_RANKS:
+            name = classification.get(rank, "Unknown")
+            if name == "Unknown":
+                continue
+            card_id = f"{title}|{rank}"
+            rng = rng_for(card_id)
+            distractors = index.distractors(rank, name, CHOICES - 1, rng)
+            if len(distractors) == CHOICES - 1:
+                deck.append(_card(card_id, title, rank, f"What {rank} does {title} belong to?",
+                                  name, distractors, rng))
+
+        if title in habitats:
+            card_id = f"{title}|habitat"
+            rng = rng_for(card_id)
+            others = sorted({habitat for other, habitat in habitats.items()
+                             if other != title and habitat != habitats[title]})
+            rng.shuffle(others)
+            if len(others) >= CHOICES - 1:
+                deck.append(_card(card_id, title, "habitat", f"Where does {title} live?",
+                                  habitats[title], others, rng))
+
+        for i, fact in enumerate(facts.get(title, [])):
+            card_id = f"{title}|fact{i}"
+            rng = rng_for(card_id)
+            others = sorted({other_fact for other, other_facts in facts.items() if other != title
+                             for other_fact in other_facts if other_fact != fact})
+            rng.shuffle(others)
+            if len(others) >= CHOICES - 1:
+                deck.append(_card(card_id, title, "fact", f"Which of these is true of {title}?",
+                                  fact, others, rng))
+    return deck
+
+
+def save_deck(path, deck):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"built_at": time.time(), "cards": deck}, f, ensure_ascii=False)
+
+
+def load_deck(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["cards"]
+
+
+def get_deck(build=None):
+    """
+    Return the process-wide quiz deck: the precomputed DECK_PATH file if it
+    exists, otherwise the result of build() (e.g. a deck of the popular
+    species), or None. Shared by every session once built; an empty build
+    (e.g. before the popular species are loaded) is returned but not kept,
+    so a later call builds again.
+    """
+    global _deck
+    with _deck_lock:
+        if _deck is None and os.path.exists(DECK_PATH):
+            _deck = load_deck(DECK_PATH)
+        if _deck is not None or build is None:
+            return _deck
+
+    # Build outside the lock: it may look species up on Wikimedia, and the
+    # other sessions' quiz tabs shouldn't wait on it
+    deck = build()
+    with _deck_lock:
+        if _deck is None and deck:
+            _deck = deck
+        return _deck if _deck is not None else deck
+
+
+class Learner:
+    """
+    One learner's SM-2 schedule over a deck. Cards wait in a heap ordered by
+    due time, so serving the next card and rescheduling an answered one are
+    O(log n). New cards are due at once, in deck order.
+    """
+
+    def __init__(self, deck, now=None):
+        now = time.time() if now is None else now
+        self.cards = {card["id"]: card for card in deck}
+        self.state = {}  # card id -> [ease, interval seconds, repetitions]
+        self._order = itertools.count()
+        self._heap = [(now, next(self._order), card["id"]) for card in deck]
+        heapq.heapify(self._heap)
+
+    def next_card(self):
+        """
+        Return the card due soonest (possibly not yet due), or None.
+        """
+        return self.cards[self._heap[0][2]] if self._heap else None
+
+    def due_count(self, now=None):
+        now = time.time() if now is None else now
+        return sum(1 for due, _, _ in self._heap if due <= now)
+
+    def review(self, card_id, quality, now=None):
+        """
+        Record an answer to the card from next_card, graded 0-5 as in SM-2
+        (below 3 is a failure), and reschedule it. Returns its next due time.
+        """
+        now = time.time() if now is None else now
+        due, _, top_id = heapq.heappop(self._heap)
+        if top_id != card_id:
+            heapq.heappush(self._heap, (due, next(self._order), top_id))
+            raise ValueError(f"{card_id} is not the card being reviewed")
+
+        ease, interval, repetitions = self.state.get(card_id, (INITIAL_EASE, 0, 0))
+        if quality < 3:
+            repetitions = 0
+            interval = RELEARN_SECONDS
+        else:
+            repetitions += 1
+            if repetitions == 1:
+                interval = FIRST_INTERVAL
+            elif repetitions == 2:
+                interval = SECOND_INTERVAL
+            else:
+                interval = interval * ease
+        ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.state[card_id] = (ease, interval, repetitions)
+
+        due = now + interval
+        heapq.heappush(self._heap, (due, next(self._order), card_id))
+        return due
+
+
+def main(argv=None):
+    """
+    Command line: look species up and precompute a quiz deck from them.
+
+        python flashcards.py deck.json --names-file popular_species.txt
+        python flashcards.py deck.json "Canis lupus" "Vulpes vulpes" "Felis catus"
+    """
+    parser = argparse.ArgumentParser(description="Build a flashcard deck.")
+    parser.add_argument("deck")
+    parser.add_argument("names", nargs="*")
+    parser.add_argument("--names-file", help="file with one species name per line")
+    args = parser.parse_args(argv)
+
+    names = list(args.names)
+    if args.names_file:
+        import cache_warmer
+        names += cache_warmer.load_popular_species(args.names_file)
+    if not names:
+        parser.error("no species given")
+
+    # The lookup function lives in the Streamlit app module
+    from app import get_species_info
+
+    deck = build_deck(get_species_info(name) for name in names)
+    save_deck(args.deck, deck)
+    print(f"Wrote {len(deck)} cards for {len(names)} species to {args.deck}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+
+# Number of recent observations kept per timing metric
+MAX_OBSERVATIONS = 1000
+
+# Process-wide metrics registry. Values live in this module so that they
+# survive Streamlit reruns and can be read by any part of the app.
+_counters = {}
+_gauges = {}
+_observations = {}
+_lock = threading.Lock()
+
+
+def increment(name, amount=1):
+    """
+    Add to a counter metric.
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name, value):
+    """
+    Set a gauge metric to its current value.
+    """
+    with _lock:
+        _gauges[name] = value
+
+
+def record_once(name, value):
+    """
+    Set a gauge only if it has never been set in this process, e.g. for
+    one-off timings like the cold start.
+    """
+    with _lock:
+        _gauges.setdefault(name, value)
+
+
+def observe(name, value):
+    """
+    Record one observation (usually a duration in seconds) for a metric.
+    """
+    with _lock:
+        if name not in _observations:
+            _observations[name] = deque(maxlen=MAX_OBSERVATIONS)
+        _observations[name].append(value)
+
+
+def percentile(values, fraction):
+    """
+    Return the value at the given fraction (0-1) of a list of numbers.
+    """
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def snapshot():
+    """
+    Return a copy of every metric, with observations summarized.
+    """
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        observations = {name: list(values) for name, values in _observations.items()}
+
+    summaries = {}
+    for name, values in observations.items():
+        summaries[name] = {
+            "count": len(values),
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "max": max(values) if values else 0,
+        }
+
+    return {"counters": counters, "gauges": gauges, "observations": summaries}
+
+
+def reset():
+    """
+    Clear every metric.
+    """
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _observations.clear()
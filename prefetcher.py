@@ -0,0 +1,208 @@
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+import rate_governor
+import species_cache
+import taxon_cache
+
+# Set WILDCARDS_PREFETCH=0 to turn predictive prefetching off
+ENABLED = os.environ.get("WILDCARDS_PREFETCH", "1") != "0"
+
+# Number of likely next species warmed after each view
+TOP_K = 3
+
+# Budgets: prefetches run one at a time, at most this many per minute, and
+# only while no interactive request is waiting on the rate governor
+MAX_PER_MINUTE = 20
+MAX_QUEUED = 20
+
+# Relative weight of each signal when ranking candidates
+TRANSITION_WEIGHT = 2.0  # per observed "searched A, then B" transition
+LINK_WEIGHT = 1.0  # the species page links to the candidate
+SIBLING_WEIGHT = 0.5  # the candidate is in the same genus
+
+# How many species' links and transitions are remembered
+MAX_REMEMBERED = 2000
+
+_binomial_link = re.compile(r"^[A-Z][a-z]+ [a-z-]+$")
+
+_links = OrderedDict()
+_transitions = OrderedDict()
+_lock = threading.Lock()
+
+# Queue items: (_RANK, viewed species, fetch) to rank a view's candidates,
+# (_FETCH, candidate, fetch) to fetch one
+_RANK = "rank"
+_FETCH = "fetch"
+_queue = queue.Queue(maxsize=MAX_QUEUED)
+_pending = set()
+_worker = None
+_recent_starts = []
+
+
+def note_links(species_name, links):
+    """
+    Remember the species-like links of a page, as prefetch candidates.
+    """
+    candidates = [link for link in links if _binomial_link.match(link)]
+    key = species_cache.query_key(species_name)
+    with _lock:
+        _links[key] = candidates
+        _links.move_to_end(key)
+        while len(_links) > MAX_REMEMBERED:
+            _links.popitem(last=False)
+
+
+def record_transition(previous_name, species_name):
+    """
+    Count that a user searched species_name right after previous_name.
+    """
+    if not previous_name:
+        return
+    previous_key = species_cache.query_key(previous_name)
+    name = species_cache.normalize_query(species_name)
+    if species_cache.query_key(name) == previous_key:
+        return
+    with _lock:
+        counts = _transitions.setdefault(previous_key, {})
+        counts[name] = counts.get(name, 0) + 1
+        _transitions.move_to_end(previous_key)
+        while len(_transitions) > MAX_REMEMBERED:
+            _transitions.popitem(last=False)
+
+
+def rank_candidates(species_name, limit=TOP_K):
+    """
+    Return the species most likely to be searched after this one, best first,
+    skipping any that are already cached.
+    """
+    name = species_cache.normalize_query(species_name)
+    key = species_cache.query_key(name)
+    scores = {}
+
+    with _lock:
+        for candidate, count in _transitions.get(key, {}).items():
+            scores[candidate] = scores.get(candidate, 0) + TRANSITION_WEIGHT * count
+        for candidate in _links.get(key, []):
+            scores[candidate] = scores.get(candidate, 0) + LINK_WEIGHT
+
+    parts = name.split()
+    if len(parts) == 2:
+        for epithet in taxon_cache.get_children("genus", parts[0]):
+            candidate = f"{parts[0]} {epithet}"
+            scores[candidate] = scores.get(candidate, 0) + SIBLING_WEIGHT
+
+    ranked = []
+    for candidate in sorted(scores, key=lambda c: (-scores[c], c)):
+        if species_cache.query_key(candidate) == key or species_cache.get_card(candidate):
+            continue
+        ranked.append(candidate)
+        if len(ranked) >= limit:
+            break
+    return ranked
+
+
+def schedule_related(species_name, fetch):
+    """
+    Queue a view for background prefetching: the prefetch thread ranks the
+    top-K likely next species and fetches them. Ranking checks the cache for
+    every candidate, which costs round trips with a shared cache backend, so
+    the calling (interactive) thread only queues the view. fetch is called
+    with each species name and should fill the cache. Returns True if the
+    view was queued.
+    """
+    if not ENABLED:
+        return False
+
+    _ensure_worker()
+    try:
+        _queue.put_nowait((_RANK, species_name, fetch))
+        return True
+    except queue.Full:
+        # Never let prefetching pile up; newer views will queue again
+        metrics.increment("prefetcher.dropped")
+        return False
+
+
+def _queue_candidates(species_name, fetch):
+    """
+    Rank the likely next species after a view and queue the ones not cached
+    or already queued for fetching. Runs on the prefetch thread.
+    """
+    for candidate in rank_candidates(species_name):
+        candidate_key = species_cache.query_key(candidate)
+        with _lock:
+            if candidate_key in _pending:
+                continue
+            _pending.add(candidate_key)
+        try:
+            _queue.put_nowait((_FETCH, candidate, fetch))
+        except queue.Full:
+            with _lock:
+                _pending.discard(candidate_key)
+            metrics.increment("prefetcher.dropped")
+            break
+
+
+def _ensure_worker():
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="species-prefetcher", daemon=True)
+            _worker.start()
+
+
+def _interactive_waiting():
+    """
+    Return True if any interactive request is queued on the rate governor.
+    """
+    for depths in rate_governor.get_queue_metrics().values():
+        if depths["local"].get("interactive"):
+            return True
+    return False
+
+
+def _wait_for_budget():
+    """
+    Block until a prefetch may start under the per-minute and interactive
+    traffic budgets.
+    """
+    while True:
+        now = time.monotonic()
+        _recent_starts[:] = [started for started in _recent_starts if now - started < 60]
+        if len(_recent_starts) < MAX_PER_MINUTE and not _interactive_waiting():
+            _recent_starts.append(now)
+            return
+        time.sleep(0.5)
+
+
+def _run():
+    while True:
+        kind, candidate, fetch = _queue.get()
+        try:
+            if kind == _RANK:
+                _queue_candidates(candidate, fetch)
+                continue
+            _wait_for_budget()
+            # Skip it if an interactive search fetched it in the meantime
+            if species_cache.get_card(candidate):
+                metrics.increment("prefetcher.already_cached")
+                continue
+            started = time.monotonic()
+            with rate_governor.request_priority(rate_governor.BATCH):
+                fetch(candidate)
+            metrics.increment("prefetcher.fetched")
+            metrics.observe("prefetcher.fetch_seconds", time.monotonic() - started)
+        except Exception as e:
+            metrics.increment("prefetcher.errors")
+            print(f"Error prefetching {candidate}: {str(e)}")
+        finally:
+            if kind == _FETCH:
+                with _lock:
+                    _pending.discard(species_cache.query_key(candidate))
+            _queue.task_done()
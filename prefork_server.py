@@ -0,0 +1,339 @@
+import argparse
+import email.parser
+import email.policy
+import gc
+import json
+import mmap
+import os
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Pre-forked JSON server for the species lookups, for serving the HTML front
+# end (index.html and script.js) and API clients with several worker processes.
+#
+#     python prefork_server.py [--port 8000] [--workers 4]
+#
+# The parent process imports the app (compiling the extractor keyword and
+# regex tables) and opens the offline bundle if one is configured, then
+# freezes its objects out of the garbage collector's reach (gc.freeze) and
+# forks the workers. The workers share all of it with the parent
+# copy-on-write: nothing is parsed again, and because the collector no longer
+# touches the frozen objects, their pages stay shared instead of being copied
+# into every worker. The bundle is a read-only memory map, so its pages
+# live once in the OS page cache however many workers read it.
+#
+# Endpoints:
+#
+#     POST /search_by_name   form field species_name -> {"species_data", "images"}
+#     POST /upload_image     form file "file" -> the same, for the identified species
+#     GET  /health           200 with every worker's resident memory
+#     GET  /metrics          the metrics of the worker answering (see cache_warmer)
+#     GET  /, /static/..., /sw.js   the front end
+#
+# Each worker's memory (RSS, PSS, private and shared bytes, from
+# /proc/self/smaps_rollup) is published in a shared memory table that /health
+# and the parent's periodic report read. Caches stay per worker unless
+# WILDCARDS_CACHE_URL points at a shared one (see species_cache.py).
+
+# Workers parse articles inline: they are the parallelism, and an extraction
+# pool per worker would multiply the processes
+os.environ.setdefault("WILDCARDS_EXTRACTION_WORKERS", "0")
+
+import app  # noqa: E402
+import cache_warmer  # noqa: E402
+import metrics  # noqa: E402
+import species_bundle  # noqa: E402
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Front-end files by URL path
+STATIC_FILES = {
+    "/static/js/script.js": ("script.js", "application/javascript"),
+    "/static/css/style.css": ("style.css", "text/css"),
+    "/sw.js": ("sw.js", "application/javascript"),
+}
+
+# Largest request body accepted (uploaded images included)
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Seconds between two memory reports by the parent, and between two updates
+# of a worker's slot in the memory table
+REPORT_INTERVAL = 60
+MEMORY_UPDATE_INTERVAL = 5
+
+# One memory table slot per worker: pid, RSS, PSS, private, shared bytes and
+# requests served
+WORKER_SLOT = struct.Struct("<iQQQQQ")
+
+
+def memory_usage():
+    """
+    Return this process' memory in bytes: rss, pss (RSS with shared pages
+    split between their users), private and shared.
+    """
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+class MemoryTable:
+    """
+    Per-worker memory figures in an anonymous shared memory map created
+    before forking, so every process reads what the others wrote.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._map = mmap.mmap(-1, WORKER_SLOT.size * workers)
+        self._lock = threading.Lock()
+
+    def update(self, slot, requests=None):
+        memory = memory_usage()
+        with self._lock:
+            if requests is None:
+                requests = self.read(slot)["requests"]
+            WORKER_SLOT.pack_into(self._map, slot * WORKER_SLOT.size, os.getpid(), memory["rss"],
+                                  memory["pss"], memory["private"], memory["shared"], requests)
+
+    def count_request(self, slot):
+        with self._lock:
+            values = list(WORKER_SLOT.unpack_from(self._map, slot * WORKER_SLOT.size))
+            values[5] += 1
+            WORKER_SLOT.pack_into(self._map, slot * WORKER_SLOT.size, *values)
+
+    def read(self, slot):
+        pid, rss, pss, private, shared, requests = WORKER_SLOT.unpack_from(self._map, slot * WORKER_SLOT.size)
+        return {"pid": pid, "rss": rss, "pss": pss, "private": private, "shared": shared, "requests": requests}
+
+    def read_all(self):
+        return [self.read(slot) for slot in range(self.workers) if self.read(slot)["pid"]]
+
+
+def load_shared_state():
+    """
+    Load the read-only structures the workers share, in the parent. The
+    extractor tables were built when app was imported; the offline bundle
+    (if any) is mapped here, once, before forking.
+    """
+    species_bundle.get_offline_bundle()
+
+
+def render_index():
+    """
+    Return index.html with its template links pointed at STATIC_FILES.
+    """
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        html = f.read()
+    html = html.replace("{{ url_for('static', filename='css/style.css') }}", "/static/css/style.css")
+    html = html.replace("{{ url_for('static', filename='js/script.js') }}", "/static/js/script.js")
+    return html.encode("utf-8")
+
+
+def parse_form(content_type, body):
+    """
+    Parse a urlencoded or multipart form body into {name: value}; file
+    fields become (filename, bytes) pairs.
+    """
+    if content_type.startswith("application/x-www-form-urlencoded"):
+        return {name: values[0] for name, values in parse_qs(body.decode("utf-8")).items()}
+
+    if content_type.startswith("multipart/form-data"):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+        )
+        form = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            filename = part.get_filename()
+            payload = part.get_payload(decode=True) or b""
+            form[name] = (filename, payload) if filename else payload.decode("utf-8")
+        return form
+
+    return {}
+
+
+def lookup(species_name):
+    """
+    Return the search response for a species: its card and images, without
+    embedded thumbnail bytes (the client loads thumbnails by URL).
+    """
+    images = [{key: value for key, value in image.items() if key != "thumb_data"}
+              for image in app.get_species_images(species_name)]
+    return {"species_data": app.get_species_info(species_name), "images": images}
+
+
+class Handler(BaseHTTPRequestHandler):
+    memory_table = None
+    slot = 0
+    index_html = b""
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path in ("/health", "/healthz"):
+            self.send_json(200, {"worker": os.getpid(), "workers": self.memory_table.read_all()})
+        elif path == "/metrics":
+            self.send_json(200, {"worker": os.getpid(), **cache_warmer.get_metrics()})
+        elif path == "/":
+            self.send_body(200, "text/html; charset=utf-8", self.index_html)
+        elif path in STATIC_FILES:
+            filename, content_type = STATIC_FILES[path]
+            with open(os.path.join(ROOT, filename), "rb") as f:
+                self.send_body(200, content_type, f.read())
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.send_json(413, {"error": "Request too large"})
+            return
+        form = parse_form(self.headers.get("Content-Type", ""), self.rfile.read(length))
+        started = time.perf_counter()
+
+        if path == "/search_by_name":
+            species_name = form.get("species_name", "")
+            if not isinstance(species_name, str) or not species_name.strip():
+                self.send_json(400, {"error": "Please enter a species name"})
+                return
+            result = lookup(species_name)
+        elif path == "/upload_image":
+            upload = form.get("file")
+            if not isinstance(upload, tuple) or not app.allowed_file(upload[0]):
+                self.send_json(400, {"error": "File type not allowed. Please upload an image file (PNG, JPG, JPEG, GIF)."})
+                return
+            # The demo identifies species from the file name (see app.py)
+            result = lookup(app.get_mock_species_from_filename(upload[0]))
+        else:
+            self.send_json(404, {"error": "Not found"})
+            return
+
+        metrics.observe("prefork_server.request_seconds", time.perf_counter() - started)
+        self.memory_table.count_request(self.slot)
+        self.send_json(200, result)
+
+    def send_json(self, status, data):
+        self.send_body(status, "application/json; charset=utf-8", json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def send_body(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_worker(listener, memory_table, slot, index_html):
+    """
+    Serve requests from the shared listening socket until killed.
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent handles Ctrl+C
+
+    handler = type("WorkerHandler", (Handler,), {
+        "memory_table": memory_table, "slot": slot, "index_html": index_html,
+    })
+    server = ThreadingHTTPServer(listener.getsockname(), handler, bind_and_activate=False)
+    server.socket = listener
+    server.daemon_threads = True
+
+    def report_memory():
+        while True:
+            memory_table.update(slot)
+            time.sleep(MEMORY_UPDATE_INTERVAL)
+
+    threading.Thread(target=report_memory, name="memory-report", daemon=True).start()
+    server.serve_forever()
+
+
+def spawn_worker(listener, memory_table, slot, index_html):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(listener, memory_table, slot, index_html)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def format_report(rows):
+    lines = [f"{'pid':>8} {'RSS MB':>8} {'PSS MB':>8} {'private MB':>10} {'shared MB':>9} {'requests':>8}"]
+    for row in rows:
+        lines.append(
+            f"{row['pid']:>8} {row['rss'] / 2 ** 20:>8.1f} {row['pss'] / 2 ** 20:>8.1f} "
+            f"{row['private'] / 2 ** 20:>10.1f} {row['shared'] / 2 ** 20:>9.1f} {row['requests']:>8}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve species lookups with pre-forked workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("WILDCARDS_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    load_shared_state()
+    index_html = render_index()
+    listener = socket.create_server((args.host, args.port), backlog=128)
+    memory_table = MemoryTable(args.workers)
+
+    # Move everything loaded so far out of the collector's reach, so collections
+    # in the workers don't write to (and so copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+    workers = {spawn_worker(listener, memory_table, slot, index_html): slot for slot in range(args.workers)}
+    print(f"Serving on http://{args.host}:{listener.getsockname()[1]} with {args.workers} workers", flush=True)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    next_report = time.monotonic() + MEMORY_UPDATE_INTERVAL + 1
+    while workers:
+        # Restart workers that die, e.g. killed for memory
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid in workers:
+            slot = workers.pop(pid)
+            if not stopping:
+                print(f"Worker {pid} exited, starting a new one", flush=True)
+                workers[spawn_worker(listener, memory_table, slot, index_html)] = slot
+            continue
+        if not stopping and time.monotonic() >= next_report:
+            print(format_report(memory_table.read_all()), flush=True)
+            next_report = time.monotonic() + REPORT_INTERVAL
+        time.sleep(0.2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import contextlib
+import contextvars
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+import metrics
+
+# Opt-in sampling profiler for single requests. A profiled request's thread
+# has its stack sampled every INTERVAL_MS by a helper thread (through
+# sys._current_frames, so the profiled code runs untouched), and the samples
+# are written to PROFILE_DIR as a collapsed-stack file (for flamegraph.pl,
+# inferno or speedscope) and a speedscope JSON file.
+#
+# Requests are profiled when asked for (e.g. ?profile=1 in the app's URL) or
+# at random at SAMPLE_RATE. When neither applies, profile() only costs a
+# random() call.
+PROFILE_DIR = os.environ.get("WILDCARDS_PROFILE_DIR", "profiles")
+
+# Fraction of requests profiled without being asked, e.g. 0.01
+SAMPLE_RATE = float(os.environ.get("WILDCARDS_PROFILE_RATE", "0"))
+
+# Milliseconds between two stack samples
+INTERVAL_MS = float(os.environ.get("WILDCARDS_PROFILE_INTERVAL_MS", "5"))
+
+# Stack frames deeper than this are cut off at the root end
+MAX_DEPTH = 128
+
+_unsafe_label_chars = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# True while the current request is being profiled
+_active = contextvars.ContextVar("profiler_active", default=False)
+
+
+class Profile:
+    """
+    Stack samples of one thread, taken by a background sampler thread.
+    """
+
+    def __init__(self, label, thread_id, interval):
+        self.label = label
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = {}  # (name, file, line) -> index
+        self.samples = []  # stacks of frame indexes, root first
+        self.weights = []  # seconds each sample stands for
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.path = None  # speedscope file, once written
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{label}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append(self._stack(frame))
+                self.weights.append(now - last)
+            last = now
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, frame.f_lineno)
+            index = self.frames.get(key)
+            if index is None:
+                index = self.frames[key] = len(self.frames)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def collapsed(self):
+        """
+        Return the samples in collapsed-stack format, one "frame;frame;... count"
+        line per distinct stack, counted in milliseconds.
+        """
+        names = [None] * len(self.frames)
+        for (name, filename, line), index in self.frames.items():
+            names[index] = f"{name} ({os.path.basename(filename)}:{line})"
+        totals = {}
+        for stack, weight in zip(self.samples, self.weights):
+            key = ";".join(names[index] for index in stack)
+            totals[key] = totals.get(key, 0) + weight
+        return "".join(f"{stack} {max(round(seconds * 1000), 1)}\n" for stack, seconds in sorted(totals.items()))
+
+    def speedscope(self):
+        """
+        Return the samples as a speedscope (https://www.speedscope.app) file.
+        """
+        frames = [None] * len(self.frames)
+        for (name, filename, line), index in self.frames.items():
+            frames[index] = {"name": name, "file": filename, "line": line}
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.label,
+            "exporter": "wildcards profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.label,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+        }
+
+    def write(self, directory):
+        """
+        Write the collapsed-stack and speedscope files; returns the path of the
+        speedscope file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(directory, f"{stamp}-{os.getpid()}-{_unsafe_label_chars.sub('_', self.label)[:60]}")
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        with open(base + ".speedscope.json", "w", encoding="utf-8") as f:
+            json.dump(self.speedscope(), f)
+        return base + ".speedscope.json"
+
+
+def is_active():
+    """
+    Return True while the current request is being profiled.
+    """
+    return _active.get()
+
+
+@contextlib.contextmanager
+def profile(label, force=False, directory=None):
+    """
+    Profile the calling thread for the duration of the block if force is set
+    or the request is picked at SAMPLE_RATE. Yields the Profile, or None when
+    not profiling; once the block ends, its path is the written file.
+    """
+    if not (force or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)) or _active.get():
+        yield None
+        return
+
+    session = Profile(label, threading.get_ident(), INTERVAL_MS / 1000)
+    token = _active.set(True)
+    session.start()
+    try:
+        yield session
+    finally:
+        session.stop()
+        _active.reset(token)
+        try:
+            session.path = session.write(directory or PROFILE_DIR)
+            metrics.increment("profiler.profiles")
+        except OSError as e:
+            print(f"Error writing profile for {label}: {str(e)}")
@@ -0,0 +1,255 @@
+import contextlib
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets are only shared within one process
+    fcntl = None
+
+# Request priorities: lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Steady throughput ceiling per Wikimedia host, shared by every process on this
+# machine, and the burst allowed on top of it
+DEFAULT_RATE = float(os.environ.get("WILDCARDS_RATE_LIMIT", "5"))
+DEFAULT_BURST = float(os.environ.get("WILDCARDS_RATE_BURST", "10"))
+
+# Share of the burst that batch requests may not consume, so that an
+# interactive request arriving during a batch run never has to queue
+BATCH_RESERVE = 0.5
+
+# Directory holding one bucket file per host
+STATE_DIR = os.environ.get("WILDCARDS_RATE_STATE_DIR", os.path.join(tempfile.gettempdir(), "wildcards-rate"))
+
+_current_priority = contextvars.ContextVar("wildcards_request_priority", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """
+    Run the enclosed Wikimedia calls at the given priority.
+    Background work (prefetching, warming, refreshing) should use BATCH.
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority():
+    """
+    Return the priority of the calling context.
+    """
+    return _current_priority.get()
+
+
+class TokenBucket:
+    """
+    A token bucket for one host whose state lives in a small JSON file, so that
+    every process on the machine draws from the same bucket. Callers within
+    this process queue by priority before touching the shared state.
+    """
+
+    def __init__(self, host, rate=DEFAULT_RATE, burst=DEFAULT_BURST, state_dir=STATE_DIR):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.path = os.path.join(state_dir, f"{host}.json")
+        os.makedirs(state_dir, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def acquire(self, priority=INTERACTIVE):
+        """
+        Block until a token is available for this host.
+        Returns the number of seconds spent waiting.
+        """
+        started = time.monotonic()
+        entry = (priority, next(self._sequence))
+
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            self._publish_queue_depth()
+            # Wake any current head so it re-checks whether it still goes first
+            self._cond.notify_all()
+            try:
+                while True:
+                    # Only the highest-priority, oldest waiter may take a token
+                    if self._waiters[0] != entry:
+                        self._cond.wait()
+                        continue
+
+                    wait = self._take_token(priority)
+                    if wait <= 0:
+                        break
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._publish_queue_depth()
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        metrics.increment(f"rate_governor.{self.host}.granted.{name}")
+        metrics.observe(f"rate_governor.{self.host}.wait_seconds.{name}", waited)
+        return waited
+
+    def queue_depth(self):
+        """
+        Return the number of callers in this process waiting per priority.
+        """
+        with self._cond:
+            return self._count_waiters()
+
+    def shared_queue_depth(self):
+        """
+        Return the total number of callers waiting across all live processes.
+        """
+        with self._locked_state() as state:
+            return sum(count for count in state["queued"].values())
+
+    def _count_waiters(self):
+        counts = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _ in self._waiters:
+            counts[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        return counts
+
+    def _publish_queue_depth(self):
+        # Called with the condition held
+        for name, count in self._count_waiters().items():
+            metrics.set_gauge(f"rate_governor.{self.host}.queued.{name}", count)
+
+    def _take_token(self, priority):
+        """
+        Try to take one token from the shared bucket.
+        Returns 0 on success, or the number of seconds until one is available.
+        """
+        with self._locked_state() as state:
+            now = time.time()
+            elapsed = max(0.0, now - state["updated"])
+            tokens = min(self.burst, state["tokens"] + elapsed * self.rate)
+
+            # Batch requests leave part of the burst for interactive ones
+            floor = self.burst * BATCH_RESERVE if priority >= BATCH else 0.0
+
+            if tokens >= floor + 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (floor + 1 - tokens) / self.rate
+
+            # Publish how many of our callers are still queued behind this one
+            queued = len(self._waiters) - (1 if wait == 0 else 0)
+
+            state["tokens"] = tokens
+            state["updated"] = now
+            state["queued"][str(os.getpid())] = queued
+            return wait
+
+    @contextlib.contextmanager
+    def _locked_state(self):
+        """
+        Open, lock and load the bucket file, then write it back on exit.
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+            raw = b""
+            while True:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    break
+                raw += chunk
+
+            try:
+                state = json.loads(raw) if raw else {}
+            except ValueError:
+                state = {}
+            state.setdefault("tokens", self.burst)
+            state.setdefault("updated", time.time())
+            state.setdefault("queued", {})
+
+            # Drop queue depths reported by processes that have exited
+            state["queued"] = {pid: count for pid, count in state["queued"].items() if count and _pid_alive(int(pid))}
+
+            yield state
+
+            data = json.dumps(state).encode("utf-8")
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, data)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # The process exists but belongs to another user
+        return True
+    return True
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(host):
+    """
+    Return the token bucket for a host, creating it on first use.
+    """
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(host)
+        return _buckets[host]
+
+
+def acquire(host, priority=None):
+    """
+    Wait for permission to send one request to a host.
+    Uses the priority of the calling context unless one is given.
+    """
+    if priority is None:
+        priority = current_priority()
+    return get_bucket(host).acquire(priority)
+
+
+def get_queue_metrics():
+    """
+    Return the queue depth of every known host, both for this process (per
+    priority) and summed over all processes sharing the buckets.
+    """
+    with _buckets_lock:
+        buckets = list(_buckets.values())
+
+    return {
+        bucket.host: {
+            "local": bucket.queue_depth(),
+            "all_processes": bucket.shared_queue_depth(),
+        }
+        for bucket in buckets
+    }
@@ -0,0 +1,467 @@
+import argparse
+import contextvars
+import functools
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from urllib.parse import urlparse
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib with a preset dictionary is used instead
+    zstandard = None
+
+import species_cache
+
+# Archive of the raw upstream responses each species card was built from, so
+# the cards can be rebuilt with changed extractors without refetching (see
+# reprocess). Set WILDCARDS_ARCHIVE to a file path to turn it on.
+#
+# Responses are stored once per (source, page title, revision, call) and
+# compressed with a dictionary trained on archived species pages: zstandard's
+# when the package is installed, otherwise a zlib preset dictionary of the
+# most common fragments. A species table maps each query to the responses its
+# card was built from.
+ARCHIVE_PATH = os.environ.get("WILDCARDS_ARCHIVE", "")
+
+# Calls whose responses feed the extractors; image searches are not archived
+ARCHIVED_CALLS = ("wikispecies.page", "wikipedia.search", "wikipedia.content")
+
+# zlib only looks back 32 KB, so a larger preset dictionary is wasted
+ZLIB_DICTIONARY_SIZE = 32 * 1024
+ZSTD_DICTIONARY_SIZE = 112 * 1024
+
+# Responses sampled to train a dictionary
+TRAINING_SAMPLES = 2000
+
+# JSON keys and short strings, the fragments a zlib dictionary is built from
+_fragment = re.compile(rb'"[^"\\]{2,60}"\s*:?\s*')
+
+_archive = None
+_archive_lock = threading.Lock()
+
+# Responses captured for the species being built ({"responses", "failed"}),
+# and responses being replayed
+_recording = contextvars.ContextVar("response_archive_recording", default=None)
+_replaying = contextvars.ContextVar("response_archive_replaying", default=None)
+
+
+class ArchiveMiss(BaseException):
+    """
+    Raised during a replay for a call the archive holds no response for. It
+    derives from BaseException so that the source lookups' "except
+    Exception" blocks can't turn it into an ordinary source error, and a
+    partial card built from it.
+    """
+
+
+class ResponseArchive:
+    """
+    SQLite file of compressed upstream responses. Safe to share between
+    threads and processes on one host.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._dictionaries = {}
+        self._db().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                source TEXT, title TEXT, revid INTEGER, call TEXT,
+                archived_at REAL, codec TEXT, dictionary INTEGER, body BLOB,
+                PRIMARY KEY (source, title, revid, call)
+            );
+            CREATE TABLE IF NOT EXISTS species (
+                query_key TEXT, name TEXT, call TEXT, source TEXT, title TEXT, revid INTEGER,
+                PRIMARY KEY (query_key, call)
+            );
+            CREATE TABLE IF NOT EXISTS dictionaries (
+                id INTEGER PRIMARY KEY, codec TEXT, data BLOB
+            );
+            """
+        )
+
+    def _db(self):
+        # sqlite3 connections can't be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _dictionary(self, dictionary_id):
+        if dictionary_id not in self._dictionaries:
+            row = self._db().execute("SELECT codec, data FROM dictionaries WHERE id = ?", (dictionary_id,)).fetchone()
+            self._dictionaries[dictionary_id] = (row[0], bytes(row[1]))
+        return self._dictionaries[dictionary_id]
+
+    def _latest_dictionary(self):
+        row = self._db().execute("SELECT MAX(id) FROM dictionaries").fetchone()
+        return row[0] or 0
+
+    def compress(self, body, dictionary_id):
+        """
+        Compress a response body, returning (codec, compressed bytes).
+        """
+        if not dictionary_id:
+            return "zlib", zlib.compress(body, 9)
+        codec, data = self._dictionary(dictionary_id)
+        if codec == "zstd":
+            return codec, _zstd().ZstdCompressor(level=19, dict_data=_zstd().ZstdCompressionDict(data)).compress(body)
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY, data)
+        return codec, compressor.compress(body) + compressor.flush()
+
+    def decompress(self, codec, dictionary_id, blob):
+        blob = bytes(blob)
+        if not dictionary_id:
+            return zlib.decompress(blob)
+        data = self._dictionary(dictionary_id)[1]
+        if codec == "zstd":
+            return _zstd().ZstdDecompressor(dict_data=_zstd().ZstdCompressionDict(data)).decompress(blob)
+        return zlib.decompressobj(zdict=data).decompress(blob)
+
+    def store(self, query_key, name, responses):
+        """
+        Archive the responses ((call, source, title, revid, body) tuples) a
+        species card was built from, replacing its previous set. Responses of
+        the previous set that no species uses any more are deleted.
+        """
+        dictionary_id = self._latest_dictionary()
+        now = time.time()
+        rows = []
+        for call, source, title, revid, body in responses:
+            codec, blob = self.compress(body, dictionary_id)
+            rows.append((source, title, revid, call, now, codec, dictionary_id, blob))
+
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            previous = db.execute(
+                "SELECT source, title, revid, call FROM species WHERE query_key = ?", (query_key,)
+            ).fetchall()
+            db.execute("DELETE FROM species WHERE query_key = ?", (query_key,))
+            db.executemany(
+                "INSERT INTO species VALUES (?, ?, ?, ?, ?, ?)",
+                [(query_key, name, call, source, title, revid) for call, source, title, revid, _ in responses],
+            )
+            # Other queries (e.g. a common name) may share a response
+            db.executemany(
+                "DELETE FROM responses WHERE source = ? AND title = ? AND revid = ? AND call = ? AND NOT EXISTS "
+                "(SELECT 1 FROM species WHERE species.source = responses.source AND species.title = responses.title "
+                "AND species.revid = responses.revid AND species.call = responses.call)",
+                previous,
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def load(self, query_key):
+        """
+        Return {call: body} for the responses a species card was built from.
+        """
+        rows = self._db().execute(
+            "SELECT species.call, responses.codec, responses.dictionary, responses.body FROM species "
+            "JOIN responses USING (source, title, revid, call) WHERE species.query_key = ?",
+            (query_key,),
+        )
+        return {call: self.decompress(codec, dictionary_id, blob) for call, codec, dictionary_id, blob in rows}
+
+    def species(self):
+        """
+        Return the (query key, name) of every archived species.
+        """
+        return self._db().execute("SELECT DISTINCT query_key, name FROM species ORDER BY query_key").fetchall()
+
+    def stats(self):
+        db = self._db()
+        responses, stored = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()
+        species = db.execute("SELECT COUNT(DISTINCT query_key) FROM species").fetchone()[0]
+        return {"species": species, "responses": responses, "stored_bytes": stored,
+                "dictionary": self._latest_dictionary()}
+
+    def train(self, size=None):
+        """
+        Train a dictionary on a sample of the archived responses and recompress
+        every response with it. Returns (dictionary id, bytes before, after).
+        """
+        db = self._db()
+        rows = db.execute(
+            "SELECT codec, dictionary, body FROM responses ORDER BY RANDOM() LIMIT ?", (TRAINING_SAMPLES,)
+        ).fetchall()
+        samples = [self.decompress(*row) for row in rows]
+        if not samples:
+            raise ValueError("The archive is empty")
+
+        if zstandard is not None:
+            codec = "zstd"
+            data = zstandard.train_dictionary(size or ZSTD_DICTIONARY_SIZE, samples).as_bytes()
+        else:
+            codec = "zlib"
+            data = train_zlib_dictionary(samples, size or ZLIB_DICTIONARY_SIZE)
+        dictionary_id = db.execute("INSERT INTO dictionaries (codec, data) VALUES (?, ?)", (codec, data)).lastrowid
+
+        before = after = 0
+        keys = db.execute("SELECT source, title, revid, call FROM responses").fetchall()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for key in keys:
+                old_codec, old_dictionary, blob = db.execute(
+                    "SELECT codec, dictionary, body FROM responses "
+                    "WHERE source = ? AND title = ? AND revid = ? AND call = ?", key
+                ).fetchone()
+                new_codec, new_blob = self.compress(self.decompress(old_codec, old_dictionary, blob), dictionary_id)
+                before += len(blob)
+                after += len(new_blob)
+                db.execute(
+                    "UPDATE responses SET codec = ?, dictionary = ?, body = ? "
+                    "WHERE source = ? AND title = ? AND revid = ? AND call = ?",
+                    (new_codec, dictionary_id, new_blob) + tuple(key),
+                )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return dictionary_id, before, after
+
+
+def _zstd():
+    if zstandard is None:
+        raise ImportError("This archive was compressed with zstandard (pip install zstandard)")
+    return zstandard
+
+
+def train_zlib_dictionary(samples, size=ZLIB_DICTIONARY_SIZE):
+    """
+    Build a zlib preset dictionary from the JSON keys and short strings that
+    occur in the most samples. zlib finds matches closer to the end of the
+    dictionary more cheaply, so the most common fragments go last.
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update(set(_fragment.findall(sample)))
+
+    chosen = []
+    total = 0
+    for fragment, count in counts.most_common():
+        if count < 2 or total + len(fragment) > size:
+            break
+        chosen.append(fragment)
+        total += len(fragment)
+    return b"".join(reversed(chosen))
+
+
+def get_archive():
+    """
+    Return the archive WILDCARDS_ARCHIVE points at, or None if it is off.
+    """
+    global _archive
+    if not ARCHIVE_PATH:
+        return None
+    with _archive_lock:
+        if _archive is None:
+            _archive = ResponseArchive(ARCHIVE_PATH)
+        return _archive
+
+
+def needs_full_pages():
+    """
+    Return True while responses are archived or replayed. Cards are then built
+    from complete pages, without taxon cache shortcuts, so that every
+    extractor can be re-run on the archived responses.
+    """
+    return bool(ARCHIVE_PATH) or _replaying.get() is not None
+
+
+def recorded(func):
+    """
+    Decorator for a function building a species card from its name (the first
+    argument): when the archive is on, the upstream responses it receives are
+    archived under the species' query key. Only complete cards are archived:
+    a degraded one (an error, a skipped source, a stale copy or a failed
+    call) would replace the species' complete set with part of it.
+    """
+    @functools.wraps(func)
+    def wrapper(species_name, *args, **kwargs):
+        archive = get_archive()
+        if archive is None or _replaying.get() is not None:
+            return func(species_name, *args, **kwargs)
+
+        recording = {"responses": [], "failed": []}
+        token = _recording.set(recording)
+        try:
+            result = func(species_name, *args, **kwargs)
+        finally:
+            _recording.reset(token)
+        complete = not (recording["failed"] or result.get("error") or result.get("skipped_sources")
+                        or result.get("stale"))
+        if recording["responses"] and complete:
+            try:
+                archive.store(species_cache.query_key(species_name), species_name, recording["responses"])
+            except Exception as e:
+                print(f"Error archiving responses for {species_name}: {str(e)}")
+        return result
+
+    return wrapper
+
+
+def record(call, params, body, data):
+    """
+    Capture one upstream response if a species card is being recorded.
+    """
+    recording = _recording.get()
+    if recording is None or call not in ARCHIVED_CALLS:
+        return
+    pages = data.get("query", {}).get("pages", {})
+    if len(pages) == 1:
+        page = next(iter(pages.values()))
+        title, revid = page.get("title", ""), page.get("lastrevid", 0)
+    else:
+        title, revid = params.get("srsearch") or params.get("titles", ""), 0
+    recording["responses"].append((call, call.split(".")[0], title, revid, body))
+
+
+def record_failure(call):
+    """
+    Note that a call failed while a species card is being recorded, so the
+    card isn't archived.
+    """
+    recording = _recording.get()
+    if recording is not None and call in ARCHIVED_CALLS:
+        recording["failed"].append(call)
+
+
+def replayed_response(call):
+    """
+    During a replay, return the archived response for a call (decoded), or
+    raise ArchiveMiss. Outside a replay return None.
+    """
+    responses = _replaying.get()
+    if responses is None:
+        return None
+    if call not in responses:
+        raise ArchiveMiss(call)
+    return json.loads(responses[call])
+
+
+def _reprocess_species(build, query_key, name):
+    archive = get_archive()
+    token = _replaying.set(archive.load(query_key))
+    try:
+        return query_key, build(name)
+    except ArchiveMiss as e:
+        # Rebuilding without the response would give a partial card
+        return query_key, {"title": name, "error": f"The archive holds no {e} response"}
+    finally:
+        _replaying.reset(token)
+
+
+def _reprocess_chunk(species):
+    # Runs in a reprocess worker; the card builder lives in the app module
+    from app import fetch_species_info
+
+    return [_reprocess_species(fetch_species_info, query_key, name) for query_key, name in species]
+
+
+def reprocess(workers=None, chunk_size=20, progress=None):
+    """
+    Rebuild every archived species card with the current extractors, in
+    parallel worker processes, without touching the network. Yields
+    (query key, card) pairs as chunks finish.
+    """
+    archive = get_archive()
+    if archive is None:
+        raise ValueError("Set WILDCARDS_ARCHIVE to the archive file")
+    species = archive.species()
+    chunks = [species[i:i + chunk_size] for i in range(0, len(species), chunk_size)]
+
+    # Each worker parses inline: the pool itself uses every core
+    os.environ["WILDCARDS_EXTRACTION_WORKERS"] = "0"
+    os.environ["WILDCARDS_PREFETCH"] = "0"
+    os.environ["WILDCARDS_WARM_CACHE"] = "0"
+    os.environ["WILDCARDS_REFRESH"] = "0"
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers or os.cpu_count()) as pool:
+        for results in pool.imap_unordered(_reprocess_chunk, chunks):
+            yield from results
+
+
+def main(argv=None):
+    """
+    Command line: inspect the archive, train its compression dictionary, or
+    rebuild the cards from it.
+
+        python response_archive.py stats
+        python response_archive.py train
+        python response_archive.py reprocess [--workers 8] [--output cards.jsonl]
+
+    reprocess writes the rebuilt cards into the species cache; point
+    WILDCARDS_CACHE_URL at a shared cache so the servers see them. With the
+    default memory:// cache it refuses to run without --output.
+    """
+    global ARCHIVE_PATH
+    parser = argparse.ArgumentParser(description="Archive of raw upstream responses.")
+    parser.add_argument("--archive", default=ARCHIVE_PATH, help="archive file (default: $WILDCARDS_ARCHIVE)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="count the archived species and responses")
+    train = commands.add_parser("train", help="train a compression dictionary and recompress the archive")
+    train.add_argument("--size", type=int, help="dictionary size in bytes")
+    rebuild = commands.add_parser("reprocess", help="rebuild the cards from the archive with the current extractors")
+    rebuild.add_argument("--workers", type=int, default=os.cpu_count())
+    rebuild.add_argument("--output", help="also write the cards to this JSON lines file")
+    args = parser.parse_args(argv)
+
+    if not args.archive:
+        parser.error("set WILDCARDS_ARCHIVE or pass --archive")
+    ARCHIVE_PATH = args.archive
+    os.environ["WILDCARDS_ARCHIVE"] = args.archive  # for reprocess workers
+    archive = get_archive()
+
+    if args.command == "stats":
+        for name, value in archive.stats().items():
+            print(f"{name}: {value}")
+        return 0
+
+    if args.command == "train":
+        dictionary_id, before, after = archive.train(args.size)
+        print(f"Dictionary {dictionary_id}: {before} -> {after} bytes ({after / max(before, 1):.0%})")
+        return 0
+
+    # A memory:// cache would be thrown away when this command exits
+    if not args.output and urlparse(species_cache.CACHE_URL or "memory://").scheme == "memory":
+        parser.error("reprocess needs --output or a shared WILDCARDS_CACHE_URL to keep the rebuilt cards")
+
+    started = time.monotonic()
+    count = errors = 0
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        for query_key, card in reprocess(args.workers):
+            count += 1
+            # Partial cards (e.g. a missing response) are never written
+            if card.get("error") or card.get("skipped_sources") or card.get("stale"):
+                errors += 1
+                continue
+            species_cache.put_card(query_key, card)
+            if output:
+                output.write(json.dumps({"query": query_key, "card": card}, ensure_ascii=False) + "\n")
+    finally:
+        if output:
+            output.close()
+    elapsed = time.monotonic() - started
+    print(f"Rebuilt {count - errors} of {count} cards in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.1f}/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
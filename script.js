@@ -10,6 +10,24 @@ document.addEventListener('DOMContentLoaded', function() {
     const resultsContainer = document.getElementById('results');
     const loadingOverlay = document.getElementById('loading-overlay');
 
+    // Recent species results are kept in IndexedDB, so repeat lookups render
+    // instantly; they are revalidated in the background once this old
+    const RESULT_DB = 'speciscan';
+    const RESULT_STORE = 'species';
+    const MAX_CACHED_RESULTS = 100;
+    const REVALIDATE_AFTER_MS = 10 * 60 * 1000;
+
+    // Key of the species being shown and the JSON it was rendered from
+    let currentKey = null;
+    let renderedJson = null;
+
+    // Cache static assets and Commons thumbnails (see sw.js)
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('/sw.js').catch(error => {
+            console.error('Service worker registration failed:', error);
+        });
+    }
+
     // Handle drag and drop for file upload
     uploadZone.addEventListener('dragover', function(e) {
         e.preventDefault();
@@ -73,8 +91,11 @@ document.addEventListener('DOMContentLoaded', function() {
             // Hide loading overlay
             loadingOverlay.classList.remove('active');
             
-            // Display results
-            displayResults(data);
+            // Display results, and remember them for later searches by name
+            const key = data.species_data ? cacheKey(data.species_data.title) : null;
+            currentKey = key;
+            renderResults(data);
+            if (key && isCacheable(data)) putCachedResult(key, data);
         })
         .catch(error => {
             // Hide loading overlay
@@ -90,12 +111,51 @@ document.addEventListener('DOMContentLoaded', function() {
         e.preventDefault();
         
         const formData = new FormData(nameForm);
+        const key = cacheKey(formData.get('species_name'));
+        currentKey = key;
         
-        // Show loading overlay
-        loadingOverlay.classList.add('active');
-        
-        // Submit form data to server
-        fetch('/search_by_name', {
+        getCachedResult(key).then(cached => {
+            if (cached) {
+                // Show the stored result right away, and refresh it quietly
+                // if it is getting old
+                renderResults(cached.data);
+                if (Date.now() - cached.storedAt > REVALIDATE_AFTER_MS) {
+                    searchByName(formData)
+                        .then(data => {
+                            if (!isCacheable(data)) return;
+                            putCachedResult(key, data);
+                            if (key === currentKey) renderResults(data, true);
+                        })
+                        .catch(error => console.error('Error revalidating:', error));
+                }
+                return;
+            }
+            
+            // Show loading overlay
+            loadingOverlay.classList.add('active');
+            
+            searchByName(formData)
+                .then(data => {
+                    // Hide loading overlay
+                    loadingOverlay.classList.remove('active');
+                    
+                    // Display results unless another search started meanwhile
+                    if (key === currentKey) renderResults(data);
+                    if (isCacheable(data)) putCachedResult(key, data);
+                })
+                .catch(error => {
+                    // Hide loading overlay
+                    loadingOverlay.classList.remove('active');
+                    
+                    console.error('Error:', error);
+                    alert('Error: ' + error.message);
+                });
+        });
+    });
+
+    // Submit form data to server
+    function searchByName(formData) {
+        return fetch('/search_by_name', {
             method: 'POST',
             body: formData
         })
@@ -104,22 +164,89 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error('Network response was not ok');
             }
             return response.json();
-        })
-        .then(data => {
-            // Hide loading overlay
-            loadingOverlay.classList.remove('active');
-            
-            // Display results
-            displayResults(data);
-        })
-        .catch(error => {
-            // Hide loading overlay
-            loadingOverlay.classList.remove('active');
+        });
+    }
+
+    // Queries that only differ in whitespace or case share a result, like
+    // the server-side species cache
+    function cacheKey(speciesName) {
+        return (speciesName || '').trim().split(/\s+/).join(' ').toLowerCase();
+    }
+
+    // Errors are not stored, so the next search tries again
+    function isCacheable(data) {
+        // Degraded cards (a source was skipped, or a stale copy was served)
+        // would keep being shown offline; only keep complete ones
+        const species = data.species_data;
+        return !data.error && species && !species.error && !species.stale &&
+            !(species.skipped_sources && species.skipped_sources.length);
+    }
+
+    function openResultDb() {
+        if (!openResultDb.promise) {
+            openResultDb.promise = new Promise(resolve => {
+                if (!window.indexedDB) {
+                    resolve(null);
+                    return;
+                }
+                const request = indexedDB.open(RESULT_DB, 1);
+                request.onupgradeneeded = () => {
+                    const store = request.result.createObjectStore(RESULT_STORE, { keyPath: 'key' });
+                    store.createIndex('storedAt', 'storedAt');
+                };
+                request.onsuccess = () => resolve(request.result);
+                // Without IndexedDB (e.g. some private windows) every search goes to the server
+                request.onerror = () => resolve(null);
+            });
+        }
+        return openResultDb.promise;
+    }
+
+    function getCachedResult(key) {
+        return openResultDb().then(db => {
+            if (!db) return null;
+            return new Promise(resolve => {
+                const request = db.transaction(RESULT_STORE).objectStore(RESULT_STORE).get(key);
+                request.onsuccess = () => resolve(request.result || null);
+                request.onerror = () => resolve(null);
+            });
+        });
+    }
+
+    function putCachedResult(key, data) {
+        return openResultDb().then(db => {
+            if (!db) return;
+            const store = db.transaction(RESULT_STORE, 'readwrite').objectStore(RESULT_STORE);
+            store.put({ key: key, data: data, storedAt: Date.now() });
             
-            console.error('Error:', error);
-            alert('Error: ' + error.message);
+            // Drop the oldest results beyond the limit
+            const countRequest = store.count();
+            countRequest.onsuccess = () => {
+                let excess = countRequest.result - MAX_CACHED_RESULTS;
+                if (excess <= 0) return;
+                store.index('storedAt').openCursor().onsuccess = event => {
+                    const cursor = event.target.result;
+                    if (cursor && excess-- > 0) {
+                        cursor.delete();
+                        cursor.continue();
+                    }
+                };
+            };
         });
-    });
+    }
+
+    // Display results, skipping the DOM rebuild when they are unchanged.
+    // Background refreshes don't scroll the page.
+    function renderResults(data, quiet) {
+        const json = JSON.stringify(data);
+        if (json !== renderedJson) {
+            renderedJson = json;
+            displayResults(data);
+        }
+        if (!quiet) {
+            resultsContainer.scrollIntoView({ behavior: 'smooth' });
+        }
+    }
 
     // Handle suggestion chips
     const suggestionChips = document.querySelectorAll('.chip');
@@ -135,9 +262,6 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Function to display results
     function displayResults(data) {
-        // Scroll to results
-        resultsContainer.scrollIntoView({ behavior: 'smooth' });
-        
         // Check if we have valid data
         if (data.error) {
             resultsContainer.innerHTML = `
@@ -0,0 +1,313 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+
+import species_cache
+import species_record
+
+# Bundle layout (all integers little-endian):
+#
+#   header   magic, version, entry count and the offsets of the sections below
+#   keys     the UTF-8 query keys, back to back
+#   index    one fixed-size entry per species, sorted by key bytes
+#   records  the packed species records (card, image metadata and the
+#            position of each image's thumbnail, see encode_record)
+#   thumbs   the raw thumbnail bytes, back to back
+#
+# Every lookup is a binary search over the fixed-size index entries directly in
+# the memory-mapped file, so opening a bundle needs no parse step at all.
+MAGIC = b"WCBUNDLE"
+VERSION = 2
+
+HEADER = struct.Struct("<8sHHIQQQ")  # magic, version, flags, count, keys, index, records offsets
+INDEX_ENTRY = struct.Struct("<QHHQIQI")  # key offset, key length, reserved, record offset/length, thumbs offset/length
+
+# Environment variable pointing at a bundle to serve from with no network access
+OFFLINE_BUNDLE_ENV = "WILDCARDS_OFFLINE_BUNDLE"
+
+
+class BundleError(Exception):
+    """
+    Raised when a file is not a valid species bundle.
+    """
+
+
+RECORD_LENGTH = struct.Struct("<I")
+THUMB_ENTRY = struct.Struct("<II")  # offset within the species' thumbnail blob, length
+NO_THUMBNAIL = 0xFFFFFFFF
+
+
+def encode_record(card, images, thumb_positions):
+    """
+    Serialize one species for the records section: the compact card and image
+    records (see species_record.py) followed by one (offset, length) entry per
+    image locating its thumbnail, or NO_THUMBNAIL.
+    """
+    card_data = species_record.pack_card(card)
+    image_data = species_record.pack_images(images)
+    out = bytearray()
+    out += RECORD_LENGTH.pack(len(card_data)) + card_data
+    out += RECORD_LENGTH.pack(len(image_data)) + image_data
+    for offset, length in thumb_positions:
+        out += THUMB_ENTRY.pack(offset, length)
+    return bytes(out)
+
+
+def decode_record(data):
+    """
+    Inverse of encode_record; returns (card, images, thumb_positions).
+    """
+    view = memoryview(data)
+    (card_length,) = RECORD_LENGTH.unpack_from(view, 0)
+    position = RECORD_LENGTH.size
+    card = species_record.unpack_card(view[position:position + card_length])
+    position += card_length
+
+    (image_length,) = RECORD_LENGTH.unpack_from(view, position)
+    position += RECORD_LENGTH.size
+    images = species_record.unpack_images(view[position:position + image_length])
+    position += image_length
+
+    thumb_positions = [THUMB_ENTRY.unpack_from(view, position + i * THUMB_ENTRY.size) for i in range(len(images))]
+    return card, images, thumb_positions
+
+
+def export_bundle(path, entries):
+    """
+    Write a bundle file from (species_name, card, images, thumbnails) tuples,
+    where thumbnails is a list with the thumbnail bytes (or None) of each image.
+    Returns the number of species written.
+    """
+    # Deduplicate on the query key; later entries win
+    by_key = {}
+    for species_name, card, images, thumbnails in entries:
+        by_key[species_cache.query_key(species_name).encode("utf-8")] = (card, images, thumbnails)
+    keys = sorted(by_key)
+
+    # Build the records and thumbnail blobs first so their offsets are known
+    records = []
+    thumbs = []
+    for key in keys:
+        card, images, thumbnails = by_key[key]
+        thumb_positions = []
+        blob = bytearray()
+        for thumbnail in thumbnails or [None] * len(images):
+            if thumbnail:
+                # Offsets are relative to this species' thumbnail blob
+                thumb_positions.append((len(blob), len(thumbnail)))
+                blob.extend(thumbnail)
+            else:
+                thumb_positions.append((NO_THUMBNAIL, 0))
+        records.append(encode_record(card, images, thumb_positions))
+        thumbs.append(bytes(blob))
+
+    keys_offset = HEADER.size
+    index_offset = keys_offset + sum(len(key) for key in keys)
+    records_offset = index_offset + INDEX_ENTRY.size * len(keys)
+    thumbs_offset = records_offset + sum(len(record) for record in records)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(keys), keys_offset, index_offset, records_offset))
+        for key in keys:
+            f.write(key)
+
+        key_position = keys_offset
+        record_position = records_offset
+        thumb_position = thumbs_offset
+        for key, record, blob in zip(keys, records, thumbs):
+            f.write(INDEX_ENTRY.pack(key_position, len(key), 0, record_position, len(record), thumb_position, len(blob)))
+            key_position += len(key)
+            record_position += len(record)
+            thumb_position += len(blob)
+
+        for record in records:
+            f.write(record)
+        for blob in thumbs:
+            f.write(blob)
+
+    # Replace the old bundle atomically so readers never see a partial file
+    os.replace(tmp_path, path)
+    return len(keys)
+
+
+class SpeciesBundle:
+    """
+    A read-only, memory-mapped species bundle.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER.size:
+            raise BundleError(f"{path} is too small to be a species bundle")
+        magic, version, _, self.count, _, self._index_offset, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise BundleError(f"{path} is not a species bundle")
+        if version != VERSION:
+            raise BundleError(f"{path} has unsupported bundle version {version}")
+
+    def __len__(self):
+        return self.count
+
+    def _entry(self, position):
+        return INDEX_ENTRY.unpack_from(self._mmap, self._index_offset + position * INDEX_ENTRY.size)
+
+    def _key(self, entry):
+        return self._mmap[entry[0]:entry[0] + entry[1]]
+
+    def _find(self, species_name):
+        """
+        Binary search the index for a query; returns the index entry or None.
+        """
+        key = species_cache.query_key(species_name).encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry = self._entry(middle)
+            candidate = self._key(entry)
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return entry
+        return None
+
+    def __contains__(self, species_name):
+        return self._find(species_name) is not None
+
+    def get(self, species_name):
+        """
+        Return (card, images) for a query, or None if it isn't in the bundle.
+        Images that were exported with a thumbnail carry its bytes under
+        "thumb_data".
+        """
+        entry = self._find(species_name)
+        if entry is None:
+            return None
+
+        _, _, _, record_offset, record_length, thumbs_offset, _ = entry
+        card, images, thumb_positions = decode_record(self._mmap[record_offset:record_offset + record_length])
+        for image, (offset, length) in zip(images, thumb_positions):
+            if offset != NO_THUMBNAIL:
+                start = thumbs_offset + offset
+                image["thumb_data"] = self._mmap[start:start + length]
+        return card, images
+
+    def keys(self):
+        """
+        Iterate over the query keys in the bundle, in sorted order.
+        """
+        for position in range(self.count):
+            yield self._key(self._entry(position)).decode("utf-8")
+
+    def close(self):
+        self._mmap.close()
+
+
+_offline_bundle = None
+_offline_lock = threading.Lock()
+
+
+def get_offline_bundle():
+    """
+    Return the bundle named by WILDCARDS_OFFLINE_BUNDLE, or None when the app
+    is not running in offline mode. The bundle is opened once per process.
+    """
+    global _offline_bundle
+    path = os.environ.get(OFFLINE_BUNDLE_ENV)
+    if not path:
+        return None
+
+    with _offline_lock:
+        if _offline_bundle is None or _offline_bundle.path != path:
+            _offline_bundle = SpeciesBundle(path)
+        return _offline_bundle
+
+
+def fetch_thumbnail(image):
+    """
+    Download the thumbnail (or the full image if there is no thumbnail) of one
+    image, returning its bytes or None.
+    """
+    # Imported here so reading a bundle never needs the network stack
+    import rate_governor
+    from wikimedia_api import record_transfer, wikimedia_get
+
+    url = image.get("thumb_url") or image.get("url")
+    if not url or image.get("error"):
+        return None
+    try:
+        with rate_governor.request_priority(rate_governor.BATCH):
+            response = wikimedia_get(url)
+        if response.status_code != 200:
+            return None
+        record_transfer("commons.thumbnail", len(response.content), response.headers.get("Content-Length"))
+        return response.content
+    except Exception as e:
+        print(f"Could not download {url}: {str(e)}")
+        return None
+
+
+def main(argv=None):
+    """
+    Command line: look species up and export them into a bundle file.
+
+        python species_bundle.py export classroom.wcb "Panthera leo" "Apis mellifera"
+        python species_bundle.py export classroom.wcb --names-file popular_species.txt
+        python species_bundle.py list classroom.wcb
+    """
+    parser = argparse.ArgumentParser(description="Build or inspect offline species bundles.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="look species up and write them into a bundle")
+    export.add_argument("bundle")
+    export.add_argument("names", nargs="*")
+    export.add_argument("--names-file", help="file with one species name per line")
+    export.add_argument("--no-thumbnails", action="store_true", help="don't embed thumbnail images")
+
+    listing = commands.add_parser("list", help="list the species in a bundle")
+    listing.add_argument("bundle")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        bundle = SpeciesBundle(args.bundle)
+        for key in bundle.keys():
+            print(key)
+        return 0
+
+    names = list(args.names)
+    if args.names_file:
+        with open(args.names_file, encoding="utf-8") as f:
+            names.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not names:
+        parser.error("no species names given")
+
+    # The lookup functions live in the Streamlit app module
+    from app import get_species_info, get_species_images
+
+    entries = []
+    for name in names:
+        card = get_species_info(name)
+        if card.get("error"):
+            print(f"Skipping {name}: {card['error']}")
+            continue
+        images = [image for image in get_species_images(name) if not image.get("error")]
+        thumbnails = None if args.no_thumbnails else [fetch_thumbnail(image) for image in images]
+        entries.append((name, card, images, thumbnails))
+        print(f"Added {name} ({len(images)} images)")
+
+    count = export_bundle(args.bundle, entries)
+    print(f"Wrote {count} species to {args.bundle} ({os.path.getsize(args.bundle)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+import copy
+import os
+import re
+import socket
+import threading
+import time
+
+import cache_backends
+import metrics
+import species_record
+
+# How long a recorded miss is trusted before the source is queried again.
+# Kept short so that newly created pages show up without a restart.
+NEGATIVE_TTL_SECONDS = 10 * 60
+
+# Upper bound on the number of remembered misses per process
+MAX_NEGATIVE_ENTRIES = 5000
+
+# How long cached cards and image lists are served without asking upstream.
+# Expired entries are kept (until evicted) as a fallback for when a source is
+# unavailable.
+CARD_TTL_SECONDS = 6 * 60 * 60
+
+# Upper bound on the number of cached entries per namespace ("card", "images")
+MAX_ENTRIES = 2000
+
+# Where cards and image lists are cached: memory:// (per process, the
+# default), sqlite:///path/to/cache.db (shared by the processes on one host)
+# or redis://host:port/db (shared by every host). See cache_backends.py.
+CACHE_URL = os.environ.get("WILDCARDS_CACHE_URL", "memory://")
+
+# A caller filling a missing entry holds a lease on it for up to this long;
+# others wait up to FILL_WAIT_SECONDS for the entry to appear
+FILL_LEASE_SECONDS = 30
+FILL_WAIT_SECONDS = 15
+FILL_POLL_SECONDS = 0.1
+
+# Misses are cheap to rediscover, so they stay per process. Kept in this
+# module so Streamlit reruns don't reset them.
+_negative = {}
+_lock = threading.Lock()
+
+_backend = cache_backends.backend_from_url(CACHE_URL, MAX_ENTRIES)
+_host = socket.gethostname()
+
+_binomial_pattern = re.compile(r"^[A-Za-z]+( [A-Za-z.-]+){1,2}$")
+
+
+def normalize_query(species_name):
+    """
+    Normalize a species query the way Wikimedia titles are written.
+    Collapses whitespace and, for binomial or trinomial names, capitalizes the
+    genus and lower-cases the epithets ("panthera  LEO" -> "Panthera leo").
+    Other queries only get their first letter capitalized.
+    """
+    name = " ".join((species_name or "").split())
+    if not name:
+        return name
+
+    if _binomial_pattern.match(name):
+        parts = name.split(" ")
+        return " ".join([parts[0].capitalize()] + [part.lower() for part in parts[1:]])
+
+    return name[0].upper() + name[1:]
+
+
+def query_key(species_name):
+    """
+    Build the cache key for a species query.
+    Queries that only differ in whitespace or case share the same key.
+    """
+    return normalize_query(species_name).casefold()
+
+
+def record_miss(source, species_name, reason):
+    """
+    Remember that a source has no data for a query, and why.
+    """
+    key = (source, query_key(species_name))
+    with _lock:
+        # Evict the oldest entry when the cache is full (dicts keep insertion order)
+        if key not in _negative and len(_negative) >= MAX_NEGATIVE_ENTRIES:
+            _negative.pop(next(iter(_negative)))
+        _negative[key] = (time.time() + NEGATIVE_TTL_SECONDS, reason)
+
+
+def get_miss(source, species_name):
+    """
+    Return the reason a source recently missed for a query, or None if the
+    source should be queried.
+    """
+    key = (source, query_key(species_name))
+    with _lock:
+        entry = _negative.get(key)
+        if entry is None:
+            return None
+        expires_at, reason = entry
+        if expires_at < time.time():
+            del _negative[key]
+            return None
+        return reason
+
+
+def clear_misses():
+    """
+    Forget every recorded miss.
+    """
+    with _lock:
+        _negative.clear()
+
+
+def cache_put(namespace, species_name, value, ttl=CARD_TTL_SECONDS):
+    """
+    Store a value for a species query in the given namespace.
+    """
+    if not isinstance(value, bytes):
+        value = copy.deepcopy(value)
+    _backend.put(namespace, query_key(species_name), value, time.time() + ttl)
+
+
+def cache_get(namespace, species_name, allow_stale=False):
+    """
+    Return a copy of the cached value for a species query, or None.
+    Expired values are only returned when allow_stale is True.
+    """
+    entry = _backend.get(namespace, query_key(species_name))
+    if entry is None:
+        return None
+    expires_at, value = entry
+    if expires_at < time.time() and not allow_stale:
+        return None
+    if isinstance(value, bytes):
+        return value
+    return copy.deepcopy(value)
+
+
+def cached_keys(namespace):
+    """
+    Return the query keys held in a namespace, fresh or expired.
+    """
+    return _backend.keys(namespace)
+
+
+def renew(namespace, species_name, ttl=CARD_TTL_SECONDS):
+    """
+    Extend the lifetime of a cached value that is known to be up to date.
+    """
+    _backend.set_expiry(namespace, query_key(species_name), time.time() + ttl)
+
+
+def expire(namespace, species_name):
+    """
+    Mark a cached value as expired so the next lookup refetches it. The value
+    is kept as a stale fallback: expiring it now, rather than at time 0,
+    leaves it the backends' full stale lifetime (STALE_KEEP_SECONDS).
+    """
+    _backend.set_expiry(namespace, query_key(species_name), time.time())
+
+
+def get_or_fill(namespace, species_name, get, fill):
+    """
+    Return get(species_name) if the entry is cached, otherwise
+    fill(species_name), which is expected to cache its result.
+
+    Only one caller at a time fills a given entry, across every thread,
+    process and host sharing the backend. The others poll for its result for
+    up to FILL_WAIT_SECONDS, then fill it themselves, so a crashed or slow
+    filler can't block a species for long.
+    """
+    value = get(species_name)
+    if value is not None:
+        return value
+
+    key = query_key(species_name)
+    owner = f"{_host}:{os.getpid()}:{threading.get_ident()}"
+    deadline = time.monotonic() + FILL_WAIT_SECONDS
+    while True:
+        if _backend.acquire_lease(namespace, key, owner, FILL_LEASE_SECONDS):
+            try:
+                # Someone else may have filled it while we waited for the lease
+                value = get(species_name)
+                return value if value is not None else fill(species_name)
+            finally:
+                _backend.release_lease(namespace, key, owner)
+
+        time.sleep(FILL_POLL_SECONDS)
+        value = get(species_name)
+        if value is not None:
+            metrics.increment(f"species_cache.{namespace}.filled_elsewhere")
+            return value
+        if time.monotonic() >= deadline:
+            metrics.increment(f"species_cache.{namespace}.fill_wait_timeouts")
+            return fill(species_name)
+
+
+def set_backend(backend):
+    """
+    Replace the cache backend (see cache_backends.py), e.g. in tools that
+    open a specific cache file.
+    """
+    global _backend
+    _backend = backend
+
+
+def get_card(species_name, allow_stale=False):
+    """
+    Return the cached species card for a query, or None.
+    """
+    data = cache_get("card", species_name, allow_stale)
+    return species_record.unpack_card(data) if data is not None else None
+
+
+def put_card(species_name, card):
+    """
+    Cache a species card in its compact binary form.
+    """
+    cache_put("card", species_name, species_record.pack_card(card))
+
+
+def get_images(species_name, allow_stale=False):
+    """
+    Return the cached image list for a query, or None.
+    """
+    data = cache_get("images", species_name, allow_stale)
+    return species_record.unpack_images(data) if data is not None else None
+
+
+def put_images(species_name, images):
+    """
+    Cache an image list in its compact binary form.
+    """
+    cache_put("images", species_name, species_record.pack_images(images))
+
+
+def clear():
+    """
+    Forget every cached card, image list and miss.
+    """
+    _backend.clear()
+    with _lock:
+        _negative.clear()
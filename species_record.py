@@ -0,0 +1,400 @@
+import struct
+
+# Compact, versioned binary form of a species card and its image list, used by
+# the species cache and the offline bundle instead of the dict-as-JSON form.
+#
+# Layout of a packed card:
+#
+#   magic "WR", format version (u8), kind (u8: card or images)
+#   title, description, last_modified and habitat as varint-length-prefixed
+#   UTF-8 strings
+#   classification: the seven main ranks as strings ("" means Unknown)
+#   fun facts and data sources as varint counts followed by strings
+#   optional sections: varint count, then (tag u8, varint length, payload)
+#
+# Readers skip sections with tags they don't know, so new optional data can be
+# added without breaking older readers. Incompatible layout changes must bump
+# FORMAT_VERSION.
+MAGIC = b"WR"
+FORMAT_VERSION = 1
+
+KIND_CARD = 1
+KIND_IMAGES = 2
+
+UNKNOWN = "Unknown"
+
+MAIN_RANKS = ("kingdom", "phylum", "class", "order", "family", "genus", "species")
+
+# Card fields that are only needed while extracting data from the source pages
+EXTRACTION_ONLY_FIELDS = ("categories", "links")
+
+# Optional section tags
+SECTION_EXTRA_RANKS = 1  # e.g. subfamily, suborder
+SECTION_MISSING_SOURCES = 2
+SECTION_SKIPPED_SOURCES = 3
+SECTION_REVISIONS = 4  # source page title and revision id, see cache_refresher.py
+SECTION_COMMON_NAMES = 5  # (language code, name) pairs
+
+# Common URL prefixes, stored as a one-byte code instead of the full text
+URL_PREFIXES = (
+    "",
+    "https://upload.wikimedia.org/wikipedia/commons/thumb/",
+    "https://upload.wikimedia.org/wikipedia/commons/",
+    "https://commons.wikimedia.org/wiki/",
+)
+
+_header = struct.Struct("<2sBB")
+
+
+class FormatError(ValueError):
+    """
+    Raised when bytes are not a species record this version can read.
+    """
+
+
+class SpeciesRecord:
+    """
+    Typed, slotted in-memory form of a species card. Ranks and fields that are
+    unknown are stored as empty strings, and extraction-only fields (categories
+    and links) are not kept at all.
+    """
+
+    __slots__ = (
+        "title", "description", "last_modified", "habitat", "classification",
+        "extra_ranks", "fun_facts", "data_sources", "missing_sources", "skipped_sources", "revisions",
+        "common_names",
+    )
+
+    def __init__(self, title="", description="", last_modified="", habitat="", classification=("",) * 7,
+                 extra_ranks=(), fun_facts=(), data_sources=(), missing_sources=(), skipped_sources=(),
+                 revisions=(), common_names=()):
+        self.title = title
+        self.description = description
+        self.last_modified = last_modified
+        self.habitat = habitat
+        self.classification = tuple(classification)
+        self.extra_ranks = tuple(extra_ranks)
+        self.fun_facts = tuple(fun_facts)
+        self.data_sources = tuple(data_sources)
+        self.missing_sources = tuple(missing_sources)
+        self.skipped_sources = tuple(skipped_sources)
+        self.revisions = tuple(revisions)  # (source, title, revision id)
+        self.common_names = tuple(common_names)  # (language code, name)
+
+    @classmethod
+    def from_card(cls, card):
+        """
+        Build a record from a species card dictionary.
+        """
+        classification = card.get("classification", {})
+        return cls(
+            title=card.get("title", ""),
+            description=card.get("description", ""),
+            last_modified=_known(card.get("last_modified")),
+            habitat=_known(card.get("habitat")),
+            classification=tuple(_known(classification.get(rank)) for rank in MAIN_RANKS),
+            extra_ranks=tuple((rank, value) for rank, value in classification.items()
+                              if rank not in MAIN_RANKS and value != UNKNOWN),
+            fun_facts=card.get("fun_facts", ()),
+            data_sources=card.get("data_sources", ()),
+            missing_sources=tuple(card.get("missing_sources", {}).items()),
+            skipped_sources=card.get("skipped_sources", ()),
+            revisions=tuple((source, revision["title"], revision["revid"])
+                            for source, revision in card.get("revisions", {}).items()),
+            common_names=tuple(card.get("common_names", {}).items()),
+        )
+
+    def to_card(self):
+        """
+        Rebuild the species card dictionary, restoring the "Unknown"
+        placeholders the display code expects.
+        """
+        classification = {rank: value or UNKNOWN for rank, value in zip(MAIN_RANKS, self.classification)}
+        classification.update(self.extra_ranks)
+        return {
+            "title": self.title,
+            "description": self.description,
+            "last_modified": self.last_modified or UNKNOWN,
+            "classification": classification,
+            "habitat": self.habitat or UNKNOWN,
+            "fun_facts": list(self.fun_facts),
+            "data_sources": list(self.data_sources),
+            "missing_sources": dict(self.missing_sources),
+            "skipped_sources": list(self.skipped_sources),
+            "revisions": {source: {"title": title, "revid": revid} for source, title, revid in self.revisions},
+            "common_names": dict(self.common_names),
+        }
+
+    def pack(self):
+        """
+        Serialize the record to bytes.
+        """
+        out = bytearray(_header.pack(MAGIC, FORMAT_VERSION, KIND_CARD))
+        for value in (self.title, self.description, self.last_modified, self.habitat):
+            _write_string(out, value)
+        for value in self.classification:
+            _write_string(out, value)
+        _write_strings(out, self.fun_facts)
+        _write_strings(out, self.data_sources)
+
+        sections = []
+        if self.extra_ranks:
+            sections.append((SECTION_EXTRA_RANKS, _pairs_payload(self.extra_ranks)))
+        if self.missing_sources:
+            sections.append((SECTION_MISSING_SOURCES, _pairs_payload(self.missing_sources)))
+        if self.skipped_sources:
+            payload = bytearray()
+            _write_strings(payload, self.skipped_sources)
+            sections.append((SECTION_SKIPPED_SOURCES, payload))
+        if self.revisions:
+            payload = bytearray()
+            _write_varint(payload, len(self.revisions))
+            for source, title, revid in self.revisions:
+                _write_string(payload, source)
+                _write_string(payload, title)
+                _write_varint(payload, revid)
+            sections.append((SECTION_REVISIONS, payload))
+        if self.common_names:
+            sections.append((SECTION_COMMON_NAMES, _pairs_payload(self.common_names)))
+
+        _write_varint(out, len(sections))
+        for tag, payload in sections:
+            out.append(tag)
+            _write_varint(out, len(payload))
+            out.extend(payload)
+        return bytes(out)
+
+    @classmethod
+    def unpack(cls, data):
+        """
+        Deserialize a record produced by pack().
+        """
+        view = memoryview(data)
+        position = _read_header(view, KIND_CARD)
+
+        fields = []
+        for _ in range(4 + len(MAIN_RANKS)):
+            value, position = _read_string(view, position)
+            fields.append(value)
+        fun_facts, position = _read_strings(view, position)
+        data_sources, position = _read_strings(view, position)
+
+        record = cls(
+            title=fields[0], description=fields[1], last_modified=fields[2], habitat=fields[3],
+            classification=fields[4:], fun_facts=fun_facts, data_sources=data_sources,
+        )
+
+        count, position = _read_varint(view, position)
+        for _ in range(count):
+            tag = view[position]
+            length, position = _read_varint(view, position + 1)
+            payload = view[position:position + length]
+            position += length
+            if tag == SECTION_EXTRA_RANKS:
+                record.extra_ranks = _read_pairs(payload)
+            elif tag == SECTION_MISSING_SOURCES:
+                record.missing_sources = _read_pairs(payload)
+            elif tag == SECTION_SKIPPED_SOURCES:
+                record.skipped_sources = tuple(_read_strings(payload, 0)[0])
+            elif tag == SECTION_REVISIONS:
+                record.revisions = _read_revisions(payload)
+            elif tag == SECTION_COMMON_NAMES:
+                record.common_names = _read_pairs(payload)
+            # Unknown tags come from newer writers and are skipped
+
+        return record
+
+
+class ImageRecord:
+    """
+    Slotted form of one Commons image's metadata.
+    """
+
+    __slots__ = ("title", "url", "thumb_url", "description", "author", "license")
+
+    def __init__(self, title="", url="", thumb_url="", description="", author="", license=""):
+        self.title = title
+        self.url = url
+        self.thumb_url = thumb_url
+        self.description = description
+        self.author = author
+        self.license = license
+
+    @classmethod
+    def from_image(cls, image):
+        return cls(*(image.get(field, "") for field in cls.__slots__))
+
+    def to_image(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def pack_card(card):
+    """
+    Serialize a species card dictionary, dropping extraction-only fields.
+    """
+    return SpeciesRecord.from_card(card).pack()
+
+
+def unpack_card(data):
+    """
+    Deserialize bytes from pack_card into a species card dictionary.
+    """
+    return SpeciesRecord.unpack(data).to_card()
+
+
+def pack_images(images):
+    """
+    Serialize a list of image metadata dictionaries.
+    """
+    out = bytearray(_header.pack(MAGIC, FORMAT_VERSION, KIND_IMAGES))
+    _write_varint(out, len(images))
+    for image in images:
+        record = ImageRecord.from_image(image)
+        _write_string(out, record.title)
+        _write_url(out, record.url)
+        _write_url(out, record.thumb_url)
+        _write_string(out, record.description)
+        _write_string(out, record.author)
+        _write_string(out, record.license)
+    return bytes(out)
+
+
+def unpack_images(data):
+    """
+    Deserialize bytes from pack_images into a list of image dictionaries.
+    """
+    view = memoryview(data)
+    position = _read_header(view, KIND_IMAGES)
+    count, position = _read_varint(view, position)
+
+    images = []
+    for _ in range(count):
+        title, position = _read_string(view, position)
+        url, position = _read_url(view, position)
+        thumb_url, position = _read_url(view, position)
+        description, position = _read_string(view, position)
+        author, position = _read_string(view, position)
+        license, position = _read_string(view, position)
+        images.append(ImageRecord(title, url, thumb_url, description, author, license).to_image())
+    return images
+
+
+def strip_extraction_fields(card):
+    """
+    Remove the fields that are only used during extraction from a card.
+    """
+    for field in EXTRACTION_ONLY_FIELDS:
+        card.pop(field, None)
+    return card
+
+
+def _known(value):
+    return "" if value in (None, UNKNOWN) else value
+
+
+def _read_header(view, kind):
+    if len(view) < _header.size:
+        raise FormatError("record is truncated")
+    magic, version, record_kind = _header.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise FormatError("not a species record")
+    if version != FORMAT_VERSION:
+        raise FormatError(f"unsupported species record version {version}")
+    if record_kind != kind:
+        raise FormatError(f"expected record kind {kind}, found {record_kind}")
+    return _header.size
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(view, position):
+    result = 0
+    shift = 0
+    while True:
+        byte = view[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def _write_string(out, value):
+    data = (value or "").encode("utf-8")
+    _write_varint(out, len(data))
+    out.extend(data)
+
+
+def _read_string(view, position):
+    length, position = _read_varint(view, position)
+    end = position + length
+    return str(view[position:end], "utf-8"), end
+
+
+def _write_strings(out, values):
+    _write_varint(out, len(values))
+    for value in values:
+        _write_string(out, value)
+
+
+def _read_strings(view, position):
+    count, position = _read_varint(view, position)
+    values = []
+    for _ in range(count):
+        value, position = _read_string(view, position)
+        values.append(value)
+    return values, position
+
+
+def _pairs_payload(pairs):
+    payload = bytearray()
+    _write_varint(payload, len(pairs))
+    for key, value in pairs:
+        _write_string(payload, key)
+        _write_string(payload, value)
+    return payload
+
+
+def _read_pairs(view):
+    count, position = _read_varint(view, 0)
+    pairs = []
+    for _ in range(count):
+        key, position = _read_string(view, position)
+        value, position = _read_string(view, position)
+        pairs.append((key, value))
+    return tuple(pairs)
+
+
+def _read_revisions(view):
+    count, position = _read_varint(view, 0)
+    revisions = []
+    for _ in range(count):
+        source, position = _read_string(view, position)
+        title, position = _read_string(view, position)
+        revid, position = _read_varint(view, position)
+        revisions.append((source, title, revid))
+    return tuple(revisions)
+
+
+def _write_url(out, url):
+    url = url or ""
+    # Pick the longest known prefix (code 0 is the empty prefix)
+    code = max(
+        (index for index, prefix in enumerate(URL_PREFIXES) if url.startswith(prefix)),
+        key=lambda index: len(URL_PREFIXES[index]),
+    )
+    out.append(code)
+    _write_string(out, url[len(URL_PREFIXES[code]):])
+
+
+def _read_url(view, position):
+    code = view[position]
+    if code >= len(URL_PREFIXES):
+        raise FormatError(f"unknown URL prefix code {code}")
+    suffix, position = _read_string(view, position + 1)
+    return URL_PREFIXES[code] + suffix, position
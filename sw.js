@@ -0,0 +1,98 @@
+// Service worker for SpeciScan
+//
+// Serves the page and its static assets from a cache, and keeps Commons
+// thumbnails so species seen before show their pictures instantly (and
+// offline). Species JSON is cached by script.js in IndexedDB, not here.
+//
+// It must be served from the site root (/sw.js) to control the whole page.
+
+const STATIC_CACHE = 'speciscan-static-v1';
+const IMAGE_CACHE = 'speciscan-images-v1';
+
+// Thumbnails kept at most; the oldest are dropped beyond this
+const MAX_IMAGES = 300;
+
+const STATIC_ASSETS = [
+    '/',
+    '/static/css/style.css',
+    '/static/js/script.js',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.3/css/all.min.css'
+];
+
+self.addEventListener('install', function(event) {
+    event.waitUntil(
+        caches.open(STATIC_CACHE)
+            .then(cache => cache.addAll(STATIC_ASSETS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', function(event) {
+    // Drop caches left by older versions of this worker
+    const current = [STATIC_CACHE, IMAGE_CACHE];
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(
+                names.filter(name => !current.includes(name)).map(name => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', function(event) {
+    const request = event.request;
+
+    // Searches and uploads are POSTs and always go to the server
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+
+    if (url.hostname === 'upload.wikimedia.org') {
+        event.respondWith(cacheFirst(request, IMAGE_CACHE, true));
+    } else if (url.origin === self.location.origin || url.hostname === 'cdnjs.cloudflare.com') {
+        event.respondWith(staleWhileRevalidate(request, STATIC_CACHE));
+    }
+});
+
+// Commons file URLs never change content, so a cached copy is always good
+function cacheFirst(request, cacheName, trim) {
+    return caches.open(cacheName).then(cache =>
+        cache.match(request).then(cached => {
+            if (cached) return cached;
+            return fetch(request).then(response => {
+                // Cross-origin <img> requests give opaque responses (status 0)
+                if (response.ok || response.type === 'opaque') {
+                    cache.put(request, response.clone()).then(() => {
+                        if (trim) trimCache(cache, MAX_IMAGES);
+                    });
+                }
+                return response;
+            });
+        })
+    );
+}
+
+// Answer from the cache right away and refresh the copy in the background
+function staleWhileRevalidate(request, cacheName) {
+    return caches.open(cacheName).then(cache =>
+        cache.match(request).then(cached => {
+            const network = fetch(request)
+                .then(response => {
+                    if (response.ok) cache.put(request, response.clone());
+                    return response;
+                })
+                .catch(error => {
+                    if (cached) return cached;
+                    throw error;
+                });
+            return cached || network;
+        })
+    );
+}
+
+// Cache keys come back in insertion order, so the first ones are the oldest
+function trimCache(cache, maxEntries) {
+    cache.keys().then(keys => {
+        keys.slice(0, Math.max(keys.length - maxEntries, 0)).forEach(key => cache.delete(key));
+    });
+}
@@ -0,0 +1,115 @@
+import threading
+
+# Taxonomic ranks from the top of the hierarchy down to the leaf
+TAXON_RANKS = ["kingdom", "phylum", "class", "order", "family", "genus", "species"]
+
+# Ranks above genus that a genus lineage must provide to be considered complete
+PARENT_RANKS = TAXON_RANKS[:5]
+
+# Hierarchical cache of taxon nodes shared by every lookup in this process.
+# Each node is keyed by (rank, name) and points at its parent node, so a genus
+# links to its family, the family to its order, and so on up to the kingdom.
+# This module lives outside app.py so that Streamlit reruns do not reset it.
+_nodes = {}
+_children = {}
+# Nodes whose parent link came from an authoritative source (Wikispecies
+# categories) rather than from a heuristic guess in the article text
+_authoritative = set()
+_lock = threading.Lock()
+
+
+def remember_classification(classification, authoritative=False):
+    """
+    Store the known ranks of a classification as a chain of taxon nodes.
+    Existing parent links are kept and only missing links are filled in,
+    except that an authoritative classification replaces the links that
+    were guessed heuristically.
+    """
+    # Collect the known ranks in hierarchy order, skipping "Unknown" placeholders
+    chain = [(rank, classification.get(rank)) for rank in TAXON_RANKS]
+    chain = [(rank, name) for rank, name in chain if name and name != "Unknown"]
+
+    if not chain:
+        return
+
+    with _lock:
+        for i, node in enumerate(chain):
+            parent = chain[i - 1] if i > 0 else None
+            if node[0] == "species":
+                # Species epithets are only unique within their genus, so keep
+                # them as children of the genus rather than as separate nodes
+                if parent and parent[0] == "genus":
+                    _children.setdefault(parent, set()).add(node[1])
+                continue
+            if _nodes.get(node) is None or (authoritative and node not in _authoritative):
+                previous = _nodes.get(node)
+                if previous is not None and previous != parent:
+                    _children.get(previous, set()).discard(node[1])
+                _nodes[node] = parent
+            if authoritative:
+                _authoritative.add(node)
+            if parent is not None:
+                _children.setdefault(parent, set()).add(node[1])
+
+
+def get_lineage(genus, authoritative=False):
+    """
+    Walk the cached hierarchy upwards from a genus.
+    Returns a dictionary of rank -> name for every cached ancestor, including
+    the genus itself, or an empty dictionary if the genus has not been seen.
+    With authoritative set, the walk stops at the first heuristic link.
+    """
+    if not genus or genus == "Unknown":
+        return {}
+
+    lineage = {}
+    with _lock:
+        node = ("genus", genus)
+        if node not in _nodes:
+            return {}
+
+        # Follow parent links, guarding against accidental cycles
+        while node is not None and node[0] not in lineage:
+            if authoritative and node not in _authoritative:
+                break
+            lineage[node[0]] = node[1]
+            node = _nodes.get(node)
+
+    return lineage
+
+
+def is_lineage_complete(lineage):
+    """
+    Check whether a lineage covers every rank above the species.
+    """
+    return all(lineage.get(rank, "Unknown") != "Unknown" for rank in PARENT_RANKS + ["genus"])
+
+
+def apply_lineage(classification, lineage):
+    """
+    Fill the "Unknown" ranks of a classification from a cached lineage.
+    Values that were already resolved are left untouched.
+    """
+    for rank, name in lineage.items():
+        if classification.get(rank, "Unknown") == "Unknown":
+            classification[rank] = name
+    return classification
+
+
+def get_children(rank, name):
+    """
+    Return the cached child names of a taxon node, sorted alphabetically.
+    For a genus these are the species epithets seen so far.
+    """
+    with _lock:
+        return sorted(_children.get((rank, name), ()))
+
+
+def clear():
+    """
+    Drop every cached taxon node.
+    """
+    with _lock:
+        _nodes.clear()
+        _children.clear()
+        _authoritative.clear()
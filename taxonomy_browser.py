@@ -0,0 +1,78 @@
+import species_cache
+from wikimedia_api import API_URLS, is_source_available, wikimedia_get_json
+
+# Top of the browsable tree: the kingdoms (and domains) Wikispecies
+# categorizes its taxa under
+ROOT_TAXA = ["Animalia", "Plantae", "Fungi", "Chromista", "Protozoa", "Bacteria", "Archaea"]
+
+# Children listed per page; large taxa (e.g. Insecta) are paged through on
+# request instead of being downloaded in full
+CHILDREN_PAGE_SIZE = 60
+
+# Category namespace on Wikispecies
+CATEGORY_NAMESPACE = 14
+
+CATEGORY_PREFIX = "Category:"
+
+
+def children_key(taxon, page):
+    """
+    Build the species cache key of one page of a taxon's children.
+    """
+    return f"{taxon}#{page}"
+
+
+def get_children_page(taxon, page=0):
+    """
+    Return one page of a taxon's children on Wikispecies and whether more
+    pages follow. Children are {"name", "expandable"} dictionaries:
+    subcategories are taxa that can be expanded further, member pages are
+    leaves (usually species) that can be looked up.
+
+    Pages come from the category members API, CHILDREN_PAGE_SIZE at a time,
+    following its continue tokens. Each page is cached with the token for the
+    next, so expanding a node again or paging back costs nothing.
+    """
+    cached_page = species_cache.cache_get("taxonomy", children_key(taxon, page))
+    if cached_page is not None:
+        return cached_page["children"], cached_page["continue"] is not None
+
+    # The previous page holds the continue token leading to this one
+    continuation = None
+    if page > 0:
+        previous = species_cache.cache_get("taxonomy", children_key(taxon, page - 1), allow_stale=True)
+        if previous is None:
+            get_children_page(taxon, page - 1)
+            previous = species_cache.cache_get("taxonomy", children_key(taxon, page - 1), allow_stale=True)
+        if previous is None or previous["continue"] is None:
+            return [], False
+        continuation = previous["continue"]
+
+    if not is_source_available("Wikispecies"):
+        raise RuntimeError("Wikispecies is temporarily unavailable.")
+
+    params = {
+        "action": "query",
+        "list": "categorymembers",
+        "cmtitle": CATEGORY_PREFIX + taxon,
+        "cmtype": "subcat|page",
+        "cmnamespace": f"0|{CATEGORY_NAMESPACE}",
+        "cmprop": "title",
+        "cmlimit": CHILDREN_PAGE_SIZE,
+    }
+    if continuation:
+        params.update(continuation)
+    data = wikimedia_get_json(API_URLS["Wikispecies"], params, call="wikispecies.categorymembers")
+
+    children = []
+    for member in data.get("query", {}).get("categorymembers", []):
+        title = member.get("title", "")
+        if member.get("ns") == CATEGORY_NAMESPACE:
+            name = title[len(CATEGORY_PREFIX):] if title.startswith(CATEGORY_PREFIX) else title
+            children.append({"name": name, "expandable": True})
+        elif title != taxon:
+            children.append({"name": title, "expandable": False})
+
+    continuation = data.get("continue")
+    species_cache.cache_put("taxonomy", children_key(taxon, page), {"children": children, "continue": continuation})
+    return children, continuation is not None
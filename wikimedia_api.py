@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+import circuit_breaker
+import metrics
+import rate_governor
+import response_archive
+
+# Human-readable source names per Wikimedia host, matching the names used in
+# a species card's data_sources list
+SOURCES = {
+    "species.wikimedia.org": "Wikispecies",
+    "en.wikipedia.org": "Wikipedia",
+    "commons.wikimedia.org": "Commons",
+}
+
+# API endpoint per source. Each can be pointed elsewhere, e.g. at the local
+# stub server in benchmarks/, with WILDCARDS_<SOURCE>_API
+API_URLS = {
+    "Wikispecies": os.environ.get("WILDCARDS_WIKISPECIES_API", "https://species.wikimedia.org/w/api.php"),
+    "Wikipedia": os.environ.get("WILDCARDS_WIKIPEDIA_API", "https://en.wikipedia.org/w/api.php"),
+    "Commons": os.environ.get("WILDCARDS_COMMONS_API", "https://commons.wikimedia.org/w/api.php"),
+}
+
+# (connect, read) timeouts in seconds, so a slow upstream can't hold a search
+# for longer than this
+REQUEST_TIMEOUT = (3.05, 8)
+
+# Parameters sent with every API query: return UTF-8 text as-is instead of
+# \uXXXX escapes, which shrinks non-English payloads considerably
+COMMON_PARAMS = {
+    "format": "json",
+    "utf8": 1,
+}
+
+# Transfer totals per call label (e.g. "wikipedia.content"), see get_transfer_stats
+_transfers = {}
+_transfers_lock = threading.Lock()
+
+
+def source_for_url(url):
+    """
+    Return the source name for a Wikimedia API URL.
+    """
+    # Configured endpoints may share a host (e.g. a local stub), so match them
+    # in full first
+    endpoint = url.split("?", 1)[0]
+    for source, api_url in API_URLS.items():
+        if endpoint == api_url:
+            return source
+    host = urlparse(url).hostname
+    return SOURCES.get(host, host)
+
+
+def wikimedia_get(url, params=None, **kwargs):
+    """
+    Send a GET request to a Wikimedia API endpoint.
+    Every call site goes through here so that all processes on the machine
+    share the per-host rate governor; interactive requests are queued ahead of
+    batch work (see rate_governor.request_priority). Calls are refused with
+    CircuitOpenError while the source's circuit breaker is open, and every
+    call's outcome and latency is fed back into the breaker.
+    """
+    breaker = circuit_breaker.get_breaker(source_for_url(url))
+    if not breaker.allow_request():
+        raise circuit_breaker.CircuitOpenError(breaker.source)
+
+    rate_governor.acquire(urlparse(url).hostname)
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+
+    started = time.monotonic()
+    try:
+        response = requests.get(url, params=params, **kwargs)
+    except Exception:
+        breaker.record_failure()
+        raise
+
+    # Throttling and server errors count against the source's health
+    if response.status_code == 429 or response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success(time.monotonic() - started)
+
+    return response
+
+
+def is_source_available(source):
+    """
+    Return False if the source's circuit breaker is currently open.
+    """
+    return not circuit_breaker.get_breaker(source).is_open()
+
+
+def wikimedia_get_json(url, params, call):
+    """
+    Run a MediaWiki API query and return the decoded JSON.
+    The call label names the query in the transfer statistics, which record
+    the bytes received (decoded and, when the server reports it, on the wire)
+    and the time spent decoding the JSON, so payload reductions can be measured.
+    While cards are rebuilt from the response archive, the archived response
+    is returned instead and nothing is sent.
+    """
+    replayed = response_archive.replayed_response(call)
+    if replayed is not None:
+        return replayed
+
+    try:
+        response = wikimedia_get(url, params=dict(COMMON_PARAMS, **params))
+        started = time.perf_counter()
+        data = json.loads(response.content)
+        parse_seconds = time.perf_counter() - started
+    except Exception:
+        response_archive.record_failure(call)
+        raise
+
+    record_transfer(call, len(response.content), response.headers.get("Content-Length"), parse_seconds)
+    response_archive.record(call, params, response.content, data)
+    return data
+
+
+def record_transfer(call, body_bytes, wire_bytes=None, parse_seconds=0.0):
+    """
+    Add one response to the transfer statistics of a call label.
+    """
+    wire_bytes = int(wire_bytes) if wire_bytes else body_bytes
+    with _transfers_lock:
+        stats = _transfers.setdefault(call, {"calls": 0, "bytes": 0, "wire_bytes": 0, "parse_seconds": 0.0})
+        stats["calls"] += 1
+        stats["bytes"] += body_bytes
+        stats["wire_bytes"] += wire_bytes
+        stats["parse_seconds"] += parse_seconds
+
+    metrics.increment(f"wikimedia.{call}.calls")
+    metrics.increment(f"wikimedia.{call}.bytes", body_bytes)
+    metrics.observe(f"wikimedia.{call}.response_bytes", body_bytes)
+
+
+def get_transfer_stats():
+    """
+    Return the transfer totals per call label, with per-call averages.
+    """
+    with _transfers_lock:
+        transfers = {call: dict(stats) for call, stats in _transfers.items()}
+
+    for stats in transfers.values():
+        stats["average_bytes"] = stats["bytes"] / stats["calls"]
+        stats["average_parse_seconds"] = stats["parse_seconds"] / stats["calls"]
+    return transfers